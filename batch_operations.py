@@ -0,0 +1,139 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from pipeline import BGR, GRAY, Pipeline
+from point_operations import POINT_OPERATIONS, PointChain
+
+
+def _as_rows(stack):
+    """عرض المكدس (N, H, W[, C]) كصورة واحدة (N*H, W[, C]) بدون نسخ"""
+    if not stack.flags.c_contiguous:
+        stack = np.ascontiguousarray(stack)
+    return stack.reshape((-1,) + stack.shape[2:])
+
+
+def group_by_shape(images):
+    """تجميع قائمة صور حسب الأبعاد ونوع البيانات وإرجاع (المواضع، المكدس) لكل مجموعة"""
+    groups = {}
+    for index, image in enumerate(images):
+        groups.setdefault((image.shape, image.dtype.str), []).append(index)
+    return [(indices, np.stack([images[i] for i in indices])) for indices in groups.values()]
+
+
+class BatchOperations:
+    """عمليات على مكدسات صور بنفس الأبعاد (N, H, W, C) باستدعاء واحد بدلاً من حلقة
+
+    العمليات النقطية والعكس وتحويل الألوان تعمل على المكدس كصورة واحدة طويلة، والقص
+    عرض بدون نسخ. العمليات التي تعتمد على الجوار مثل CLAHE و Canny توزع على خيوط،
+    كل خيط يعالج جزءاً متصلاً من المكدس بسلسلة واحدة تعيد استخدام مخازنها.
+    """
+
+    @staticmethod
+    def invert_colors(stack):
+        return cv2.bitwise_not(_as_rows(stack)).reshape(stack.shape)
+
+    @staticmethod
+    def adjust_brightness_contrast(stack, brightness=0, contrast=0):
+        if brightness == 0 and contrast == 0:
+            return stack
+        chain = PointChain([('brightness_contrast', {'brightness': brightness, 'contrast': contrast})])
+        return chain.apply(_as_rows(stack)).reshape(stack.shape)
+
+    @staticmethod
+    def crop_image(stack, x, y, width, height):
+        h, w = stack.shape[1:3]
+        x = max(0, min(x, w))
+        y = max(0, min(y, h))
+        width = min(width, w - x)
+        height = min(height, h - y)
+        return stack[:, y:y+height, x:x+width]
+
+    @staticmethod
+    def convert_color(stack, code):
+        """تحويل الألوان لكل المكدس بمرور واحد
+
+        يصلح فقط للتحويلات التي تعمل على كل بكسل منفرداً (BGR2GRAY و BGR2HSV وغيرها)،
+        وليس لتحويلات Bayer أو YUV المستوية التي تعتمد على الصفوف المجاورة.
+        """
+        converted = cv2.cvtColor(_as_rows(stack), code)
+        return converted.reshape(stack.shape[:3] + converted.shape[2:])
+
+    @staticmethod
+    def map_images(operations, stack, workers=None):
+        """تطبيق سلسلة عمليات على كل صورة في المكدس بالتوازي وكتابة النتائج في مكدس واحد"""
+        count = len(stack)
+        if count == 0:
+            return stack
+        # المكدس الرمادي يبقى رمادياً بدلاً من التحويل إلى BGR في نهاية كل سلسلة
+        space = GRAY if stack.ndim == 3 else BGR
+        first = Pipeline(operations).run(stack[0], output_space=space)
+        output = np.empty((count,) + first.shape, dtype=first.dtype)
+        output[0] = first
+
+        workers = max(1, min(workers or os.cpu_count() or 1, count - 1 or 1))
+        bounds = np.linspace(1, count, workers + 1, dtype=int)
+
+        def run_chunk(start, stop):
+            # سلسلة لكل خيط تعيد مخازنها بين الإطارات فلا تخصيص لكل صورة
+            pipeline = Pipeline(operations)
+            for index in range(start, stop):
+                np.copyto(output[index], pipeline.run(stack[index], space, reuse_output=True))
+
+        if workers == 1:
+            run_chunk(1, count)
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+                futures = [executor.submit(run_chunk, start, stop)
+                           for start, stop in zip(bounds[:-1], bounds[1:]) if start < stop]
+                for future in futures:
+                    future.result()
+        return output
+
+    @staticmethod
+    def apply(images, operations, workers=None):
+        """تطبيق سلسلة عمليات على مكدس (N, H, W, C) أو قائمة صور
+
+        القوائم تجمع حسب الأبعاد ونوع البيانات وتعاد بنفس الترتيب.
+        """
+        if isinstance(images, np.ndarray):
+            return BatchOperations._apply_stack(images, operations, workers)
+        results = [None] * len(images)
+        for indices, stack in group_by_shape(images):
+            output = BatchOperations._apply_stack(stack, operations, workers)
+            for position, index in enumerate(indices):
+                results[index] = output[position]
+        return results
+
+    @staticmethod
+    def _apply_stack(stack, operations, workers):
+        if stack.ndim not in (3, 4):
+            raise ValueError(f"Expected an (N, H, W) or (N, H, W, C) stack, got shape {stack.shape}")
+        operations = list(operations)
+        index = 0
+        while index < len(operations):
+            name, params = operations[index]
+            if name == 'crop':
+                stack = BatchOperations.crop_image(stack, **params)
+                index += 1
+            elif name in POINT_OPERATIONS:
+                # العمليات النقطية المتتالية تدمج في جدول بحث واحد كما في Pipeline
+                chain = []
+                while index < len(operations) and operations[index][0] in POINT_OPERATIONS:
+                    chain.append(operations[index])
+                    index += 1
+                if len(chain) == 1 and chain[0][0] == 'invert':
+                    stack = BatchOperations.invert_colors(stack)
+                else:
+                    stack = PointChain(chain).apply(_as_rows(stack)).reshape(stack.shape)
+            else:
+                # العمليات غير النقطية المتتالية تنفذ في سلسلة واحدة لكل صورة
+                per_image = []
+                while index < len(operations) and operations[index][0] != 'crop' \
+                        and operations[index][0] not in POINT_OPERATIONS:
+                    per_image.append(operations[index])
+                    index += 1
+                stack = BatchOperations.map_images(per_image, stack, workers)
+        return stack
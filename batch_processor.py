@@ -0,0 +1,247 @@
+import argparse
+import ast
+import glob
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from image_operations import ImageOperations, OPERATIONS
+from pipeline import Pipeline
+from save_queue import EncoderSettings, write_image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+
+def _split_params(text):
+    """تقسيم المعاملات عند الفواصل خارج الأقواس حتى تبقى القيم مثل ((0,0),(128,160)) كاملة"""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def parse_operation(spec):
+    """تحويل نص العملية مثل edges:threshold1=30,threshold2=100 إلى (الاسم، المعاملات)"""
+    name, _, params_text = spec.partition(':')
+    name = name.strip()
+    if name not in OPERATIONS:
+        raise ValueError(f"Unknown operation '{name}'. Available: {', '.join(sorted(OPERATIONS))}")
+
+    params = {}
+    for item in filter(None, (part.strip() for part in _split_params(params_text))):
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f"Invalid parameter '{item}' in operation '{spec}'")
+        try:
+            params[key.strip()] = ast.literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            params[key.strip()] = value.strip()
+    return name, params
+
+
+def collect_inputs(sources, recursive=False):
+    """جمع مسارات الصور من مجلدات أو أنماط glob"""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            pattern = os.path.join(source, '**', '*') if recursive else os.path.join(source, '*')
+            candidates = glob.glob(pattern, recursive=recursive)
+        else:
+            candidates = glob.glob(source, recursive=recursive)
+        paths.extend(
+            path for path in candidates
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS)
+        )
+    # إزالة التكرار مع الحفاظ على الترتيب
+    return list(dict.fromkeys(paths))
+
+
+def _common_root(paths):
+    if not paths:
+        return ''
+    return os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths])
+
+
+# خط معالجة واحد لكل سلسلة عمليات داخل كل عملية عاملة حتى تعاد المخازن بين الملفات،
+# بعدد محدود لأن الخدمة الدائمة قد تستقبل معاملات مختلفة في كل طلب
+_pipelines = OrderedDict()
+MAX_PIPELINES = 16
+
+
+def _get_pipeline(operations):
+    key = repr(operations)
+    pipeline = _pipelines.get(key)
+    if pipeline is None:
+        pipeline = _pipelines[key] = Pipeline(operations)
+        while len(_pipelines) > MAX_PIPELINES:
+            _pipelines.popitem(last=False)
+    else:
+        _pipelines.move_to_end(key)
+    return pipeline
+
+
+def apply_operations(image, operations, reuse_output=False):
+    """تطبيق سلسلة العمليات بالترتيب على صورة واحدة"""
+    return _get_pipeline(operations).run(image, reuse_output=reuse_output)
+
+
+def _init_worker():
+    # كل عملية تعمل على نواة واحدة لتجنب التنافس بين خيوط OpenCV
+    cv2.setNumThreads(1)
+
+
+def process_file(path, operations, output_dir, input_root, settings=None):
+    """معالجة ملف واحد وإرجاع إحصائياته، مع الحفاظ على المسار النسبي داخل مجلد الإخراج"""
+    relative = os.path.relpath(os.path.abspath(path), input_root)
+    return process_to_path(path, operations, os.path.join(output_dir, relative), settings)
+
+
+def process_to_path(path, operations, output_path, settings=None):
+    """معالجة ملف واحد وكتابة الناتج في output_path وإرجاع إحصائياته"""
+    start = time.perf_counter()
+    result = {
+        'path': path,
+        'output': output_path,
+        'bytes_in': 0,
+        'bytes_out': 0,
+        'seconds': 0.0,
+        'error': None,
+    }
+    try:
+        result['bytes_in'] = os.path.getsize(path)
+        image = ImageOperations.load_image(path)
+        # الناتج يكتب إلى القرص مباشرة لذا يمكن إعادة استخدام مخزنه للملف التالي
+        processed = apply_operations(image, operations, reuse_output=True)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        write_image(output_path, processed, settings)
+        result['bytes_out'] = os.path.getsize(output_path)
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_batch(paths, operations, output_dir, workers=None, report=print, settings=None):
+    """توزيع الملفات على مجموعة عمليات وإرجاع النتائج والإحصائيات الإجمالية"""
+    workers = workers or os.cpu_count() or 1
+    input_root = _common_root(paths)
+    os.makedirs(output_dir, exist_ok=True)
+
+    results = []
+    start = time.perf_counter()
+    # chunksize يقلل كلفة التواصل بين العمليات عند آلاف الملفات الصغيرة
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        tasks = executor.map(
+            process_file,
+            paths,
+            [operations] * len(paths),
+            [output_dir] * len(paths),
+            [input_root] * len(paths),
+            [settings] * len(paths),
+            chunksize=chunksize,
+        )
+        for result in tasks:
+            results.append(result)
+            if report:
+                report(_format_result(result))
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(results, elapsed)
+    if report:
+        report(_format_summary(summary, workers))
+    return results, summary
+
+
+def summarize(results, elapsed):
+    succeeded = [r for r in results if r['error'] is None]
+    bytes_in = sum(r['bytes_in'] for r in succeeded)
+    elapsed = max(elapsed, 1e-9)
+    return {
+        'images': len(results),
+        'succeeded': len(succeeded),
+        'failed': len(results) - len(succeeded),
+        'seconds': elapsed,
+        'bytes_in': bytes_in,
+        'bytes_out': sum(r['bytes_out'] for r in succeeded),
+        'images_per_second': len(succeeded) / elapsed,
+        'mb_per_second': bytes_in / (1024 * 1024) / elapsed,
+    }
+
+
+def _format_result(result):
+    if result['error']:
+        return f"FAILED {result['path']}: {result['error']}"
+    seconds = max(result['seconds'], 1e-9)
+    mb = result['bytes_in'] / (1024 * 1024)
+    return f"{result['path']} -> {result['output']} ({result['seconds'] * 1000:.1f} ms, {mb / seconds:.1f} MB/s)"
+
+
+def _format_summary(summary, workers):
+    return (
+        f"Processed {summary['succeeded']}/{summary['images']} images "
+        f"({summary['failed']} failed) in {summary['seconds']:.2f} s with {workers} workers: "
+        f"{summary['images_per_second']:.1f} images/s, {summary['mb_per_second']:.1f} MB/s"
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m batch_processor',
+        description='Apply a chain of ImageOperations to many images in parallel.',
+    )
+    parser.add_argument('inputs', nargs='+', help='input directories or glob patterns')
+    parser.add_argument('-o', '--output', required=True, help='output directory')
+    parser.add_argument(
+        '--op', dest='operations', action='append', required=True,
+        help="operation spec, e.g. 'edges:threshold1=30,threshold2=100'; repeat to chain. "
+             f"Available: {', '.join(sorted(OPERATIONS))}",
+    )
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes (default: CPU count)')
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help='descend into sub-directories')
+    parser.add_argument('--jpeg-quality', type=int, default=95)
+    parser.add_argument('--jpeg-progressive', action='store_true')
+    parser.add_argument('--jpeg-optimize', action='store_true')
+    parser.add_argument('--png-compression', type=int, default=None,
+                        help='0 (fastest, largest) to 9 (slowest, smallest)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        operations = [parse_operation(spec) for spec in args.operations]
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    paths = collect_inputs(args.inputs, recursive=args.recursive)
+    if not paths:
+        print("No input images found", file=sys.stderr)
+        return 1
+
+    settings = EncoderSettings(
+        jpeg_quality=args.jpeg_quality,
+        jpeg_progressive=args.jpeg_progressive,
+        jpeg_optimize=args.jpeg_optimize,
+        png_compression=args.png_compression,
+    )
+    _, summary = run_batch(paths, operations, args.output, workers=args.workers, settings=settings)
+    return 0 if summary['failed'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
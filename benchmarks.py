@@ -0,0 +1,575 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from batch_operations import BatchOperations
+from image_operations import ImageOperations
+from image_processor import ImageProcessor
+from render_cache import DisplayPyramid
+from shared_frames import SharedMemoryExecutor, apply_pickled
+from tiled_processing import TiledProcessor
+
+# الأحجام من VGA حتى 50 ميجابكسل (و QVGA لدفعات الإطارات)
+SIZES = {
+    'qvga': (320, 240),
+    'vga': (640, 480),
+    'hd': (1920, 1080),
+    '12mp': (4000, 3000),
+    '24mp': (6000, 4000),
+    '50mp': (8660, 5774),
+}
+
+DEFAULT_SIZES = ('vga', 'hd', '12mp')
+
+# اسم القياس والدالة المطلوب قياسها على الصورة
+CASES = {
+    'equalize_histogram': lambda image: ImageOperations.equalize_histogram(image),
+    'detect_edges': lambda image: ImageOperations.detect_edges(image),
+    'invert_colors': lambda image: ImageOperations.invert_colors(image),
+    'crop_image': lambda image: ImageOperations.crop_image(image, 10, 10, image.shape[1] // 2, image.shape[0] // 2),
+    'rotate_image_90': lambda image: ImageOperations.rotate_image(image, 90),
+    'rotate_image_30': lambda image: ImageOperations.rotate_image(image, 30),
+    'adjust_brightness_contrast': lambda image: ImageOperations.adjust_brightness_contrast(image, 30, 20),
+    'apply_blur_gaussian': lambda image: ImageOperations.apply_blur(image, 'gaussian'),
+    'apply_blur_median': lambda image: ImageOperations.apply_blur(image, 'median'),
+    'apply_blur_bilateral': lambda image: ImageOperations.apply_blur(image, 'bilateral'),
+    'apply_blur_gaussian_fast': lambda image: ImageOperations.apply_blur(image, 'gaussian', quality='fast'),
+    'apply_blur_bilateral_fast': lambda image: ImageOperations.apply_blur(image, 'bilateral', quality='fast'),
+}
+
+DTYPES = ('uint8', 'uint16', 'float32')
+
+# أنواع البيانات التي تدعمها كل عملية في OpenCV؛ الحالات غير المذكورة لـ uint8 فقط
+# (Canny والوسيط بنواة أكبر من 5 وجداول البحث النقطية لا تقبل غيره)
+CASE_DTYPES = {
+    'equalize_histogram': ('uint8', 'uint16'),
+    'invert_colors': DTYPES,
+    'crop_image': DTYPES,
+    'rotate_image_90': DTYPES,
+    'rotate_image_30': DTYPES,
+    'apply_blur_gaussian': DTYPES,
+    'apply_blur_gaussian_fast': DTYPES,
+    'apply_blur_bilateral': ('uint8', 'float32'),
+    'apply_blur_bilateral_fast': ('uint8', 'float32'),
+}
+
+# عمليات تحول من BGR إلى الرمادي فتحتاج ثلاث قنوات ولا تقاس على الصور الرمادية
+COLOR_ONLY_CASES = ('equalize_histogram', 'detect_edges')
+
+# أنواع الضبابية وأحجام النوى لقياس خطأ المستوى السريع مقارنة بالدقيق
+BLUR_ACCURACY_CASES = (
+    ('gaussian', 31), ('gaussian', 61), ('gaussian', 101),
+    ('median', 15), ('median', 31),
+    ('bilateral', 15), ('bilateral', 31),
+)
+
+# سلاسل قياس الدفعات: كل إطار على حدة مقابل المكدس كاملاً
+BURST_CASES = {
+    'invert': [('invert', {})],
+    'brightness_contrast': [('brightness_contrast', {'brightness': 30, 'contrast': 20})],
+    'crop': [('crop', {'x': 10, 'y': 10, 'width': 160, 'height': 120})],
+    'histogram': [('histogram', {})],
+    'edges': [('edges', {})],
+}
+
+
+def synthetic_image(width, height, channels=3, seed=0):
+    """صورة اصطناعية قابلة للتكرار: تدرج لوني مع ضوضاء وأشكال تعطي حوافاً حقيقية"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = (x * 0.6 + y * 0.4).astype(np.uint8)
+    if channels == 3:
+        image = np.dstack([base, np.flipud(base), np.fliplr(base)])
+    else:
+        image = base.copy()
+    noise = rng.integers(0, 32, size=image.shape, dtype=np.uint8)
+    image = cv2.add(image, noise)
+    for _ in range(20):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(min(width, height) // 40 + 1, min(width, height) // 8 + 2))
+        color = tuple(int(c) for c in rng.integers(0, 256, size=channels))
+        cv2.circle(image, center, radius, color, -1)
+    return np.ascontiguousarray(image)
+
+
+def as_dtype(image, dtype):
+    """نفس الصورة بنوع آخر على مداه الكامل: 0-65535 لـ uint16 و 0-1 لـ float32"""
+    if dtype == 'uint16':
+        return image.astype(np.uint16) * 257
+    if dtype == 'float32':
+        return image.astype(np.float32) / 255
+    return image
+
+
+def time_call(func, repeat, warmup=1):
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {
+        'min_ms': min(samples) * 1000,
+        'median_ms': statistics.median(samples) * 1000,
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'repeat': repeat,
+    }
+
+
+def _record(results, key, func, repeat, megapixels):
+    try:
+        timing = time_call(func, repeat)
+        timing['megapixels_per_second'] = megapixels / max(timing['median_ms'] / 1000, 1e-9)
+    except cv2.error as e:
+        timing = {'unsupported': str(e).strip().splitlines()[-1]}
+    results[key] = timing
+    if 'median_ms' in timing:
+        print(f"{key:<55} {timing['median_ms']:>10.2f} ms")
+    else:
+        print(f"{key:<55} {'unsupported':>13}")
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=5, cases=None, dtypes=DTYPES):
+    """قياس كل عملية على كل حجم بصور ملونة ورمادية وبكل نوع بيانات تدعمه، ثم مسار العرض وفك الترميز"""
+    processor = ImageProcessor()
+    results = {}
+    selected = {name: CASES[name] for name in (cases or CASES)}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_name in sizes:
+            width, height = SIZES[size_name]
+            megapixels = width * height / 1e6
+            for mode, channels in (('color', 3), ('gray', 1)):
+                image = synthetic_image(width, height, channels)
+                for dtype in dtypes:
+                    typed = as_dtype(image, dtype)
+                    for name, func in selected.items():
+                        if dtype not in CASE_DTYPES.get(name, ('uint8',)):
+                            continue
+                        if channels == 1 and name in COLOR_ONLY_CASES:
+                            continue
+                        _record(results, f"{name}/{size_name}/{mode}/{dtype}",
+                                lambda: func(typed), repeat, megapixels)
+                if channels == 3:
+                    _record(results, f"prepare_for_display/{size_name}/{mode}/uint8",
+                            lambda: processor.prepare_for_display(image), repeat, megapixels)
+                    # أول رسم (بناء الهرم) ثم تغيير حجم اللوحة بين حجمين من الهرم المحفوظ
+                    _record(results, f"display_pyramid/{size_name}/{mode}/uint8",
+                            lambda: DisplayPyramid(image).render(600, 600), repeat, megapixels)
+                    pyramid = DisplayPyramid(image)
+                    view_sizes = itertools.cycle([(800, 600), (820, 620)])
+                    _record(results, f"display_resize/{size_name}/{mode}/uint8",
+                            lambda: pyramid.render(*next(view_sizes)), repeat, megapixels)
+
+            image = synthetic_image(width, height, 3)
+            for ext in ('.jpg', '.png'):
+                path = os.path.join(tmp, f"{size_name}{ext}")
+                cv2.imwrite(path, image)
+                _record(results, f"load_image{ext}/{size_name}/full",
+                        lambda: ImageOperations.load_image(path), repeat, megapixels)
+                _record(results, f"load_image{ext}/{size_name}/preview",
+                        lambda: ImageOperations.load_image(path, target_size=(600, 600)), repeat, megapixels)
+    return results
+
+# سلاسل قياس النقل إلى عملية عاملة؛ transfer بدون عمليات يقيس كلفة النقل وحدها
+TRANSPORT_CASES = {
+    'transfer': [],
+    'invert': [('invert', {})],
+    'edges': [('edges', {})],
+    'blur': [('blur', {'blur_type': 'gaussian', 'kernel_size': 15})],
+}
+
+
+def blur_error(exact, approximate):
+    """متوسط الفرق المطلق ومئينه 99 وأقصاه ونسبة الإشارة إلى الضوضاء بين ناتجين uint8"""
+    diff = cv2.absdiff(exact, approximate)
+    mse = float(np.mean(diff.astype(np.float32) ** 2))
+    return {
+        'mean_abs_error': float(np.mean(diff)),
+        'p99_abs_error': float(np.percentile(diff, 99)),
+        'max_abs_error': int(diff.max()),
+        'psnr_db': float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse),
+    }
+
+
+def run_blur_accuracy(sizes=DEFAULT_SIZES, repeat=3):
+    """مقارنة quality='fast' بالمرشح الدقيق: الخطأ والتسريع لكل نوع وحجم نواة"""
+    results = {}
+    for size_name in sizes:
+        width, height = SIZES[size_name]
+        image = synthetic_image(width, height, 3)
+        for blur_type, kernel_size in BLUR_ACCURACY_CASES:
+            exact_call = lambda: ImageOperations.apply_blur(image, blur_type, kernel_size)
+            fast_call = lambda: ImageOperations.apply_blur(image, blur_type, kernel_size, quality='fast')
+            entry = blur_error(exact_call(), fast_call())
+            exact_ms = time_call(exact_call, repeat)['median_ms']
+            fast_ms = time_call(fast_call, repeat)['median_ms']
+            entry.update({'exact_ms': exact_ms, 'fast_ms': fast_ms, 'speedup': exact_ms / max(fast_ms, 1e-9)})
+            key = f"accuracy/blur_{blur_type}_k{kernel_size}/{size_name}"
+            results[key] = entry
+            print(f"{key:<55} x{entry['speedup']:>6.1f}  mean err {entry['mean_abs_error']:6.2f}  "
+                  f"p99 err {entry['p99_abs_error']:5.1f}  max err {entry['max_abs_error']:3d}  PSNR {entry['psnr_db']:6.1f} dB")
+    return results
+
+
+# أبعاد لا تقسم على شبكة CLAHE ولا على حجم الجزء، لأن الحدود تظهر فيها أولاً
+TILED_CHECK_SIZES = ((3000, 2000), (3001, 2003), (2500, 1700))
+TILED_CHECK_CASES = {
+    'histogram': ('histogram', {}, lambda image: ImageOperations.equalize_histogram(image)),
+    'edges': ('edges', {}, lambda image: ImageOperations.detect_edges(image)),
+    'edges_weak': ('edges', {'threshold1': 20, 'threshold2': 150},
+                   lambda image: ImageOperations.detect_edges(image, threshold1=20, threshold2=150)),
+}
+
+
+def fading_edge_image(width, height):
+    """حافة أفقية قوية في أولها وتضعف تحت العتبة العليا بعد ذلك، فلا تظهر في الأجزاء
+    البعيدة إلا بتتبع الحواف الضعيفة عبر حدود الأجزاء"""
+    image = np.full((height, width, 3), 100, dtype=np.uint8)
+    step = np.maximum(12, 80 * (1 - np.arange(width) / 200)).astype(np.uint8)
+    image[height // 2:] += step[None, :, None]
+    return image
+
+
+def run_tiled_check(tile_size=512):
+    """مقارنة المعالجة بالأجزاء بالمعالجة الكاملة بكسلاً بكسلاً؛ أي اختلاف خطأ"""
+    results = {}
+    for width, height in TILED_CHECK_SIZES:
+        images = {'synthetic': synthetic_image(width, height, 3), 'fading_edge': fading_edge_image(width, height)}
+        for image_name, image in images.items():
+            for case, (name, params, whole) in TILED_CHECK_CASES.items():
+                tiled = np.zeros_like(image)
+                TiledProcessor(tile_size).process(image, tiled, name, **params)
+                diff = cv2.absdiff(tiled, whole(image))
+                key = f"tiled_check/{case}/{image_name}/{width}x{height}"
+                results[key] = {'mismatched_pixels': int(np.count_nonzero(diff.max(axis=2))),
+                                'max_abs_error': int(diff.max())}
+                print(f"{key:<55} mismatched {results[key]['mismatched_pixels']:>8}  "
+                      f"max err {results[key]['max_abs_error']:3d}")
+    return results
+
+
+def run_transport_benchmarks(sizes=DEFAULT_SIZES, repeat=5):
+    """نقل الصورة والناتج إلى عامل واحد بالتسلسل (pickle) مقابل الذاكرة المشتركة
+
+    shared: الصورة موجودة مسبقاً في الذاكرة المشتركة، shared_copy: يشمل نسخها إليها.
+    """
+    results = {}
+    with ProcessPoolExecutor(max_workers=1) as pickled, SharedMemoryExecutor(workers=1) as shared:
+        for size_name in sizes:
+            width, height = SIZES[size_name]
+            megapixels = width * height / 1e6
+            image = synthetic_image(width, height, 3)
+            frame = shared.registry.share(image)
+
+            def run_shared(source):
+                shared.submit(source, operations).result().release()
+
+            for name, operations in TRANSPORT_CASES.items():
+                key = f"transport/{name}/{size_name}"
+                _record(results, f"{key}/pickle",
+                        lambda: pickled.submit(apply_pickled, operations, image).result(), repeat, megapixels)
+                _record(results, f"{key}/shared", lambda: run_shared(frame), repeat, megapixels)
+                _record(results, f"{key}/shared_copy", lambda: run_shared(image), repeat, megapixels)
+            frame.release()
+    return results
+
+
+# التسريع الأقل من هذا يعد ضمن ضوضاء القياس
+BURST_MIN_GAIN = 1.2
+
+
+def run_burst_benchmarks(frames=1000, size='qvga', repeat=3, workers=None):
+    """قياس دفعة إطارات بنفس الأبعاد: حلقة ImageOperations مقابل BatchOperations
+
+    الطرفان ينتجان مصفوفات مستقلة (القص ينسخ في الحالتين وإلا كانت المقارنة بين عرض واحد
+    وألف عرض)، والعمليات التي لا يسرعها
+    التجميع تذكر في النهاية بدلاً من إخفائها خلف أكبر نسبة.
+    """
+    width, height = SIZES[size]
+    base = synthetic_image(width, height, 3)
+    # إزاحة بسيطة لكل إطار حتى لا تكون الإطارات متطابقة
+    stack = np.stack([np.roll(base, i % width, axis=1) for i in range(frames)])
+    megapixels = frames * width * height / 1e6
+    loops = {
+        'invert': lambda: [ImageOperations.invert_colors(f) for f in stack],
+        'brightness_contrast': lambda: [ImageOperations.adjust_brightness_contrast(f, 30, 20) for f in stack],
+        'crop': lambda: [ImageOperations.crop_image(f, 10, 10, 160, 120).copy() for f in stack],
+        'histogram': lambda: [ImageOperations.equalize_histogram(f) for f in stack],
+        'edges': lambda: [ImageOperations.detect_edges(f) for f in stack],
+    }
+    results = {}
+    no_gain = []
+    for name, operations in BURST_CASES.items():
+        key = f"burst/{name}/{size}x{frames}"
+        _record(results, f"{key}/loop", loops[name], repeat, megapixels)
+        _record(results, f"{key}/batched",
+                lambda: np.ascontiguousarray(BatchOperations.apply(stack, operations, workers)),
+                repeat, megapixels)
+        loop, batched = results[f"{key}/loop"], results[f"{key}/batched"]
+        if 'median_ms' in loop and 'median_ms' in batched:
+            speedup = loop['median_ms'] / max(batched['median_ms'], 1e-9)
+            batched['speedup'] = speedup
+            print(f"{'':<55} x{speedup:.1f} vs loop")
+            if speedup < BURST_MIN_GAIN:
+                no_gain.append(f"{name} (x{speedup:.1f})")
+    if no_gain:
+        print(f"Batching gives no real gain for: {', '.join(no_gain)}")
+    return results
+
+
+# يقاس كل سكربت في عملية جديدة حتى لا تؤثر الوحدات المحملة مسبقاً على النتيجة
+_IMPORT_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{'seconds': time.perf_counter() - start, 'tk': 'tkinter' in sys.modules}}))
+'''
+
+_FIRST_PAINT_SCRIPT = '''
+import json, time
+start = time.perf_counter()
+import tkinter as tk
+import gui
+timings = {}
+root = tk.Tk()
+def on_map(event):
+    if event.widget is root:
+        timings.setdefault('first_paint', time.perf_counter() - start)
+root.bind('<Map>', on_map, add='+')
+app = gui.ImageProcessingApp(root)
+def check():
+    if app.ready:
+        timings['ready'] = time.perf_counter() - start
+        root.destroy()
+    else:
+        root.after(5, check)
+root.after(0, check)
+root.after(30000, root.destroy)
+root.mainloop()
+print(json.dumps(timings))
+'''
+
+# الوحدات التي يجب أن تستورد بدون Tk
+HEADLESS_MODULES = ('image_operations', 'image_processor', 'render_cache')
+
+
+def _run_script(script):
+    completed = subprocess.run(
+        [sys.executable, '-c', script], capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)), timeout=120,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else
+                           f"exit code {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_startup_benchmarks(repeat=5):
+    """زمن الاستيراد لكل وحدة وزمن أول رسم للنافذة وجاهزية التطبيق، كل قياس في عملية جديدة"""
+    results = {}
+    for module in HEADLESS_MODULES + ('gui',):
+        runs = [_run_script(_IMPORT_SCRIPT.format(module=module)) for _ in range(repeat)]
+        samples = [run['seconds'] * 1000 for run in runs]
+        results[f"startup/import/{module}"] = {
+            'min_ms': min(samples),
+            'median_ms': statistics.median(samples),
+            'repeat': repeat,
+            'imports_tkinter': any(run['tk'] for run in runs),
+        }
+    try:
+        runs = [_run_script(_FIRST_PAINT_SCRIPT) for _ in range(repeat)]
+    except RuntimeError as e:
+        # بدون شاشة (مثل خوادم CI) لا يمكن قياس أول رسم
+        results['startup/first_paint'] = {'unsupported': str(e)}
+        results['startup/ready'] = {'unsupported': str(e)}
+    else:
+        for key in ('first_paint', 'ready'):
+            samples = [run[key] * 1000 for run in runs if key in run]
+            if samples:
+                results[f"startup/{key}"] = {
+                    'min_ms': min(samples),
+                    'median_ms': statistics.median(samples),
+                    'repeat': len(samples),
+                }
+    for key, timing in results.items():
+        if 'median_ms' in timing:
+            print(f"{key:<55} {timing['median_ms']:>10.2f} ms")
+        else:
+            print(f"{key:<55} {'unsupported':>13}")
+    return results
+
+
+def check_startup(results, max_import_ms, max_first_paint_ms):
+    """إرجاع قائمة بالمخالفات: استيراد بطيء أو أول رسم بطيء أو وحدة بدون واجهة تحمل Tk"""
+    failures = []
+    for module in HEADLESS_MODULES:
+        if results[f"startup/import/{module}"]['imports_tkinter']:
+            failures.append(f"{module} imports tkinter")
+    for key, timing in results.items():
+        if key.startswith('startup/import/'):
+            limit = max_import_ms
+        elif key == 'startup/first_paint':
+            limit = max_first_paint_ms
+        else:
+            continue
+        if 'median_ms' in timing and timing['median_ms'] > limit:
+            failures.append(f"{key} took {timing['median_ms']:.0f} ms (limit {limit:.0f} ms)")
+    return failures
+
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'opencv_threads': cv2.getNumThreads(),
+        'numpy': np.__version__,
+    }
+
+
+def compare(baseline, current, threshold=0.10):
+    """مقارنة الوسيط بخط الأساس وإرجاع القياسات التي تباطأت أكثر من النسبة المسموحة"""
+    regressions = []
+    for key, timing in sorted(current['results'].items()):
+        base = baseline['results'].get(key)
+        if not base or 'median_ms' not in base or 'median_ms' not in timing:
+            continue
+        ratio = timing['median_ms'] / max(base['median_ms'], 1e-9)
+        flag = 'REGRESSION' if ratio > 1 + threshold else ''
+        print(f"{key:<55} {base['median_ms']:>10.2f} -> {timing['median_ms']:>10.2f} ms  x{ratio:.2f} {flag}")
+        if flag:
+            regressions.append((key, ratio))
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Headless benchmarks for ImageOperations and ImageProcessor.',
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='run the benchmark suite')
+    run.add_argument('--sizes', default=','.join(DEFAULT_SIZES),
+                     help=f"comma-separated sizes from: {', '.join(SIZES)}")
+    run.add_argument('--cases', default=None,
+                     help=f"comma-separated subset of: {', '.join(CASES)}")
+    run.add_argument('--dtypes', default=','.join(DTYPES),
+                     help=f"comma-separated data types from: {', '.join(DTYPES)} "
+                          f"(each case runs only on the types it supports)")
+    run.add_argument('--repeat', type=int, default=5)
+    run.add_argument('-o', '--output', default='benchmark_results.json')
+    run.add_argument('--baseline', default=None, help='compare against this results file')
+    run.add_argument('--threshold', type=float, default=0.10,
+                     help='allowed slowdown before flagging a regression (default: 0.10)')
+    run.add_argument('--burst-frames', type=int, default=0,
+                     help='also measure batched execution on a burst of this many frames')
+    run.add_argument('--burst-size', default='qvga', choices=sorted(SIZES),
+                     help='frame size for the burst benchmark (default: qvga)')
+    run.add_argument('--transport', action='store_true',
+                     help='also compare pickling against shared memory for worker processes')
+    run.add_argument('--blur-accuracy', action='store_true',
+                     help="also report error and speedup of quality='fast' blurs against the exact filters")
+    run.add_argument('--tiled-check', action='store_true',
+                     help='also check that tiled histogram/edges match whole-image results exactly')
+
+    startup = sub.add_parser('startup', help='measure import and first-paint time')
+    startup.add_argument('--repeat', type=int, default=5)
+    startup.add_argument('--max-import-ms', type=float, default=1000,
+                         help='fail if any module import takes longer (default: 1000)')
+    startup.add_argument('--max-first-paint-ms', type=float, default=1500,
+                         help='fail if the window takes longer to appear (default: 1500)')
+    startup.add_argument('-o', '--output', default=None)
+    startup.add_argument('--baseline', default=None, help='compare against this results file')
+    startup.add_argument('--threshold', type=float, default=0.10)
+
+    cmp_parser = sub.add_parser('compare', help='compare two results files')
+    cmp_parser.add_argument('baseline')
+    cmp_parser.add_argument('current')
+    cmp_parser.add_argument('--threshold', type=float, default=0.10)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == 'startup':
+        current = {'environment': environment_info(), 'results': run_startup_benchmarks(args.repeat)}
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(current, f, indent=2, sort_keys=True)
+        failures = check_startup(current['results'], args.max_import_ms, args.max_first_paint_ms)
+        for failure in failures:
+            print(f"STARTUP BUDGET EXCEEDED: {failure}", file=sys.stderr)
+        if failures:
+            return 1
+        if not args.baseline:
+            return 0
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    elif args.command == 'compare':
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.current, encoding='utf-8') as f:
+            current = json.load(f)
+    else:
+        sizes = [s.strip() for s in args.sizes.split(',') if s.strip()]
+        unknown = [s for s in sizes if s not in SIZES]
+        cases = [c.strip() for c in args.cases.split(',')] if args.cases else None
+        unknown += [c for c in cases or () if c not in CASES]
+        dtypes = [d.strip() for d in args.dtypes.split(',') if d.strip()]
+        unknown += [d for d in dtypes if d not in DTYPES]
+        if unknown:
+            print(f"Unknown sizes, cases or dtypes: {', '.join(unknown)}", file=sys.stderr)
+            return 2
+        current = {
+            'environment': environment_info(),
+            'repeat': args.repeat,
+            'results': run_benchmarks(sizes, args.repeat, cases, dtypes),
+        }
+        if args.burst_frames:
+            current['results'].update(run_burst_benchmarks(args.burst_frames, args.burst_size, args.repeat))
+        if args.blur_accuracy:
+            current['results'].update(run_blur_accuracy(sizes, args.repeat))
+        if args.transport:
+            current['results'].update(run_transport_benchmarks(sizes, args.repeat))
+        seams = {}
+        if args.tiled_check:
+            seams = run_tiled_check()
+            current['results'].update(seams)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"Results written to {args.output}")
+        mismatched = [key for key, entry in seams.items() if entry['mismatched_pixels']]
+        if mismatched:
+            print(f"Tiled results differ from whole-image results: {', '.join(mismatched)}", file=sys.stderr)
+            return 1
+        if not args.baseline:
+            return 0
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import threading
+
+import numpy as np
+
+from pipeline import Pipeline
+
+
+class HistoryEntry:
+    """خطوة تعديل: اسم العملية ومعاملاتها بالدقة الكاملة وعلى النسخة المصغرة، مع لقطة اختيارية"""
+
+    def __init__(self, name, params, proxy_params=None):
+        self.name = name
+        self.params = params
+        self.proxy_params = params if proxy_params is None else proxy_params
+        self.snapshot = None
+
+
+def _root(array):
+    # المصفوفة المالكة للذاكرة فعلاً (القص عرض لا يملك ذاكرته)
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+class EditHistory:
+    """سجل تعديلات غير متلف مع تراجع وإعادة وميزانية ذاكرة للقطات
+
+    كل خطوة تحفظ العملية ومعاملاتها، وتحفظ ناتجها كلقطة قدر ما تسمح الميزانية.
+    اللقطات الأبعد عن الموضع الحالي تحذف أولاً، وتعاد حسابها عند الحاجة من أقرب
+    لقطة سابقة. القص يحفظ كعرض من الصورة السابقة بدون نسخ.
+    """
+
+    def __init__(self, base_image, max_bytes=512 * 1024 * 1024, proxy=False):
+        self.base_image = base_image
+        self.max_bytes = max_bytes
+        self.proxy = proxy
+        self.entries = []
+        self.cursor = -1
+        self._lock = threading.RLock()
+
+    @property
+    def can_undo(self):
+        return self.cursor >= 0
+
+    @property
+    def can_redo(self):
+        return self.cursor < len(self.entries) - 1
+
+    def _params(self, entry):
+        return entry.proxy_params if self.proxy else entry.params
+
+    def operations(self, full=True):
+        """العمليات حتى الموضع الحالي، بمعاملات الدقة الكاملة افتراضياً"""
+        with self._lock:
+            return [
+                (e.name, e.params if full else self._params(e))
+                for e in self.entries[:self.cursor + 1]
+            ]
+
+    def push(self, name, params, result, proxy_params=None):
+        """إضافة خطوة جديدة بعد الموضع الحالي وحذف خطوات الإعادة"""
+        with self._lock:
+            del self.entries[self.cursor + 1:]
+            entry = HistoryEntry(name, params, proxy_params)
+            self.entries.append(entry)
+            self.cursor = len(self.entries) - 1
+            self._store(entry, result)
+            self._enforce_budget()
+
+    def pop(self):
+        """حذف الخطوة الحالية نهائياً (لدمجها مع خطوة تالية مثل الدوران المتتالي)"""
+        with self._lock:
+            if self.cursor < 0:
+                return None
+            entry = self.entries.pop(self.cursor)
+            del self.entries[self.cursor:]
+            self.cursor -= 1
+            return entry
+
+    def undo(self):
+        with self._lock:
+            if self.can_undo:
+                self.cursor -= 1
+            return self.cursor
+
+    def redo(self):
+        with self._lock:
+            if self.can_redo:
+                self.cursor += 1
+            return self.cursor
+
+    def clear(self):
+        with self._lock:
+            self.entries = []
+            self.cursor = -1
+
+    def rebase(self, base_image, proxy):
+        """تبديل الصورة الأساسية (مصغرة أو كاملة) مع الإبقاء على الخطوات وحذف اللقطات"""
+        with self._lock:
+            self.base_image = base_image
+            self.proxy = proxy
+            for entry in self.entries:
+                entry.snapshot = None
+
+    def cached_image(self, index=None):
+        """اللقطة المحفوظة للموضع إن وجدت، بدون أي حساب"""
+        with self._lock:
+            index = self.cursor if index is None else index
+            if index < 0:
+                return self.base_image
+            return self.entries[index].snapshot
+
+    def image_at(self, index=None):
+        """صورة الموضع المطلوب، تحسب من أقرب لقطة سابقة إذا حذفت لقطته"""
+        with self._lock:
+            index = self.cursor if index is None else index
+            cached = self.cached_image(index)
+            if cached is not None:
+                return cached
+            start = index - 1
+            while start >= 0 and self.entries[start].snapshot is None:
+                start -= 1
+            image = self.base_image if start < 0 else self.entries[start].snapshot
+            pending = [(e.name, self._params(e)) for e in self.entries[start + 1:index + 1]]
+            target = self.entries[index]
+
+        # إعادة الحساب خارج القفل بسلسلة واحدة تدمج الخطوات المتتالية
+        result = Pipeline(pending).run(image)
+        with self._lock:
+            if target in self.entries:
+                self._store(target, result)
+                self._enforce_budget()
+        return result
+
+    def memory_used(self):
+        """مجموع ذاكرة اللقطات، مع احتساب الذاكرة المشتركة بين العروض مرة واحدة"""
+        with self._lock:
+            base_root = _root(self.base_image) if self.base_image is not None else None
+            roots = {}
+            for entry in self.entries:
+                if entry.snapshot is not None:
+                    root = _root(entry.snapshot)
+                    if root is not base_root:
+                        roots[id(root)] = root.nbytes
+            return sum(roots.values())
+
+    def _store(self, entry, image):
+        image.flags.writeable = False
+        entry.snapshot = image
+
+    def _enforce_budget(self):
+        # حذف اللقطات الأبعد عن الموضع الحالي أولاً مع إبقاء لقطة الموضع الحالي
+        candidates = sorted(
+            (i for i, e in enumerate(self.entries) if e.snapshot is not None and i != self.cursor),
+            key=lambda i: abs(i - self.cursor),
+        )
+        while candidates and self.memory_used() > self.max_bytes:
+            self.entries[candidates.pop()].snapshot = None
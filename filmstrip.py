@@ -0,0 +1,189 @@
+import queue
+import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+from PIL import Image, ImageTk
+
+
+class Filmstrip:
+    """شريط مصغرات أفقي يملأ المصغرات الظاهرة فقط، بالتوازي وفي الخلفية
+
+    الخلايا تنشأ للنطاق الظاهر فقط، وطلبات المصغرات التي خرجت من النطاق قبل أن تبدأ تلغى.
+    """
+
+    def __init__(self, parent, cache, on_select, bg='#1f2937', highlight='#06b6d4',
+                 thumb_size=96, workers=4, max_photos=400):
+        self.cache = cache
+        self.on_select = on_select
+        self.highlight = highlight
+        self.thumb_size = thumb_size
+        self.cell = thumb_size + 8
+        self.max_photos = max_photos
+        self.paths = []
+        self.current = None
+        self._generation = 0
+        self._requested = {}
+        self._pending = set()
+        self._cells = set()
+        self._photos = OrderedDict()
+        self._results = queue.Queue()
+        self._polling = False
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+
+        self.frame = tk.Frame(parent, bg=bg)
+        self.canvas = tk.Canvas(self.frame, bg=bg, height=self.cell + 4, highlightthickness=0)
+        self.scrollbar = tk.Scrollbar(self.frame, orient=tk.HORIZONTAL, command=self._on_scroll)
+        self.canvas.configure(xscrollcommand=self._on_xscroll)
+        self.canvas.pack(fill=tk.X, side=tk.TOP)
+        self.scrollbar.pack(fill=tk.X, side=tk.BOTTOM)
+        self.canvas.bind("<Configure>", lambda e: self._request_visible())
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-1>", self._on_click)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def set_paths(self, paths):
+        """عرض قائمة صور جديدة مع إلغاء طلبات القائمة السابقة"""
+        self._generation += 1
+        self.paths = list(paths)
+        self.current = None
+        for future in self._requested.values():
+            future.cancel()
+        self._requested.clear()
+        self._pending.clear()
+        self._cells.clear()
+        self._photos.clear()
+        self.canvas.delete("all")
+        self.canvas.configure(scrollregion=(0, 0, len(self.paths) * self.cell + 4, self.cell + 4))
+        self.canvas.xview_moveto(0)
+        self._request_visible()
+
+    def set_current(self, index):
+        if self.current is not None:
+            self.canvas.delete("current")
+        self.current = index
+        x = index * self.cell + 4
+        self.canvas.create_rectangle(
+            x - 2, 2, x + self.thumb_size + 2, 6 + self.thumb_size,
+            outline=self.highlight, width=3, tags=("current",)
+        )
+        # إظهار المصغرة الحالية إن كانت خارج المنطقة الظاهرة
+        left, right = self.canvas.xview()
+        total = max(len(self.paths) * self.cell + 4, 1)
+        if not left <= x / total <= right - self.cell / total:
+            self.canvas.xview_moveto(max(0, (x - self.canvas.winfo_width() / 2) / total))
+        self._request_visible()
+
+    def _on_scroll(self, *args):
+        self.canvas.xview(*args)
+        self._request_visible()
+
+    def _on_xscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._request_visible()
+
+    def _on_wheel(self, event):
+        self.canvas.xview_scroll(-1 if event.delta > 0 else 1, "units")
+        self._request_visible()
+
+    def _on_click(self, event):
+        index = int(self.canvas.canvasx(event.x) // self.cell)
+        if 0 <= index < len(self.paths):
+            self.on_select(index)
+
+    def _visible_range(self, margin=5):
+        if not self.paths:
+            return range(0)
+        left = self.canvas.canvasx(0)
+        right = left + max(self.canvas.winfo_width(), self.cell)
+        first = max(0, int(left // self.cell) - margin)
+        last = min(len(self.paths), int(right // self.cell) + 1 + margin)
+        return range(first, last)
+
+    def _request_visible(self):
+        """طلب مصغرات النطاق الظاهر فقط حتى يبقى فتح مجلد كبير فورياً"""
+        generation = self._generation
+        visible = self._visible_range()
+        # طلبات المواضع السابقة التي لم تبدأ بعد تلغى حتى لا يتأخر النطاق الحالي خلفها
+        for index, future in list(self._requested.items()):
+            if index not in visible and future.cancel():
+                del self._requested[index]
+                self._pending.discard((generation, index))
+        for index in list(self._cells):
+            if index not in visible and index not in self._photos:
+                self.canvas.delete(f"cell{index}")
+                self._cells.discard(index)
+        for index in visible:
+            if index not in self._cells:
+                self._draw_cell(index)
+            if index in self._requested:
+                continue
+            self._pending.add((generation, index))
+            self._requested[index] = self._executor.submit(self._load, generation, index, self.paths[index])
+        self._ensure_polling()
+
+    def _draw_cell(self, index):
+        x = index * self.cell + 4
+        self.canvas.create_rectangle(
+            x, 4, x + self.thumb_size, 4 + self.thumb_size,
+            outline='#374151', fill='#111827', tags=(f"cell{index}",)
+        )
+        self.canvas.tag_lower(f"cell{index}")
+        self._cells.add(index)
+
+    def _load(self, generation, index, path):
+        rgb = None
+        if generation == self._generation:
+            try:
+                thumbnail = self.cache.get_or_create(path)
+                rgb = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2RGB)
+            except Exception as e:
+                print(f"Thumbnail error for {path}: {e}")
+        self._results.put((generation, index, rgb))
+
+    def _ensure_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.canvas.after(30, self._poll)
+
+    def _poll(self):
+        # إنشاء PhotoImage يجب أن يتم على خيط Tk الرئيسي
+        while True:
+            try:
+                generation, index, rgb = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending.discard((generation, index))
+            if generation == self._generation and rgb is not None:
+                self._show(index, rgb)
+        if self._pending:
+            self.canvas.after(30, self._poll)
+        else:
+            self._polling = False
+
+    def _show(self, index, rgb):
+        photo = ImageTk.PhotoImage(Image.fromarray(rgb))
+        self._photos[index] = photo
+        h, w = rgb.shape[:2]
+        x = index * self.cell + 4 + (self.thumb_size - w) // 2
+        y = 4 + (self.thumb_size - h) // 2
+        if index not in self._cells:
+            # انتهى تحميلها بعد خروجها من النطاق الظاهر فحذفت خليتها
+            self._draw_cell(index)
+        self.canvas.delete(f"thumb{index}")
+        self.canvas.create_image(x, y, anchor=tk.NW, image=photo, tags=(f"thumb{index}",))
+        self.canvas.tag_raise("current")
+        # الإبقاء على عدد محدود من الصور في الذاكرة؛ البعيدة تطلب مجدداً عند الرجوع إليها
+        while len(self._photos) > self.max_photos:
+            old, _ = self._photos.popitem(last=False)
+            self.canvas.delete(f"thumb{old}")
+            self.canvas.delete(f"cell{old}")
+            self._cells.discard(old)
+            self._requested.pop(old, None)
+
+    def shutdown(self):
+        self._generation += 1
+        self._executor.shutdown(wait=False, cancel_futures=True)
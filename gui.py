@@ -1,30 +1,116 @@
 
-from image_processor import ImageProcessor
-from image_operations import ImageOperations
+from job_runner import JobRunner
+from lazy_imports import ensure_loaded, lazy_import
+from profiling import profiler
 import os
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk
-import cv2
-import numpy as np
+from tkinter import ttk, filedialog, messagebox, simpledialog
+
+# الوحدات التي تحمل OpenCV و NumPy و PIL تنفذ عند أول استخدام بعد ظهور النافذة
+image_processor = lazy_import('image_processor')
+image_cache = lazy_import('image_cache')
+pipeline = lazy_import('pipeline')
+edit_history = lazy_import('edit_history')
+save_queue = lazy_import('save_queue')
+thumbnail_cache = lazy_import('thumbnail_cache')
+filmstrip = lazy_import('filmstrip')
+result_cache = lazy_import('result_cache')
+library_index = lazy_import('library_index')
+render_cache = lazy_import('render_cache')
 
 class ImageProcessingApp:
     def __init__(self, root):
         self.root = root
-        self.processor = ImageProcessor()
+        # الكائنات المكلفة تنشأ في _finish_startup بعد ظهور النافذة
+        self.ready = False
+        self.processor = None
         self.current_image = None
         self.original_image = None
         self.processed_image = None
         self.image_paths = []
         self.current_index = 0
-        self.cumulative_angle = 0
         self.crop_coords = {'start': None, 'end': None}
         self.crop_rect = None
-        self.display_scale = 1.0
+        # طبقة العرض: لوحة لكل صورة تعيد استخدام PhotoImage، وهرم العرض للأصلية محفوظ
+        self.original_view = None
+        self.processed_view = None
+        self._original_source = None
         self.dragging = False
+        self.image_cache = None
+        self.prefetch_radius = 2
+        # وضع المعاينة: العمليات تطبق على نسخة مصغرة وتعاد بالدقة الكاملة عند الحفظ
+        self.proxy_image = None
+        self.proxy_scale = 1.0
+        self.full_image = None
+        self.idle_render_delay = 1500
+        self._idle_render_id = None
+        # سجل التعديلات للتراجع والإعادة
+        self.history = None
+        self.history_budget = 512 * 1024 * 1024
+        self.save_queue = None
+        self.thumbnail_cache = None
+        self.result_cache = None
+        self.filmstrip = None
+        # فهرس البيانات الوصفية للتصفية والفرز دون فك ترميز الصور
+        self.library = None
+        self.library_folder = None
+        self._unfiltered_paths = []
+        # المعاينة الحية للمنزلقات: تأخير قصير لتجميع الحركة ثم تطبيق كامل بعد التوقف
+        self.live_preview_delay = 15
+        self.live_commit_delay = 400
+        self._live_preview_id = None
+        self._live_commit_id = None
+        self._live_entry = None
+        self._live_source = None
         
         self._setup_modern_gui()
         self._bind_events()
+        self.jobs = JobRunner(self.root, on_busy_change=self._on_jobs_busy)
+        self.root.bind("<Map>", self._on_first_map, add='+')
+    
+    def _on_first_map(self, event):
+        # <Map> يصل من كل العناصر؛ يكفي ظهور النافذة الرئيسية مرة واحدة
+        if event.widget is self.root and not self.ready and self.processor is None:
+            self.root.unbind("<Map>")
+            self.root.after(1, self._finish_startup)
+    
+    def _finish_startup(self):
+        """تحميل وحدات المعالجة وإنشاء الكائنات المكلفة بعد أن ترسم النافذة أول مرة"""
+        self._update_status("جارٍ التهيئة...")
+        self.root.update_idletasks()
+        # تنفيذ كل الوحدات المؤجلة هنا على خيط Tk، لأن خيوط JobRunner والتحميل المسبق تصل إليها
+        # أولاً لو تركت (pipeline يحمل image_operations معه)
+        ensure_loaded(
+            image_processor, image_cache, pipeline, edit_history, save_queue,
+            thumbnail_cache, filmstrip, result_cache, library_index, render_cache,
+        )
+        self.processor = image_processor.ImageProcessor()
+        # نسخ JPEG المصغرة للجيران بضعف حجم العرض حتى تبقى واضحة إذا كبرت النافذة
+        self.image_cache = image_cache.ImageCache(
+            max_bytes=1024 * 1024 * 1024,
+            preview_size=(self.processor.display_width * 2, self.processor.display_height * 2)
+        )
+        self.save_queue = save_queue.SaveQueue()
+        # فحص مجلد المصغرات على القرص من أبطأ خطوات البدء
+        self.thumbnail_cache = thumbnail_cache.ThumbnailCache(thumb_size=(96, 96))
+        # نتائج العمليات السابقة مع صور عرضها، لإعادة اختيار عملية بدون أي معالجة
+        self.result_cache = result_cache.ResultCache(max_bytes=256 * 1024 * 1024)
+        self.library = library_index.LibraryIndex()
+        self.original_view = render_cache.CanvasRenderer(self.original_canvas)
+        self.processed_view = render_cache.CanvasRenderer(self.processed_canvas)
+        
+        # شريط المصغرات للتنقل السريع بين الصور
+        self.filmstrip = filmstrip.Filmstrip(
+            self.main_frame,
+            self.thumbnail_cache,
+            self._select_image,
+            bg=self.colors['dark'],
+            highlight=self.colors['accent'],
+            thumb_size=96
+        )
+        self.filmstrip.pack(fill=tk.X, pady=(10, 0))
+        self.ready = True
+        self.status_var.set("جاهز للاستخدام")
     
     def _setup_modern_gui(self):
         self.root.title("🎨 Professional Image Processor - معالج الصور الاحترافي")
@@ -75,8 +161,12 @@ class ImageProcessingApp:
         
         modern_buttons = [
             ("📂 فتح الصور", self._open_images, self.colors['primary']),
+            ("📁 فتح مجلد", self._open_folder, self.colors['primary']),
+            ("🔎 تصفية", self._filter_images, self.colors['secondary']),
             ("💾 حفظ باختيار المكان", self._save_with_dialog, self.colors['success']),
             ("💾 حفظ سريع", self._save_current, self.colors['accent']),
+            ("↩️ تراجع", self._undo, self.colors['secondary']),
+            ("↪️ إعادة", self._redo, self.colors['secondary']),
             ("🔄 إعادة تعيين", self._reset_image, self.colors['danger'])
         ]
         
@@ -123,6 +213,8 @@ class ImageProcessingApp:
         """المحتوى الرئيسي مع الصور"""
         main_frame = tk.Frame(self.root, bg="#1a1a1a")
         main_frame.pack(expand=True, fill=tk.BOTH, padx=10, pady=10)
+        # شريط المصغرات يضاف إلى هذا الإطار في _finish_startup
+        self.main_frame = main_frame
         
         # إطار الصور مع تسميات
         images_container = tk.Frame(main_frame, bg="#1a1a1a")
@@ -190,7 +282,9 @@ class ImageProcessingApp:
             ("📊 توزيع الألوان", self._apply_histogram, self.colors['primary']),
             ("🔍 كشف الحواف", self._apply_edge_detection, self.colors['secondary']),
             ("🎨 عكس الألوان", self._apply_invert, self.colors['warning']),
-            ("🔄 دوران", self._apply_rotation, self.colors['accent'])
+            ("🔄 دوران", self._apply_rotation, self.colors['accent']),
+            ("🌫️ ضبابية", self._apply_blur, self.colors['primary']),
+            ("☀️ سطوع/تباين", self._apply_brightness_contrast, self.colors['success'])
         ]
         
         for i, (text, cmd, color) in enumerate(operations):
@@ -209,6 +303,8 @@ class ImageProcessingApp:
             btn.grid(row=0, column=i, padx=8, pady=10)
             self._add_hover_effect(btn, color)
         
+        self._create_parameter_sliders(controls_main)
+        
         # إعدادات الدوران
         rotation_frame = tk.LabelFrame(
             controls_main,
@@ -238,6 +334,71 @@ class ImageProcessingApp:
         )
         angle_entry.grid(row=0, column=1, padx=5, pady=10)
         
+        self.proxy_mode = tk.BooleanVar(value=True)
+        tk.Checkbutton(
+            rotation_frame,
+            text="معاينة سريعة",
+            variable=self.proxy_mode,
+            command=self._on_proxy_mode_change,
+            font=('Segoe UI', 10),
+            bg=self.colors['dark'],
+            fg=self.colors['light'],
+            selectcolor=self.colors['dark'],
+            activebackground=self.colors['dark']
+        ).grid(row=1, column=0, columnspan=2, padx=5, pady=(0, 10))
+        
+        # إعدادات الحفظ
+        save_frame = tk.LabelFrame(
+            controls_main,
+            text="💾 إعدادات الحفظ",
+            font=('Segoe UI', 12, 'bold'),
+            bg=self.colors['dark'],
+            fg=self.colors['light'],
+            relief='flat'
+        )
+        save_frame.pack(side=tk.RIGHT, padx=5, pady=10)
+        
+        self.jpeg_quality_var = tk.IntVar(value=95)
+        self.png_compression_var = tk.IntVar(value=3)
+        self.jpeg_progressive_var = tk.BooleanVar(value=False)
+        self.jpeg_optimize_var = tk.BooleanVar(value=False)
+        
+        for row, (text, var, low, high) in enumerate([
+            ("جودة JPEG:", self.jpeg_quality_var, 1, 100),
+            ("ضغط PNG:", self.png_compression_var, 0, 9)
+        ]):
+            tk.Label(
+                save_frame,
+                text=text,
+                font=('Segoe UI', 10),
+                bg=self.colors['dark'],
+                fg=self.colors['light']
+            ).grid(row=row, column=0, padx=5, pady=2, sticky=tk.E)
+            tk.Spinbox(
+                save_frame,
+                from_=low,
+                to=high,
+                textvariable=var,
+                width=5,
+                font=('Segoe UI', 10),
+                justify='center'
+            ).grid(row=row, column=1, padx=5, pady=2)
+        
+        for column, (text, var) in enumerate([
+            ("تدريجي", self.jpeg_progressive_var),
+            ("محسّن", self.jpeg_optimize_var)
+        ]):
+            tk.Checkbutton(
+                save_frame,
+                text=text,
+                variable=var,
+                font=('Segoe UI', 10),
+                bg=self.colors['dark'],
+                fg=self.colors['light'],
+                selectcolor=self.colors['dark'],
+                activebackground=self.colors['dark']
+            ).grid(row=0, column=2 + column, rowspan=2, padx=5)
+        
         # أزرار التنقل
         navigation_frame = tk.Frame(controls_main, bg=self.colors['dark'])
         navigation_frame.pack(side=tk.RIGHT, padx=10, pady=10)
@@ -263,6 +424,89 @@ class ImageProcessingApp:
             btn.grid(row=0, column=i, padx=5)
             self._add_hover_effect(btn, color)
     
+    def _create_parameter_sliders(self, parent):
+        """منزلقات معاملات كشف الحواف والضبابية والسطوع/التباين مع معاينة حية"""
+        sliders_frame = tk.LabelFrame(
+            parent,
+            text="🎚️ المعاملات",
+            font=('Segoe UI', 12, 'bold'),
+            bg=self.colors['dark'],
+            fg=self.colors['light'],
+            relief='flat'
+        )
+        sliders_frame.pack(side=tk.LEFT, padx=5, pady=10)
+        
+        self.edge_blur_var = tk.IntVar(value=5)
+        self.threshold1_var = tk.IntVar(value=50)
+        self.threshold2_var = tk.IntVar(value=150)
+        self.blur_type_var = tk.StringVar(value='gaussian')
+        self.blur_kernel_var = tk.IntVar(value=15)
+        self.blur_fast_var = tk.BooleanVar(value=False)
+        self.brightness_var = tk.IntVar(value=0)
+        self.contrast_var = tk.IntVar(value=0)
+        
+        groups = [
+            ('edges', [
+                ("تنعيم", self.edge_blur_var, 1, 15, 2),
+                ("عتبة 1", self.threshold1_var, 0, 255, 1),
+                ("عتبة 2", self.threshold2_var, 0, 255, 1)
+            ]),
+            ('blur', [
+                ("النواة", self.blur_kernel_var, 1, 51, 2)
+            ]),
+            ('brightness_contrast', [
+                ("سطوع", self.brightness_var, -127, 127, 1),
+                ("تباين", self.contrast_var, -127, 127, 1)
+            ])
+        ]
+        
+        for group, (name, sliders) in enumerate(groups):
+            for row, (text, var, low, high, step) in enumerate(sliders):
+                tk.Label(
+                    sliders_frame,
+                    text=text,
+                    font=('Segoe UI', 9),
+                    bg=self.colors['dark'],
+                    fg=self.colors['light']
+                ).grid(row=row, column=group * 2, padx=(8, 2), sticky=tk.E)
+                tk.Scale(
+                    sliders_frame,
+                    from_=low,
+                    to=high,
+                    resolution=step,
+                    variable=var,
+                    orient=tk.HORIZONTAL,
+                    length=110,
+                    showvalue=True,
+                    font=('Segoe UI', 8),
+                    bg=self.colors['dark'],
+                    fg=self.colors['light'],
+                    highlightthickness=0,
+                    troughcolor='#374151',
+                    command=lambda value, name=name: self._on_slider(name)
+                ).grid(row=row, column=group * 2 + 1, padx=(0, 8))
+        
+        blur_type = ttk.Combobox(
+            sliders_frame,
+            textvariable=self.blur_type_var,
+            values=('gaussian', 'median', 'bilateral'),
+            state='readonly',
+            width=9
+        )
+        blur_type.grid(row=1, column=3, padx=(0, 8))
+        blur_type.bind("<<ComboboxSelected>>", lambda e: self._on_slider('blur'))
+        tk.Checkbutton(
+            sliders_frame,
+            text="تقريب سريع",
+            variable=self.blur_fast_var,
+            command=lambda: self._on_slider('blur'),
+            font=('Segoe UI', 9),
+            bg=self.colors['dark'],
+            fg=self.colors['light'],
+            selectcolor=self.colors['dark'],
+            activebackground=self.colors['dark']
+        ).grid(row=2, column=3, padx=(0, 8))
+    
     def _create_modern_status_bar(self):
         """شريط الحالة العصري"""
         status_frame = tk.Frame(self.root, bg=self.colors['dark'], height=40)
@@ -291,22 +535,338 @@ class ImageProcessingApp:
             anchor=tk.E
         )
         self.image_info_label.pack(side=tk.RIGHT, padx=15, pady=10)
+        
+        # مؤشر التقدم أثناء المعالجة في الخلفية
+        self.progress_bar = ttk.Progressbar(status_frame, mode='indeterminate', length=120)
     
     def _bind_events(self):
-        self.original_canvas.bind("<ButtonPress-1>", self._crop_start)
-        self.original_canvas.bind("<B1-Motion>", self._crop_drag)
-        self.original_canvas.bind("<ButtonRelease-1>", self._crop_end)
+        self.processed_canvas.bind("<ButtonPress-1>", self._crop_start)
+        self.processed_canvas.bind("<B1-Motion>", self._crop_drag)
+        self.processed_canvas.bind("<ButtonRelease-1>", self._crop_end)
+        self.root.bind("<Control-z>", self._undo)
+        self.root.bind("<Control-y>", self._redo)
+        self.root.bind("<Control-t>", self._export_trace)
     
     def _update_status(self, message):
         self.status_var.set(f"الحالة: {message}")
     
+    def _on_jobs_busy(self, busy):
+        if busy:
+            self.progress_bar.pack(side=tk.RIGHT, padx=10, pady=12)
+            self.progress_bar.start(15)
+        else:
+            self.progress_bar.stop()
+            self.progress_bar.pack_forget()
+    
+    def _working_image(self):
+        """الصورة التي تطبق عليها العمليات التفاعلية: النسخة المصغرة في وضع المعاينة"""
+        if self.proxy_mode.get() and self.proxy_image is not None:
+            return self.proxy_image
+        return self.original_image
+    
+    def _operations(self):
+        """العمليات المطبقة حتى الموضع الحالي في السجل بمعاملات الدقة الكاملة"""
+        return self.history.operations() if self.history is not None else []
+    
+    def _run_operation(self, name, message, proxy_params=None, live=False, **params):
+        """تطبيق العملية على الصورة الحالية في الخلفية وإضافتها إلى السجل عند انتهائها
+        
+        المعاملات params تخص الدقة الكاملة، و proxy_params تستبدلها عند التطبيق على النسخة المصغرة.
+        live للخطوات القادمة من المنزلقات: تحل محل خطوة المنزلق السابقة بدلاً من إضافة خطوة جديدة.
+        """
+        if self.history is None:
+            messagebox.showerror("خطأ", "لا توجد صورة محملة")
+            return
+        
+        self.jobs.cancel('live')
+        history = self.history
+        cursor = history.cursor
+        source_index = cursor
+        merge = name == 'rotate' and cursor >= 0 and history.entries[cursor].name == 'rotate'
+        if merge:
+            # الدوران المتتالي يدمج في خطوة واحدة من الصورة السابقة لتجنب تكرار الاستيفاء
+            params = {'angle': history.entries[cursor].params['angle'] + params['angle']}
+            source_index = cursor - 1
+        elif live and self._live_source_index(name) != cursor:
+            merge = True
+            source_index = cursor - 1
+        image_params = proxy_params if history.proxy and proxy_params is not None else params
+        cache = self.result_cache
+        view_size = self.processed_view.view_size()
+        
+        def work():
+            source = history.image_at(source_index)
+            cached = cache.get(source, name, image_params)
+            if cached is not None:
+                return cached
+            with profiler.span(f"operation.{name}", source):
+                result = pipeline.Pipeline([(name, image_params)]).run(source)
+                # تصغير صورة العرض يتم أيضاً في الخلفية فلا يبقى لخيط Tk إلا paste
+                processed_display = self._prerender(result, view_size)
+            cache.put(source, name, image_params, result, processed_display)
+            return result, processed_display
+        
+        def on_success(output, elapsed):
+            if history is not self.history or history.cursor != cursor:
+                return
+            result, processed_display = output
+            if merge:
+                history.pop()
+            history.push(name, params, result, proxy_params)
+            if live:
+                self._live_entry = history.entries[history.cursor]
+            self._show_result(result, processed_display)
+            status = f"تم الدوران بزاوية {params['angle']}°" if name == 'rotate' else message
+            self._update_status(f"{status} ({elapsed * 1000:.0f} ms)")
+            self._update_timing_info()
+        
+        # إذا كانت الصورة المصدر محفوظة والنتيجة في الذاكرة المؤقتة تعرض فوراً بدون مهمة خلفية
+        source = history.cached_image(source_index)
+        cached = cache.get(source, name, image_params, compute=False) if source is not None else None
+        if cached is not None:
+            self.jobs.cancel('processed')
+            on_success(cached, 0.0)
+            return
+        
+        self.jobs.submit('processed', work, on_success=on_success, on_error=self._on_operation_error)
+        self._update_status("جارٍ المعالجة...")
+    
+    def _live_source_index(self, name):
+        """موضع الصورة التي يطبق عليها المنزلق: ما قبل خطوته السابقة إن كانت هي الحالية"""
+        cursor = self.history.cursor
+        if cursor >= 0 and self.history.entries[cursor] is self._live_entry \
+                and self._live_entry.name == name:
+            return cursor - 1
+        return cursor
+    
+    def _slider_params(self, name):
+        """معاملات العملية من المنزلقات بالدقة الكاملة"""
+        if name == 'edges':
+            return {
+                'blur_kernel': self.edge_blur_var.get(),
+                'threshold1': self.threshold1_var.get(),
+                'threshold2': self.threshold2_var.get(),
+            }
+        if name == 'blur':
+            return {
+                'blur_type': self.blur_type_var.get(),
+                'kernel_size': self.blur_kernel_var.get(),
+                'quality': 'fast' if self.blur_fast_var.get() else 'exact',
+            }
+        return {'brightness': self.brightness_var.get(), 'contrast': self.contrast_var.get()}
+    
+    @staticmethod
+    def _scaled_params(name, params, scale):
+        """تصغير نواة الضبابية مع الصورة حتى تبدو المعاينة مثل النتيجة الكاملة"""
+        if name != 'blur' or scale >= 1.0:
+            return params
+        return dict(params, kernel_size=max(1, int(params['kernel_size'] * scale)) | 1)
+    
+    def _on_slider(self, name):
+        """تحريك منزلق: معاينة مؤجلة قليلاً بدقة العرض، وتطبيق كامل عند توقف الحركة"""
+        if self.history is None:
+            return
+        if self._live_preview_id is not None:
+            self.root.after_cancel(self._live_preview_id)
+        if self._live_commit_id is not None:
+            self.root.after_cancel(self._live_commit_id)
+        self._live_preview_id = self.root.after(self.live_preview_delay, self._start_live_preview, name)
+        self._live_commit_id = self.root.after(self.live_commit_delay, self._commit_live, name)
+    
+    def _start_live_preview(self, name):
+        self._live_preview_id = None
+        history = self.history
+        source_index = self._live_source_index(name)
+        params = self._slider_params(name)
+        view_size = self.processed_view.view_size()
+        # صور السجل في وضع المعاينة مصغرة أصلاً، والمعاملات مكتوبة بمقياس الصورة الكاملة
+        history_scale = self.proxy_scale if history.proxy else 1.0
+        
+        def work():
+            preview, source_scale = self._live_preview_source(history, source_index)
+            scale = history_scale * source_scale
+            result = pipeline.Pipeline([(name, self._scaled_params(name, params, scale))]).run(preview)
+            return self._prerender(result, view_size)
+        
+        def on_success(display, elapsed):
+            if history is self.history:
+                self._show_preview(display)
+                self._update_status(f"معاينة ({elapsed * 1000:.0f} ms)")
+        
+        # مفتاح مستقل: الطلب الأحدث يحل محل المنتظر فتهمل المواضع الوسيطة
+        self.jobs.submit('live', work, on_success=on_success, on_error=self._on_operation_error)
+    
+    def _live_preview_source(self, history, index):
+        """نسخة بحجم العرض من الصورة المصدر ومقياسها بالنسبة لها، تحفظ لتكرار المعاينة أثناء السحب
+
+        المقياس يحسب من صورة الموضع نفسها وليس من الأصلية، فيبقى صحيحاً بعد القص والتدوير.
+        """
+        entry = history.entries[index] if index >= 0 else None
+        key = (history, index, entry, history.proxy)
+        cached = self._live_source
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+        preview, scale = self.processor.create_proxy(history.image_at(index))
+        self._live_source = (key, preview, scale)
+        return preview, scale
+    
+    def _commit_live(self, name):
+        """تطبيق قيمة المنزلق النهائية بدقة الصورة الكاملة (أو المصغرة في وضع المعاينة)"""
+        self._live_commit_id = None
+        if self._live_preview_id is not None:
+            self.root.after_cancel(self._live_preview_id)
+            self._live_preview_id = None
+        self.jobs.cancel('live')
+        self._apply_slider_operation(name, live=True)
+    
+    def _apply_slider_operation(self, name, live=False):
+        if self.history is None:
+            messagebox.showerror("خطأ", "لا توجد صورة محملة")
+            return
+        messages = {
+            'edges': "تم تطبيق كشف الحواف",
+            'blur': "تم تطبيق الضبابية",
+            'brightness_contrast': "تم تعديل السطوع والتباين",
+        }
+        params = self._slider_params(name)
+        proxy_params = self._scaled_params(name, params, self.proxy_scale) if self.history.proxy else None
+        self._run_operation(name, messages[name], proxy_params=proxy_params, live=live, **params)
+    
+    def _on_operation_error(self, error):
+        self._update_status("فشلت المعالجة")
+        messagebox.showerror("خطأ", str(error))
+    
+    def _show_result(self, result, processed_display=None):
+        self.processed_image = result
+        self._invalidate_full_render()
+        self._display_images(processed_display)
+        if self.history.proxy and self._operations():
+            self._schedule_full_render()
+    
+    def _show_history_state(self, message):
+        """عرض صورة الموضع الحالي في السجل، فوراً من اللقطة أو بإعادة حسابها في الخلفية"""
+        self.jobs.cancel('processed')
+        self.jobs.cancel('live')
+        history = self.history
+        cached = history.cached_image()
+        if cached is not None:
+            self._show_result(cached)
+            self._update_status(message)
+            return
+        
+        view_size = self.processed_view.view_size()
+        
+        def work():
+            result = history.image_at()
+            return result, self._prerender(result, view_size)
+        
+        def on_success(output, elapsed):
+            if history is self.history:
+                self._show_result(*output)
+                self._update_status(f"{message} ({elapsed * 1000:.0f} ms)")
+        
+        self.jobs.submit('processed', work, on_success=on_success, on_error=self._on_operation_error)
+        self._update_status("جارٍ المعالجة...")
+    
+    def _undo(self, event=None):
+        if self.history is None or not self.history.can_undo:
+            return
+        self.history.undo()
+        self._show_history_state("تم التراجع")
+    
+    def _redo(self, event=None):
+        if self.history is None or not self.history.can_redo:
+            return
+        self.history.redo()
+        self._show_history_state("تمت الإعادة")
+    
+    @staticmethod
+    def _replay_operations(image, operations):
+        return pipeline.Pipeline(operations).run(image)
+    
+    def _invalidate_full_render(self):
+        self.jobs.cancel('full')
+        self.full_image = None if self._operations() else self.original_image
+        if self._idle_render_id is not None:
+            self.root.after_cancel(self._idle_render_id)
+            self._idle_render_id = None
+    
+    def _schedule_full_render(self):
+        """إعادة تطبيق العمليات بالدقة الكاملة في الخلفية بعد توقف المستخدم عن التعديل"""
+        if self._idle_render_id is not None:
+            self.root.after_cancel(self._idle_render_id)
+        self._idle_render_id = self.root.after(self.idle_render_delay, self._start_full_render)
+    
+    def _start_full_render(self):
+        self._idle_render_id = None
+        operations = self._operations()
+        
+        def on_success(result, elapsed):
+            if operations == self._operations():
+                self.full_image = result
+        
+        def on_error(error):
+            # المعالجة الخلفية اختيارية؛ الحفظ يعيد المحاولة، فيكفي التنبيه في شريط الحالة
+            self._update_status(f"فشلت المعالجة بالدقة الكاملة: {error}")
+        
+        self.jobs.submit(
+            'full', self._replay_operations, self.original_image, operations,
+            on_success=on_success, on_error=on_error
+        )
+    
+    def _full_resolution_image(self):
+        """الصورة المعالجة بالدقة الكاملة للحفظ، تحسب الآن إذا لم تكتمل في الخلفية"""
+        if not self.history.proxy:
+            return self.processed_image
+        if self.full_image is None:
+            self._update_status("جارٍ المعالجة بالدقة الكاملة...")
+            self.root.update_idletasks()
+            self._invalidate_full_render()
+            self.full_image = self._replay_operations(self.original_image, self._operations())
+        return self.full_image
+    
+    def _on_proxy_mode_change(self):
+        if self.history is None:
+            return
+        self.history.rebase(self._working_image(), proxy=self.proxy_mode.get())
+        self._show_history_state("تم تحديث المعاينة")
+    
     def _update_image_info(self):
         if self.original_image is not None:
             h, w = self.original_image.shape[:2]
             info = f"الأبعاد: {w}x{h} | الصورة: {self.current_index + 1}/{len(self.image_paths)}"
+            entry = self.library.info(self.image_paths[self.current_index]) if self.library else None
+            if entry is not None and entry['format']:
+                info += f" | {entry['format']} | {entry['size'] / (1024 * 1024):.1f} MB"
             self.image_info_var.set(info)
     
+    def _update_timing_info(self):
+        """عرض تفاصيل زمن آخر عملية بجانب معلومات الصورة عند تفعيل القياس"""
+        if not profiler.enabled:
+            return
+        events = profiler.last_root("operation.") + profiler.last_root("display")
+        self._update_image_info()
+        if events:
+            self.image_info_var.set(f"{self.image_info_var.get()} | {profiler.format_breakdown(events)}")
+    
+    def _export_trace(self, event=None):
+        """تصدير سجل القياسات بصيغة Chrome trace"""
+        if not profiler.enabled:
+            messagebox.showinfo("القياس", "القياس معطل. شغّل التطبيق مع IMAGE_APP_PROFILE=1")
+            return
+        path = filedialog.asksaveasfilename(
+            title="تصدير سجل القياس",
+            defaultextension=".json",
+            filetypes=[("Chrome trace", "*.json")]
+        )
+        if path:
+            count = profiler.export_chrome_trace(path)
+            self._update_status(f"تم تصدير {count} حدث إلى {os.path.basename(path)}")
+    
     def _open_images(self):
+        if not self.ready:
+            self._update_status("جارٍ التهيئة...")
+            return
         paths = filedialog.askopenfilenames(
             title="اختر الصور",
             filetypes=[
@@ -318,49 +878,144 @@ class ImageProcessingApp:
             ]
         )
         if paths:
-            self.image_paths = paths
-            self.current_index = 0
-            self.cumulative_angle = 0
-            self._load_image()
+            self.library_folder = None
+            self._set_paths(paths)
+            # فهرسة الملفات المختارة في الخلفية حتى تعمل التصفية عليها
+            self.jobs.submit(
+                'library', self.library.index_paths, paths, with_hash=False,
+                on_success=lambda indexed, elapsed: self._update_image_info(),
+                on_error=self._on_operation_error
+            )
+    
+    def _set_paths(self, paths, filtered=False):
+        self.image_paths = list(paths)
+        if not filtered:
+            self._unfiltered_paths = self.image_paths
+        self.current_index = 0
+        self.filmstrip.set_paths(self.image_paths)
+        self._load_image()
+    
+    def _open_folder(self):
+        """فتح مجلد كامل عبر الفهرس: الفحص الأول يقرأ الترويسات فقط، والتالي يحدث الفرق"""
+        if not self.ready:
+            self._update_status("جارٍ التهيئة...")
+            return
+        folder = filedialog.askdirectory(title="اختر مجلد الصور")
+        if not folder:
+            return
+        self._update_status("جارٍ فهرسة المجلد...")
+        
+        def on_success(stats, elapsed):
+            paths = self.library.find(folder)
+            if not paths:
+                self._update_status("لا توجد صور في المجلد")
+                return
+            self.library_folder = folder
+            self._set_paths(paths)
+            self._update_status(
+                f"{len(paths)} صورة | جديدة أو معدلة: {stats['indexed']} | "
+                f"محذوفة: {stats['removed']} | {stats['seconds']:.2f} ث"
+            )
+        
+        self.jobs.submit('library', self.library.scan, folder, with_hash=False,
+                         on_success=on_success, on_error=self._on_operation_error)
+    
+    def _filter_images(self):
+        """عرض الصور التي يتجاوز عرضها حداً أدنى من الفهرس فقط؛ الصفر يلغي التصفية"""
+        if not self._unfiltered_paths:
+            return
+        min_width = simpledialog.askinteger(
+            "تصفية", "أقل عرض بالبكسل (0 لعرض الكل):", parent=self.root, minvalue=0
+        )
+        if min_width is None:
+            return
+        if min_width == 0:
+            self._set_paths(self._unfiltered_paths, filtered=True)
+            self._update_status(f"{len(self.image_paths)} صورة")
+            return
+        if self.library_folder is not None:
+            paths = self.library.find(self.library_folder, min_width=min_width)
+        else:
+            matches = set(self.library.find(min_width=min_width))
+            paths = [path for path in self._unfiltered_paths if os.path.abspath(path) in matches]
+        if not paths:
+            self._update_status(f"لا توجد صور بعرض {min_width} بكسل أو أكثر")
+            return
+        self._set_paths(paths, filtered=True)
+        self._update_status(f"{len(paths)} صورة بعرض {min_width} بكسل أو أكثر")
     
     def _load_image(self):
+        self.jobs.cancel('processed')
+        self.filmstrip.set_current(self.current_index)
         try:
             path = self.image_paths[self.current_index]
-            self.original_image = ImageOperations.load_image(path)
-            self.processed_image = self.original_image.copy()
+            if path not in self.image_cache:
+                preview = self.image_cache.get_preview(path)
+                if preview is not None:
+                    # عرض المصغرة المحملة مسبقاً فوراً أثناء انتظار فك الصورة كاملة
+                    preview_source = render_cache.DisplayPyramid(preview)
+                    self.original_view.show(preview_source)
+                    self.processed_view.show(preview_source)
+                    self._update_status(f"جارٍ تحميل: {os.path.basename(path)}")
+                    self.root.update_idletasks()
+            self.original_image = self.image_cache.get_or_load(path)
+            # هرم العرض للأصلية يبنى مرة لكل صورة ولا يعاد رسمه مع العمليات
+            self._original_source = render_cache.DisplayPyramid(self.original_image)
+            self.proxy_image, self.proxy_scale = self.processor.create_proxy(self.original_image)
+            self.history = edit_history.EditHistory(
+                self._working_image(), self.history_budget, proxy=self.proxy_mode.get()
+            )
+            self._live_entry = None
+            self._live_source = None
+            self._invalidate_full_render()
+            # الصورة المخزنة للقراءة فقط والعمليات تنتج مصفوفات جديدة فلا حاجة للنسخ
+            self.processed_image = self._working_image()
             self._display_images()
             self._update_status(f"تم تحميل: {os.path.basename(path)}")
             self._update_image_info()
         except Exception as e:
             messagebox.showerror("خطأ", f"فشل في تحميل الصورة: {str(e)}")
+        self._prefetch_neighbours()
     
-    def _display_images(self):
-        self.original_canvas.delete("all")
-        self.processed_canvas.delete("all")
-        
-        if self.original_image is not None:
-            # عرض الصورة الأصلية
-            original_display = self.processor.prepare_for_display(self.original_image)
-            self.display_scale = original_display.width / self.original_image.shape[1]
-            self.original_imgtk = ImageTk.PhotoImage(original_display)
-            
-            canvas_width = self.original_canvas.winfo_width()
-            canvas_height = self.original_canvas.winfo_height()
-            x = (canvas_width - original_display.width) // 2
-            y = (canvas_height - original_display.height) // 2
-            
-            self.original_canvas.create_image(x, y, anchor=tk.NW, image=self.original_imgtk)
-            
-            # عرض الصورة المعالجة
-            processed_display = self.processor.prepare_for_display(self.processed_image)
-            self.processed_imgtk = ImageTk.PhotoImage(processed_display)
-            
-            canvas_width = self.processed_canvas.winfo_width()
-            canvas_height = self.processed_canvas.winfo_height()
-            x = (canvas_width - processed_display.width) // 2
-            y = (canvas_height - processed_display.height) // 2
-            
-            self.processed_canvas.create_image(x, y, anchor=tk.NW, image=self.processed_imgtk)
+    def _prefetch_neighbours(self):
+        """تحميل الصور المجاورة مسبقاً في الخلفية لتسريع التنقل"""
+        neighbours = []
+        for offset in range(1, self.prefetch_radius + 1):
+            for index in (self.current_index + offset, self.current_index - offset):
+                if 0 <= index < len(self.image_paths):
+                    neighbours.append(self.image_paths[index])
+        self.image_cache.prefetch(neighbours)
+    
+    def _display_images(self, processed_display=None):
+        with profiler.span("display"):
+            self._render_canvases(processed_display)
+    
+    def _render_canvases(self, processed_display):
+        """processed_display هرم عرض جاهز من الخيط العامل؛ اللوحة التي لم يتغير مصدرها لا ترسم"""
+        if self.original_image is None:
+            return
+        self.original_view.show(self._original_source)
+        if processed_display is None:
+            processed_display = self._display_source(self.processed_image)
+        self.processed_view.show(processed_display)
+    
+    def _display_source(self, image):
+        """هرم العرض المحفوظ إذا كانت الصورة معروضة من قبل، وإلا هرم جديد"""
+        for source in (self._original_source, self.processed_view.source):
+            if source is not None and source.image is image:
+                return source
+        return render_cache.DisplayPyramid(image)
+    
+    @staticmethod
+    def _prerender(image, view_size):
+        """بناء هرم العرض ورسمه بحجم اللوحة داخل الخيط العامل"""
+        source = render_cache.DisplayPyramid(image)
+        source.render(*view_size)
+        return source
+    
+    def _show_preview(self, processed_display):
+        """تحديث لوحة الصورة المعالجة فقط بصورة المعاينة"""
+        self.processed_view.show(processed_display)
     
     def _save_with_dialog(self):
         """حفظ مع اختيار المكان"""
@@ -369,11 +1024,10 @@ class ImageProcessingApp:
                 raise ValueError("لا توجد صورة للحفظ")
             
             path = self.image_paths[self.current_index]
-            save_path = self.processor.save_image_with_dialog(self.processed_image, path)
+            save_path = self.processor.ask_save_path(path)
             
             if save_path:
-                messagebox.showinfo("تم الحفظ", f"تم حفظ الصورة في:\n{save_path}")
-                self._update_status(f"تم الحفظ: {os.path.basename(save_path)}")
+                self._queue_save(save_path)
             else:
                 self._update_status("تم إلغاء الحفظ")
         except Exception as e:
@@ -385,59 +1039,86 @@ class ImageProcessingApp:
             if not self.image_paths:
                 raise ValueError("لا توجد صورة للحفظ")
             path = self.image_paths[self.current_index]
-            save_path = self.processor.save_image(self.processed_image, path)
-            messagebox.showinfo("تم الحفظ", f"تم حفظ الصورة في:\n{save_path}")
-            self._update_status(f"تم الحفظ: {os.path.basename(save_path)}")
+            self._queue_save(self.processor.quick_save_path(path))
         except Exception as e:
             messagebox.showerror("خطأ", str(e))
     
-    def _apply_histogram(self):
+    def _encoder_settings(self):
+        return save_queue.EncoderSettings(
+            jpeg_quality=self.jpeg_quality_var.get(),
+            jpeg_progressive=self.jpeg_progressive_var.get(),
+            jpeg_optimize=self.jpeg_optimize_var.get(),
+            png_compression=self.png_compression_var.get()
+        )
+    
+    def _queue_save(self, save_path):
+        """إرسال الصورة إلى طابور الحفظ والمتابعة في التعديل أثناء الترميز"""
+        settings = self._encoder_settings()
         try:
-            self.processed_image = ImageOperations.equalize_histogram(self.original_image)
-            self._display_images()
-            self._update_status("تم تطبيق توزيع الألوان")
-        except Exception as e:
-            messagebox.showerror("خطأ", str(e))
+            if self.history.proxy and self.full_image is None:
+                # المعالجة بالدقة الكاملة تتم أيضاً على خيط الحفظ بدلاً من تجميد الواجهة
+                original, operations = self.original_image, self._operations()
+                image = lambda: self._replay_operations(original, operations)
+            else:
+                image = self._full_resolution_image()
+            # الانتظار حتى يفرغ مكان في الطابور يجمد الواجهة، لذا يرفض الحفظ ويبلغ المستخدم
+            future = self.save_queue.submit(image, save_path, settings, block=False)
+        except Exception:
+            self.processor.finish_save(save_path, False)
+            raise
+        if future is None:
+            self.processor.finish_save(save_path, False)
+            self._update_status("طابور الحفظ ممتلئ، أعد المحاولة بعد انتهاء الحفظ الجاري")
+            return
+        self._update_status(f"جارٍ الحفظ: {os.path.basename(save_path)}")
+        self._watch_save(future, save_path)
+    
+    def _watch_save(self, future, save_path):
+        if not future.done():
+            self.root.after(50, self._watch_save, future, save_path)
+            return
+        error = future.exception()
+        # رقم الصورة التالية يتقدم فقط بعد حفظ ناجح
+        self.processor.finish_save(save_path, error is None)
+        if error is not None:
+            self._update_status(f"فشل الحفظ: {os.path.basename(save_path)}")
+            messagebox.showerror("خطأ", f"فشل في حفظ الصورة: {str(error)}")
+        else:
+            self._update_status(f"تم الحفظ: {save_path}")
+    
+    def _apply_histogram(self):
+        self._run_operation('histogram', "تم تطبيق توزيع الألوان")
     
     def _apply_edge_detection(self):
-        try:
-            self.processed_image = ImageOperations.detect_edges(self.original_image)
-            self._display_images()
-            self._update_status("تم تطبيق كشف الحواف")
-        except Exception as e:
-            messagebox.showerror("خطأ", str(e))
+        self._apply_slider_operation('edges')
             
     def _apply_invert(self):
-        try:
-            self.processed_image = ImageOperations.invert_colors(self.original_image)
-            self._display_images()
-            self._update_status("تم عكس الألوان")
-        except Exception as e:
-            messagebox.showerror("خطأ", str(e))
+        self._run_operation('invert', "تم عكس الألوان")
+ 
+    def _apply_blur(self):
+        self._apply_slider_operation('blur')
+    
+    def _apply_brightness_contrast(self):
+        self._apply_slider_operation('brightness_contrast')
  
     def _apply_rotation(self):
         try:
             angle = self.angle_var.get()
-            self.cumulative_angle += angle
-            pil_image = Image.fromarray(cv2.cvtColor(self.original_image, cv2.COLOR_BGR2RGB))
-            rotated_image = ImageOperations.rotate_image(pil_image, self.cumulative_angle)
-            self.processed_image = cv2.cvtColor(np.array(rotated_image), cv2.COLOR_RGB2BGR)
-            
-            self._display_images()
-            self._update_status(f"تم الدوران بزاوية {self.cumulative_angle}°")
         except Exception as e:
             messagebox.showerror("خطأ", str(e))
+            return
+        self._run_operation('rotate', f"تم الدوران بزاوية {angle}°", angle=angle)
 
     def _crop_start(self, event):
         self.dragging = True
         self.crop_coords['start'] = (event.x, event.y)
-        self.crop_rect = self.original_canvas.create_rectangle(
+        self.crop_rect = self.processed_canvas.create_rectangle(
             event.x, event.y, event.x, event.y, outline="red", width=2)
     
     def _crop_drag(self, event):
         if self.dragging and self.crop_coords['start']:
             x1, y1 = self.crop_coords['start']
-            self.original_canvas.coords(self.crop_rect, x1, y1, event.x, event.y)
+            self.processed_canvas.coords(self.crop_rect, x1, y1, event.x, event.y)
     
     def _crop_end(self, event):
         self.dragging = False
@@ -446,31 +1127,38 @@ class ImageProcessingApp:
     
     def _apply_crop(self):
         try:
-            x1 = int(self.crop_coords['start'][0] / self.display_scale)
-            y1 = int(self.crop_coords['start'][1] / self.display_scale)
-            x2 = int(self.crop_coords['end'][0] / self.display_scale)
-            y2 = int(self.crop_coords['end'][1] / self.display_scale)
-            
-            width = abs(x2 - x1)
-            height = abs(y2 - y1)
-            x = min(x1, x2)
-            y = min(y1, y2)
+            self.processed_canvas.delete(self.crop_rect)
+            if self.history is None:
+                return
+            # إحداثيات الصورة المعالجة الحالية (المصغرة في وضع المعاينة)
+            offset_x, offset_y = self.processed_view.offset
+            scale = self.processed_view.display_size[0] / self.processed_image.shape[1]
+            x1 = int((self.crop_coords['start'][0] - offset_x) / scale)
+            y1 = int((self.crop_coords['start'][1] - offset_y) / scale)
+            x2 = int((self.crop_coords['end'][0] - offset_x) / scale)
+            y2 = int((self.crop_coords['end'][1] - offset_y) / scale)
             
-            self.processed_image = ImageOperations.crop_image(
-                self.original_image, x, y, width, height
-            )
-            self._display_images()
-            self._update_status("تم تطبيق القص")
-            self.original_canvas.delete(self.crop_rect)
+            image_params = {
+                'x': max(0, min(x1, x2)),
+                'y': max(0, min(y1, y2)),
+                'width': abs(x2 - x1),
+                'height': abs(y2 - y1),
+            }
+            if image_params['width'] == 0 or image_params['height'] == 0:
+                return
+            if self.history.proxy:
+                s = self.proxy_scale
+                params = {key: int(value / s) for key, value in image_params.items()}
+            else:
+                params = image_params
+            self._run_operation('crop', "تم تطبيق القص", proxy_params=image_params, **params)
         except Exception as e:
             messagebox.showerror("خطأ في القص", str(e))
     
     def _reset_image(self):
-        if self.original_image is not None:
-            self.processed_image = self.original_image.copy()
-            self.cumulative_angle = 0
-            self._display_images()
-            self._update_status("تم إعادة تعيين الصورة")
+        if self.history is not None:
+            self.history.clear()
+            self._show_history_state("تم إعادة تعيين الصورة")
     
     def _previous_image(self):
         if len(self.image_paths) == 0:
@@ -478,6 +1166,11 @@ class ImageProcessingApp:
         self.current_index = max(0, self.current_index - 1)
         self._load_image()
     
+    def _select_image(self, index):
+        if index != self.current_index:
+            self.current_index = index
+            self._load_image()
+    
     def _next_image(self):
         if len(self.image_paths) == 0:
             return
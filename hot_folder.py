@@ -0,0 +1,268 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_processor import _init_worker, collect_inputs, parse_operation, process_to_path
+from image_operations import OPERATIONS
+from save_queue import EncoderSettings
+
+
+def content_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def spec_key(operations, settings=None):
+    """بصمة ثابتة لسلسلة العمليات وإعدادات الترميز؛ تغيير أي منها يعني معالجة جديدة"""
+    spec = {
+        'operations': [[name, params] for name, params in operations],
+        'settings': vars(settings or EncoderSettings()),
+    }
+    text = json.dumps(spec, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class Manifest:
+    """سجل دائم في SQLite: بصمة المحتوى + بصمة العمليات ← مسار الناتج
+
+    يحفظ أيضاً بصمة كل ملف مع حجمه ووقت تعديله حتى لا يعاد قراءة الملفات غير المتغيرة.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS outputs (
+                content_hash TEXT NOT NULL,
+                spec TEXT NOT NULL,
+                output_path TEXT NOT NULL,
+                source_path TEXT NOT NULL,
+                processed_at REAL NOT NULL,
+                PRIMARY KEY (content_hash, spec)
+            );
+        """)
+
+    def cached_hash(self, path, size, mtime_ns):
+        row = self._db.execute(
+            "SELECT content_hash FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, size, mtime_ns),
+        ).fetchone()
+        return row[0] if row else None
+
+    def remember_hash(self, path, size, mtime_ns, digest):
+        self._db.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+            (path, size, mtime_ns, digest),
+        )
+
+    def lookup(self, digest, spec):
+        row = self._db.execute(
+            "SELECT output_path FROM outputs WHERE content_hash = ? AND spec = ?", (digest, spec)
+        ).fetchone()
+        return row[0] if row else None
+
+    def forget_output(self, output_path):
+        """حذف الصفوف التي تشير إلى ملف ناتج سيعاد كتابته بمحتوى آخر"""
+        self._db.execute("DELETE FROM outputs WHERE output_path = ?", (output_path,))
+
+    def record(self, digest, spec, source_path, output_path):
+        # الملف الناتج يمثل محتوى واحداً فقط؛ أي صف قديم يشير إليه أصبح خاطئاً
+        self.forget_output(output_path)
+        self._db.execute(
+            "INSERT OR REPLACE INTO outputs (content_hash, spec, output_path, source_path, processed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (digest, spec, output_path, source_path, time.time()),
+        )
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+
+class HotFolder:
+    """معالجة الصور الجديدة أو المعدلة في مجلد مراقب مرة واحدة فقط
+
+    اسم الناتج ثابت: المسار النسبي للمصدر مع بصمة قصيرة للعمليات، فإعادة التشغيل لا تنتج
+    نسخاً جديدة. الملف يعالج بعد أن يبقى بدون تعديل settle ثانية حتى لا يقرأ أثناء نسخه.
+    """
+
+    def __init__(self, input_dir, output_dir, operations, manifest_path=None, settings=None,
+                 workers=None, settle=2.0, report=print):
+        self.input_dir = os.path.abspath(input_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        self.operations = operations
+        self.settings = settings or EncoderSettings()
+        self.workers = workers or os.cpu_count() or 1
+        self.settle = settle
+        self.report = report
+        self.spec = spec_key(operations, self.settings)
+        self.manifest = Manifest(manifest_path or os.path.join(self.output_dir, '.manifest.sqlite'))
+        # الملفات التي عولجت أو تخطيت في هذا التشغيل بحجمها ووقت تعديلها
+        self._seen = {}
+
+    def output_path(self, path):
+        relative = os.path.relpath(path, self.input_dir)
+        stem, ext = os.path.splitext(relative)
+        return os.path.join(self.output_dir, f"{stem}.{self.spec[:8]}{ext}")
+
+    def scan(self):
+        """الملفات الجاهزة التي لم تعالج بعد في هذا التشغيل مع (الحجم، وقت التعديل)"""
+        now = time.time()
+        ready = []
+        for path in collect_inputs([self.input_dir], recursive=True):
+            path = os.path.abspath(path)
+            if path.startswith(self.output_dir + os.sep):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            key = (stat.st_size, stat.st_mtime_ns)
+            if self._seen.get(path) == key or now - stat.st_mtime < self.settle:
+                continue
+            ready.append((path, key))
+        return ready
+
+    def run_once(self, executor):
+        """معالجة الفرق فقط وإرجاع (المعالجة، المتخطاة، الفاشلة)"""
+        jobs = []
+        skipped = 0
+        for path, key in self.scan():
+            digest = self.manifest.cached_hash(path, *key)
+            if digest is None:
+                try:
+                    digest = content_hash(path)
+                except OSError as e:
+                    self.report(f"FAILED {path}: {e}")
+                    continue
+                self.manifest.remember_hash(path, *key, digest)
+            target = self.output_path(path)
+            existing = self.manifest.lookup(digest, self.spec)
+            if existing is not None and os.path.exists(existing):
+                # نفس المحتوى عولج من قبل (ربما باسم آخر): نسخ الناتج بدلاً من إعادة المعالجة
+                if existing != target and not os.path.exists(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copyfile(existing, target)
+                    self.manifest.record(digest, self.spec, path, target)
+                self._seen[path] = key
+                skipped += 1
+                continue
+            # الناتج سيكتب فوقه: لا يجوز أن ينسخ منه لمحتوى قديم حتى لو فشلت المعالجة
+            self.manifest.forget_output(target)
+            jobs.append((path, key, digest, target))
+        self.manifest.commit()
+
+        processed = failed = 0
+        if jobs:
+            chunksize = max(1, len(jobs) // (self.workers * 4))
+            results = executor.map(
+                process_to_path,
+                [path for path, _, _, _ in jobs],
+                [self.operations] * len(jobs),
+                [target for _, _, _, target in jobs],
+                [self.settings] * len(jobs),
+                chunksize=chunksize,
+            )
+            for (path, key, digest, target), result in zip(jobs, results):
+                self._seen[path] = key
+                if result['error']:
+                    failed += 1
+                    self.report(f"FAILED {path}: {result['error']}")
+                    continue
+                processed += 1
+                self.manifest.record(digest, self.spec, path, target)
+                self.report(f"{path} -> {target} ({result['seconds'] * 1000:.1f} ms)")
+                # حفظ دوري حتى لا يضيع التقدم إذا توقف التشغيل في منتصف دفعة كبيرة
+                if processed % 100 == 0:
+                    self.manifest.commit()
+            self.manifest.commit()
+        return processed, skipped, failed
+
+    def watch(self, interval=2.0, once=False):
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as executor:
+            while True:
+                start = time.perf_counter()
+                processed, skipped, failed = self.run_once(executor)
+                if processed or failed or once:
+                    self.report(
+                        f"Processed {processed}, skipped {skipped} already processed, {failed} failed "
+                        f"in {time.perf_counter() - start:.2f} s"
+                    )
+                if once:
+                    return failed
+                time.sleep(interval)
+
+    def close(self):
+        self.manifest.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m hot_folder',
+        description='Watch a folder and process new or changed images exactly once.',
+    )
+    parser.add_argument('input', help='folder to watch (scanned recursively)')
+    parser.add_argument('-o', '--output', required=True, help='output directory')
+    parser.add_argument(
+        '--op', dest='operations', action='append', required=True,
+        help="operation spec, e.g. 'edges:threshold1=30,threshold2=100'; repeat to chain. "
+             f"Available: {', '.join(sorted(OPERATIONS))}",
+    )
+    parser.add_argument('--manifest', default=None,
+                        help='manifest database (default: <output>/.manifest.sqlite)')
+    parser.add_argument('--once', action='store_true', help='process the current delta and exit')
+    parser.add_argument('--interval', type=float, default=2.0, help='seconds between scans')
+    parser.add_argument('--settle', type=float, default=2.0,
+                        help='seconds a file must stay unmodified before it is processed')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes (default: CPU count)')
+    parser.add_argument('--jpeg-quality', type=int, default=95)
+    parser.add_argument('--png-compression', type=int, default=None,
+                        help='0 (fastest, largest) to 9 (slowest, smallest)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        operations = [parse_operation(spec) for spec in args.operations]
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if not os.path.isdir(args.input):
+        print(f"Input folder not found: {args.input}", file=sys.stderr)
+        return 2
+
+    settings = EncoderSettings(jpeg_quality=args.jpeg_quality, png_compression=args.png_compression)
+    folder = HotFolder(args.input, args.output, operations, args.manifest, settings,
+                       workers=args.workers, settle=0.0 if args.once else args.settle)
+    try:
+        failed = folder.watch(args.interval, once=args.once)
+    except KeyboardInterrupt:
+        failed = 0
+    finally:
+        folder.close()
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
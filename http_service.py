@@ -0,0 +1,359 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+from batch_processor import _init_worker, apply_operations, parse_operation
+from save_queue import EncoderSettings
+
+CONTENT_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp',
+    '.bmp': 'image/bmp',
+    '.tif': 'image/tiff',
+    '.tiff': 'image/tiff',
+}
+
+
+def process_bytes(data, operations, ext='.png', settings=None):
+    """فك ترميز الصورة وتطبيق العمليات وإرجاع الناتج مرمزاً (تعمل داخل العملية العاملة)"""
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image")
+    # الناتج يرمز فوراً لذا يمكن إعادة استخدام مخزنه للطلب التالي
+    processed = apply_operations(image, operations, reuse_output=True)
+    params = (settings or EncoderSettings()).imwrite_params(f"result{ext}")
+    ok, encoded = cv2.imencode(ext, processed, params)
+    if not ok:
+        raise RuntimeError(f"Failed to encode result as {ext}")
+    return encoded.tobytes()
+
+
+def process_many(requests):
+    """معالجة دفعة طلبات صغيرة في استدعاء واحد لتقليل كلفة التواصل بين العمليات"""
+    results = []
+    for data, operations, ext, settings in requests:
+        try:
+            results.append((process_bytes(data, operations, ext, settings), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+
+class MicroBatcher:
+    """تجميع الطلبات الصغيرة القريبة زمنياً في مهمة واحدة على مجموعة العمليات
+
+    الدفعة ترسل عند امتلائها بـ max_batch طلبات أو بعد max_delay ثانية من أول طلب فيها.
+    """
+
+    def __init__(self, executor, max_batch=8, max_delay=0.005):
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.batched_requests = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def submit(self, data, operations, ext, settings):
+        future = Future()
+        with self._lock:
+            self._pending.append(((data, operations, ext, settings), future))
+            if len(self._pending) >= self.max_batch:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return future
+
+    def _flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        self.batches += 1
+        self.batched_requests += len(batch)
+        futures = [future for _, future in batch]
+        try:
+            task = self.executor.submit(process_many, [request for request, _ in batch])
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        task.add_done_callback(lambda done: self._distribute(done, futures))
+
+    @staticmethod
+    def _distribute(task, futures):
+        error = task.exception()
+        results = [(None, error)] * len(futures) if error is not None else task.result()
+        for future, (data, error) in zip(futures, results):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(data)
+
+
+class ServiceMetrics:
+    """عدادات الطلبات وزمن الاستجابة لآخر window طلباً"""
+
+    def __init__(self, window=1000):
+        self.started = time.time()
+        self.received = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self._latencies = deque(maxlen=window)
+        self._finished_at = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def begin(self):
+        with self._lock:
+            self.received += 1
+            self.in_flight += 1
+
+    def reject(self):
+        with self._lock:
+            self.received += 1
+            self.rejected += 1
+
+    def end(self, latency, ok):
+        with self._lock:
+            self.in_flight -= 1
+            if ok:
+                self.completed += 1
+                self._latencies.append(latency)
+                self._finished_at.append(time.perf_counter())
+            else:
+                self.failed += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            finished = list(self._finished_at)
+            snapshot = {
+                'uptime_seconds': time.time() - self.started,
+                'received': self.received,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'in_flight': self.in_flight,
+            }
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+        if latencies:
+            snapshot['latency_ms'] = {
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+                'p99': percentile(0.99),
+                'max': latencies[-1] * 1000,
+            }
+        if len(finished) > 1:
+            snapshot['requests_per_second'] = (len(finished) - 1) / max(finished[-1] - finished[0], 1e-9)
+        return snapshot
+
+
+class ProcessingService:
+    """تنفيذ الطلبات على مجموعة عمليات عاملة مع حد للطلبات المنتظرة
+
+    عند امتلاء max_pending يرفض الطلب فوراً (429) بدلاً من تراكم الطلبات في الذاكرة.
+    الطلبات الأصغر من batch_threshold بايت تجمع في دفعات إذا كان batch_window أكبر من صفر.
+    """
+
+    def __init__(self, workers=None, max_pending=None, batch_window=0.0, max_batch=8,
+                 batch_threshold=256 * 1024, settings=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.batch_threshold = batch_threshold
+        self.settings = settings or EncoderSettings()
+        self.metrics = ServiceMetrics()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        self.batcher = MicroBatcher(self._executor, max_batch, batch_window) if batch_window > 0 else None
+
+    def try_acquire(self):
+        if self._slots.acquire(blocking=False):
+            return True
+        self.metrics.reject()
+        return False
+
+    def submit(self, data, operations, ext):
+        """جدولة طلب بعد حجز مكان له بـ try_acquire، وإرجاع Future بالبايتات المرمزة"""
+        self.metrics.begin()
+        start = time.perf_counter()
+        try:
+            if self.batcher is not None and len(data) <= self.batch_threshold:
+                future = self.batcher.submit(data, operations, ext, self.settings)
+            else:
+                future = self._executor.submit(process_bytes, data, operations, ext, self.settings)
+        except Exception:
+            self._finished(None, start)
+            raise
+        future.add_done_callback(lambda done: self._finished(done, start))
+        return future
+
+    def _finished(self, future, start):
+        self._slots.release()
+        ok = future is not None and not future.cancelled() and future.exception() is None
+        self.metrics.end(time.perf_counter() - start, ok)
+
+    def metrics_snapshot(self):
+        snapshot = self.metrics.snapshot()
+        snapshot.update({'workers': self.workers, 'max_pending': self.max_pending})
+        if self.batcher is not None:
+            snapshot['batches'] = self.batcher.batches
+            snapshot['mean_batch_size'] = self.batcher.batched_requests / max(self.batcher.batches, 1)
+        return snapshot
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """POST /process?op=edges&op=invert&format=.png بجسم من بايتات الصورة، و GET /metrics و /health"""
+
+    protocol_version = 'HTTP/1.1'
+    max_body = 200 * 1024 * 1024
+    timeout_seconds = 120
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/metrics':
+            self._send_json(200, self.server.service.metrics_snapshot())
+        elif path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': f"Unknown path {path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/process':
+            self._send_json(404, {'error': f"Unknown path {url.path}"})
+            return
+        query = parse_qs(url.query)
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0:
+            self._send_json(411, {'error': "Content-Length with the image bytes is required"})
+            return
+        if length > self.max_body:
+            self._send_json(413, {'error': f"Body larger than {self.max_body} bytes"})
+            return
+        data = self.rfile.read(length)
+
+        try:
+            operations = [parse_operation(spec) for spec in query.get('op', [])]
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        ext = query.get('format', ['.png'])[0].lower()
+        ext = ext if ext.startswith('.') else f".{ext}"
+        if ext not in CONTENT_TYPES:
+            self._send_json(400, {'error': f"Unsupported format {ext}. Available: {', '.join(CONTENT_TYPES)}"})
+            return
+
+        service = self.server.service
+        if not service.try_acquire():
+            self._send_json(429, {'error': "Too many pending requests"}, {'Retry-After': '1'})
+            return
+        try:
+            body = service.submit(data, operations, ext).result(timeout=self.timeout_seconds)
+        except FutureTimeoutError:
+            self._send_json(504, {'error': "Processing timed out"})
+            return
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+        self._send(200, body, CONTENT_TYPES[ext])
+
+    def _send_json(self, status, payload, headers=None):
+        self._send(status, json.dumps(payload).encode('utf-8'), 'application/json', headers)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m http_service',
+        description='Serve ImageOperations over HTTP on a pool of worker processes.',
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes (default: CPU count)')
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help='requests queued or running before answering 429 (default: 4 per worker)')
+    parser.add_argument('--batch-window-ms', type=float, default=0.0,
+                        help='group small requests arriving within this window (default: off)')
+    parser.add_argument('--max-batch', type=int, default=8)
+    parser.add_argument('--batch-threshold', type=int, default=256 * 1024,
+                        help='only requests up to this many bytes are batched')
+    parser.add_argument('--jpeg-quality', type=int, default=95)
+    parser.add_argument('--png-compression', type=int, default=None,
+                        help='0 (fastest, largest) to 9 (slowest, smallest)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log every request')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    service = ProcessingService(
+        workers=args.workers,
+        max_pending=args.max_pending,
+        batch_window=args.batch_window_ms / 1000,
+        max_batch=args.max_batch,
+        batch_threshold=args.batch_threshold,
+        settings=EncoderSettings(jpeg_quality=args.jpeg_quality, png_compression=args.png_compression),
+    )
+    server = ThreadingHTTPServer((args.host, args.port), RequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = args.verbose
+    print(f"Serving on http://{args.host}:{args.port} with {service.workers} workers "
+          f"(max pending {service.max_pending})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from image_operations import ImageOperations, is_jpeg
+
+
+class ImageCache:
+    """ذاكرة مؤقتة للصور المفكوكة بميزانية بايت محددة وإخلاء LRU مع تحميل مسبق في الخلفية
+
+    مع preview_size يبدأ التحميل المسبق لكل ملف JPEG بفك مصغر سريع (1/2 إلى 1/8) يحفظ
+    بميزانية منفصلة، فيمكن عرض الصورة المجاورة فوراً قبل أن يكتمل فكها كاملة.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024, loader=None, prefetch_workers=1,
+                 preview_size=None, preview_max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.loader = loader or ImageOperations.load_image
+        self.preview_size = preview_size
+        self.preview_max_bytes = preview_max_bytes
+        self.current_bytes = 0
+        self.preview_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._previews = OrderedDict()
+        self._pending = {}
+        self._pending_previews = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=prefetch_workers, thread_name_prefix="image-prefetch"
+        )
+
+    def __contains__(self, path):
+        with self._lock:
+            return path in self._entries
+
+    def get(self, path):
+        """إرجاع الصورة من الذاكرة المؤقتة أو None"""
+        with self._lock:
+            image = self._entries.get(path)
+            if image is not None:
+                self._entries.move_to_end(path)
+            return image
+
+    def get_preview(self, path):
+        """الصورة الكاملة إن كانت محفوظة، وإلا النسخة المصغرة من التحميل المسبق، أو None"""
+        with self._lock:
+            image = self._entries.get(path)
+            if image is None:
+                image = self._previews.get(path)
+                if image is not None:
+                    self._previews.move_to_end(path)
+            return image
+
+    def put(self, path, image):
+        size = image.nbytes
+        if size > self.max_bytes:
+            return
+        # الصور المخزنة مشتركة بين المستدعين، لذا تمنع الكتابة عليها
+        image.flags.writeable = False
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self.current_bytes -= old.nbytes
+            self._entries[path] = image
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+            # الصورة الكاملة تغني عن المصغرة
+            preview = self._previews.pop(path, None)
+            if preview is not None:
+                self.preview_bytes -= preview.nbytes
+
+    def _put_preview(self, path, image):
+        if image.nbytes > self.preview_max_bytes:
+            return
+        image.flags.writeable = False
+        with self._lock:
+            if path in self._entries or path in self._previews:
+                return
+            self._previews[path] = image
+            self.preview_bytes += image.nbytes
+            while self.preview_bytes > self.preview_max_bytes:
+                _, evicted = self._previews.popitem(last=False)
+                self.preview_bytes -= evicted.nbytes
+
+    def get_or_load(self, path):
+        """إرجاع الصورة من الذاكرة المؤقتة، أو انتظار التحميل المسبق الجاري، أو تحميلها مباشرة"""
+        image = self.get(path)
+        if image is not None:
+            self.hits += 1
+            return image
+
+        self.misses += 1
+        with self._lock:
+            future = self._pending.get(path)
+        if future is not None and not future.cancelled():
+            image = future.result()
+            if image is not None:
+                return image
+
+        image = self.loader(path)
+        self.put(path, image)
+        return image
+
+    def prefetch(self, paths):
+        """جدولة فك ترميز المسارات في الخلفية وإلغاء الطلبات التي لم تعد مطلوبة"""
+        wanted = set(paths)
+        with self._lock:
+            for pending in (self._pending, self._pending_previews):
+                for path, future in list(pending.items()):
+                    if path not in wanted and future.cancel():
+                        del pending[path]
+            if self.preview_size is not None:
+                # المصغرات أولاً لكل الجيران: الخيط العامل ينفذ المهام بترتيب إرسالها
+                for path in paths:
+                    if path in self._entries or path in self._previews or path in self._pending_previews \
+                            or not is_jpeg(path):
+                        continue
+                    self._pending_previews[path] = self._executor.submit(self._preview_one, path)
+            for path in paths:
+                if path in self._entries or path in self._pending:
+                    continue
+                self._pending[path] = self._executor.submit(self._prefetch_one, path)
+
+    def _preview_one(self, path):
+        try:
+            if path not in self:
+                self._put_preview(path, ImageOperations.load_image(path, target_size=self.preview_size))
+        except Exception:
+            # المصغرة اختيارية؛ خطأ الملف يظهر عند تحميله كاملاً
+            pass
+        finally:
+            with self._lock:
+                self._pending_previews.pop(path, None)
+
+    def _prefetch_one(self, path):
+        try:
+            image = self.loader(path)
+            self.put(path, image)
+            return image
+        except Exception as e:
+            print(f"Prefetch error for {path}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(path, None)
+
+    def clear(self):
+        with self._lock:
+            for future in list(self._pending.values()) + list(self._pending_previews.values()):
+                future.cancel()
+            self._pending.clear()
+            self._pending_previews.clear()
+            self._entries.clear()
+            self._previews.clear()
+            self.current_bytes = 0
+            self.preview_bytes = 0
+
+    def shutdown(self):
+        self.clear()
+        self._executor.shutdown(wait=False)
@@ -1,17 +1,138 @@
 
+import math
+
 import cv2
 import numpy as np
-from PIL import Image, ImageEnhance, ImageFilter
+from PIL import Image
+
+from point_operations import PointChain
+from profiling import profiled
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg', '.jpe', '.jfif')
+
+# أعلام فك ترميز JPEG المصغر داخل مجال DCT مرتبة من الأرخص إلى الأغلى
+REDUCED_JPEG_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# الدوران بمضاعفات 90° (عكس عقارب الساعة) بدون استيفاء
+ROTATE_CODES = {
+    90: cv2.ROTATE_90_COUNTERCLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_CLOCKWISE,
+}
+
+# مستويات دقة الضبابية: exact يطابق مرشحات OpenCV، و fast يستخدم تقريبات أسرع للنوى الكبيرة
+BLUR_QUALITIES = ('exact', 'fast')
+
+# تحت هذا الحجم لا يسبق stackBlur مرشح GaussianBlur الفصول (x0.85 عند 15، و x1.6 عند 31
+# على 12 ميجابكسل) فيستخدم المرشح الدقيق
+FAST_GAUSSIAN_MIN_KERNEL = 31
+
+
+def is_jpeg(path):
+    """الصيغ التي يمكن فكها بدقة مخفضة داخل مجال DCT"""
+    return path.lower().endswith(JPEG_EXTENSIONS)
+
+
+def _gaussian_sigma(kernel_size):
+    # نفس sigma التي يحسبها OpenCV من حجم النواة عندما تمرر صفراً
+    return 0.3 * ((kernel_size - 1) * 0.5 - 1) + 0.8
+
+
+def _box_sizes(sigma, passes=3):
+    """أحجام صناديق فردية يقارب تمريرها المتتالي Gaussian بنفس التباين"""
+    ideal = math.sqrt(12 * sigma * sigma / passes + 1)
+    lower = int(ideal)
+    if lower % 2 == 0:
+        lower -= 1
+    lower = max(lower, 1)
+    upper = lower + 2
+    # عدد التمريرات بالحجم الأصغر حتى يتطابق التباين الكلي مع sigma²
+    small = round((12 * sigma * sigma - passes * lower * lower - 4 * passes * lower - 3 * passes)
+                  / (-4 * lower - 4))
+    return [lower if i < small else upper for i in range(passes)]
+
+
+def fast_gaussian_blur(image, kernel_size, dst=None):
+    """تقريب Gaussian بزمن لا يعتمد على حجم النواة
+
+    يستخدم cv2.stackBlur إن توفر (OpenCV 4.7+)، وإلا ثلاث تمريرات صندوقية بنفس
+    التباين. الفرق عن GaussianBlur صغير في المناطق الناعمة ويظهر أساساً حول الحواف الحادة؛
+    حدوده مختبرة في tests/test_blur_accuracy.py. النوى الأصغر من FAST_GAUSSIAN_MIN_KERNEL دقيقة.
+    """
+    if kernel_size < FAST_GAUSSIAN_MIN_KERNEL:
+        return cv2.GaussianBlur(image, (kernel_size, kernel_size), 0, dst=dst)
+    if hasattr(cv2, 'stackBlur'):
+        return cv2.stackBlur(image, (kernel_size, kernel_size), dst=dst)
+    sizes = _box_sizes(_gaussian_sigma(kernel_size))
+    result = image
+    for size in sizes[:-1]:
+        result = cv2.blur(result, (size, size))
+    return cv2.blur(result, (sizes[-1], sizes[-1]), dst=dst)
+
+
+def fast_bilateral_filter(image, kernel_size, sigma_color=80, sigma_space=80, dst=None):
+    """تقريب المرشح الثنائي بالتصغير ثم الترشيح بنافذة أصغر ثم التكبير
+
+    كلفة المرشح الثنائي تتناسب مع عدد البكسلات ومربع القطر، فالتصغير بمعامل f يقللها
+    بنحو f⁴. الحواف بعد التكبير أنعم قليلاً من المرشح الدقيق، وعلى الحواف الحادة جداً
+    قد يصل الفرق في بكسلات قليلة إلى أكثر من 100 مستوى؛ حدود المتوسط والمئين 99 مختبرة في
+    tests/test_blur_accuracy.py.
+    """
+    factor = max(1, kernel_size // 5)
+    if factor == 1:
+        return cv2.bilateralFilter(image, kernel_size, sigma_color, sigma_space, dst=dst)
+    h, w = image.shape[:2]
+    small = cv2.resize(image, (max(1, w // factor), max(1, h // factor)), interpolation=cv2.INTER_AREA)
+    filtered = cv2.bilateralFilter(small, max(3, kernel_size // factor), sigma_color, sigma_space / factor)
+    return cv2.resize(filtered, (w, h), dst=dst, interpolation=cv2.INTER_LINEAR)
+
 
 class ImageOperations:
     @staticmethod
-    def load_image(path):
-        image = cv2.imread(path)
+    @profiled('load_image')
+    def load_image(path, target_size=None):
+        """تحميل الصورة، مع فك ترميز مصغر عند تحديد target_size=(العرض، الارتفاع)
+
+        الصورة الناتجة تغطي الحجم المطلوب على الأقل مع الحفاظ على النسبة. ملفات JPEG
+        تفك مباشرة بدقة 1/2 أو 1/4 أو 1/8 إذا كفت إحداها، وغير ذلك تفك الصورة كاملة
+        بدون تصغير: التصغير بعد فك كامل أبطأ من الفك الكامل وحده (PNG بـ 12 ميجابكسل:
+        427 مقابل 366 ms) والعرض يصغر الصورة على أي حال.
+        """
+        if target_size is None:
+            image = cv2.imread(path)
+        else:
+            image = ImageOperations._load_reduced(path, target_size)
         if image is None:
             raise ValueError(f"Failed to load image from {path}")
         return image
+
+    @staticmethod
+    def _load_reduced(path, target_size):
+        target_w, target_h = target_size
+        if is_jpeg(path):
+            try:
+                # قراءة الترويسة فقط لمعرفة الأبعاد دون فك الترميز
+                with Image.open(path) as header:
+                    w, h = header.size
+            except Exception:
+                w = h = None
+            if w and h:
+                # اتجاه EXIF قد يبدل الأبعاد، لذا نأخذ النسبة الأكبر من الاحتمالين
+                needed = max(min(target_w / w, target_h / h), min(target_w / h, target_h / w))
+                for factor, flag in REDUCED_JPEG_FLAGS:
+                    if 1 / factor >= needed:
+                        image = cv2.imread(path, flag)
+                        if image is not None:
+                            return image
+                        break
+        return cv2.imread(path)
     
     @staticmethod
+    @profiled('equalize_histogram')
     def equalize_histogram(image):
         """تحسين توزيع الألوان باستخدام CLAHE"""
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
@@ -20,6 +141,7 @@ class ImageOperations:
         return cv2.cvtColor(equalized, cv2.COLOR_GRAY2BGR)
 
     @staticmethod
+    @profiled('detect_edges')
     def detect_edges(image, blur_kernel=5, threshold1=50, threshold2=150):
         """كشف الحواف مع إمكانية التحكم في المعاملات"""
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
@@ -28,12 +150,33 @@ class ImageOperations:
         return cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
     
     @staticmethod
-    def rotate_image(image, angle):
-        """دوران الصورة مع الحفاظ على الجودة"""
-        rotated_image = image.rotate(angle, expand=True, fillcolor='white')
-        return rotated_image
+    @profiled('rotate_image')
+    def rotate_image(image, angle, interpolation=cv2.INTER_LINEAR, fill=(255, 255, 255)):
+        """دوران الصورة عكس عقارب الساعة مع توسيع الإطار ليحتوي الصورة كاملة
+
+        مضاعفات 90° تنفذ بنقل وقلب بدون فقدان، وباقي الزوايا بتحويل affine واحد.
+        """
+        angle = angle % 360
+        if angle == 0:
+            return image
+        if angle in ROTATE_CODES:
+            return cv2.rotate(image, ROTATE_CODES[angle])
+
+        h, w = image.shape[:2]
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+        new_w = int(round(h * sin + w * cos))
+        new_h = int(round(h * cos + w * sin))
+        # إزاحة المركز ليتوسط الإطار الموسع
+        matrix[0, 2] += new_w / 2 - w / 2
+        matrix[1, 2] += new_h / 2 - h / 2
+        return cv2.warpAffine(
+            image, matrix, (new_w, new_h),
+            flags=interpolation, borderMode=cv2.BORDER_CONSTANT, borderValue=fill
+        )
     
     @staticmethod
+    @profiled('crop_image')
     def crop_image(image, x, y, width, height):
         """قص الصورة مع التحقق من الحدود"""
         h, w = image.shape[:2]
@@ -44,39 +187,81 @@ class ImageOperations:
         return image[y:y+height, x:x+width]
     
     @staticmethod
+    @profiled('invert_colors')
     def invert_colors(image):
         """عكس الألوان"""
         return cv2.bitwise_not(image)
     
     @staticmethod
+    @profiled('adjust_brightness_contrast')
     def adjust_brightness_contrast(image, brightness=0, contrast=0):
-        """تعديل السطوع والتباين"""
-        if brightness != 0:
-            if brightness > 0:
-                shadow = brightness
-                highlight = 255
-            else:
-                shadow = 0
-                highlight = 255 + brightness
-            alpha_b = (highlight - shadow) / 255
-            gamma_b = shadow
-            image = cv2.addWeighted(image, alpha_b, image, 0, gamma_b)
-        
-        if contrast != 0:
-            f = 131 * (contrast + 127) / (127 * (131 - contrast))
-            alpha_c = f
-            gamma_c = 127 * (1 - f)
-            image = cv2.addWeighted(image, alpha_c, image, 0, gamma_c)
-        
-        return image
+        """تعديل السطوع والتباين بجدول بحث واحد بدلاً من مرورين على الصورة"""
+        if brightness == 0 and contrast == 0:
+            return image
+        chain = PointChain([('brightness_contrast', {'brightness': brightness, 'contrast': contrast})])
+        return chain.apply(image)
+    
+    @staticmethod
+    @profiled('adjust_gamma')
+    def adjust_gamma(image, gamma=1.0, channel=None):
+        """تصحيح جاما؛ القيم الأكبر من 1 تفتح الظلال"""
+        return PointChain([('gamma', {'gamma': gamma, 'channel': channel})]).apply(image)
+    
+    @staticmethod
+    @profiled('adjust_levels')
+    def adjust_levels(image, in_black=0, in_white=255, out_black=0, out_white=255, gamma=1.0, channel=None):
+        """المستويات: مد مجال الدخل [in_black, in_white] إلى مجال الخرج مع جاما للنغمات الوسطى"""
+        params = {
+            'in_black': in_black, 'in_white': in_white,
+            'out_black': out_black, 'out_white': out_white,
+            'gamma': gamma, 'channel': channel,
+        }
+        return PointChain([('levels', params)]).apply(image)
+    
+    @staticmethod
+    @profiled('apply_curves')
+    def apply_curves(image, points=((0, 0), (255, 255)), channel=None):
+        """منحنى نغمات خطي بين النقاط (الدخل، الخرج)"""
+        return PointChain([('curves', {'points': points, 'channel': channel})]).apply(image)
     
     @staticmethod
-    def apply_blur(image, blur_type='gaussian', kernel_size=15):
-        """تطبيق تأثيرات الضبابية"""
+    @profiled('apply_blur')
+    def apply_blur(image, blur_type='gaussian', kernel_size=15, quality='exact'):
+        """تطبيق تأثيرات الضبابية
+
+        quality='fast' يختار تقريبات أسرع: stack blur أو صناديق متتالية بدل Gaussian،
+        والتصغير ثم الترشيح بدل المرشح الثنائي. الوسيط في OpenCV لصور uint8 يستخدم
+        أصلاً خوارزمية الهيستوجرام ثابتة الزمن للنوى الكبيرة فلا يتغير.
+        خطأ كل تقريب مقارنة بالمرشح الدقيق يقاس بـ python -m benchmarks run --blur-accuracy.
+        """
+        if quality not in BLUR_QUALITIES:
+            raise ValueError(f"Unknown blur quality '{quality}'. Available: {', '.join(BLUR_QUALITIES)}")
+        fast = quality == 'fast'
         if blur_type == 'gaussian':
+            if fast:
+                return fast_gaussian_blur(image, kernel_size)
             return cv2.GaussianBlur(image, (kernel_size, kernel_size), 0)
         elif blur_type == 'median':
             return cv2.medianBlur(image, kernel_size)
         elif blur_type == 'bilateral':
+            if fast:
+                return fast_bilateral_filter(image, kernel_size)
             return cv2.bilateralFilter(image, kernel_size, 80, 80)
-        return image
\ No newline at end of file
+        return image
+
+
+# أسماء العمليات المتاحة للمعالجة الدفعية وما يقابلها من دوال
+OPERATIONS = {
+    'histogram': ImageOperations.equalize_histogram,
+    'edges': ImageOperations.detect_edges,
+    'invert': ImageOperations.invert_colors,
+    'crop': ImageOperations.crop_image,
+    'rotate': ImageOperations.rotate_image,
+    'brightness_contrast': ImageOperations.adjust_brightness_contrast,
+    'brightness': ImageOperations.adjust_brightness_contrast,
+    'contrast': ImageOperations.adjust_brightness_contrast,
+    'gamma': ImageOperations.adjust_gamma,
+    'levels': ImageOperations.adjust_levels,
+    'curves': ImageOperations.apply_curves,
+    'blur': ImageOperations.apply_blur,
+}
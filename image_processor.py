@@ -2,14 +2,21 @@
 import os
 import cv2
 from PIL import Image
-from tkinter import filedialog
+
+from profiling import profiled
+from save_queue import EncoderSettings, write_image
 
 class ImageProcessor:
     def __init__(self):
         self.display_width = 600
         self.display_height = 600
         self.image_counter = 1 
+        # أرقام محجوزة لحفظ تلقائي لم يكتمل بعد، حتى لا يأخذ حفظان متزامنان نفس الاسم
+        self._reserved = {}
+        self.save_dir = r"C:\Users\engfa\Desktop\Processed Images"
+        self.encoder_settings = EncoderSettings()
         
+    @profiled('prepare_for_display')
     def prepare_for_display(self, image):
         if image is None:
             return Image.new('RGB', (self.display_width, self.display_height), (0, 0, 0))
@@ -24,16 +31,28 @@ class ImageProcessor:
             print(f"Display preparation error: {e}")
             return Image.new('RGB', (self.display_width, self.display_height), (0, 0, 0))
     
-    def save_image_with_dialog(self, image, original_path, prefix="processed"):
-        """حفظ الصورة مع إمكانية اختيار المكان"""
+    def create_proxy(self, image):
+        """إنشاء نسخة مصغرة بحجم العرض لتطبيق العمليات التفاعلية عليها بسرعة"""
+        h, w = image.shape[:2]
+        scale = min(self.display_width/w, self.display_height/h)
+        if scale >= 1.0:
+            return image, 1.0
+        new_size = (max(1, int(w*scale)), max(1, int(h*scale)))
+        return cv2.resize(image, new_size, interpolation=cv2.INTER_AREA), scale
+    
+    def ask_save_path(self, original_path, prefix="processed"):
+        """اختيار مكان الحفظ من نافذة الحوار، ويرجع None عند الإلغاء"""
         # اقتراح اسم الملف
         suggested_name = f"{prefix}_{self.image_counter}_{os.path.basename(original_path)}"
         
+        # استيراد Tk هنا فقط حتى يمكن استخدام ImageProcessor بدون واجهة
+        from tkinter import filedialog
+        
         # فتح نافذة اختيار مكان الحفظ
         save_path = filedialog.asksaveasfilename(
             title="حفظ الصورة المعالجة",
             defaultextension=".jpg",
-            initialfilename=suggested_name,
+            initialfile=suggested_name,
             filetypes=[
                 ("JPEG files", "*.jpg"),
                 ("PNG files", "*.png"),
@@ -42,22 +61,46 @@ class ImageProcessor:
             ]
         )
         
-        if save_path:
-            success = cv2.imwrite(save_path, image)
-            if not success:
-                raise RuntimeError(f"Failed to save image to {save_path}")
+        return save_path or None
+    
+    def quick_save_path(self, original_path, prefix="processed"):
+        """مسار الحفظ التلقائي في مجلد الحفظ الافتراضي
+
+        الرقم يحجز فقط ولا يستهلك إلا عند نجاح الحفظ (finish_save).
+        """
+        os.makedirs(self.save_dir, exist_ok=True)
+        number = max([self.image_counter] + [n + 1 for n in self._reserved.values()])
+        filename = f"{prefix}_{number}_{os.path.basename(original_path)}"
+        save_path = os.path.join(self.save_dir, filename)
+        self._reserved[save_path] = number
+        return save_path
+
+    def finish_save(self, save_path, success):
+        """زيادة العداد بعد نجاح الحفظ فقط، وتحرير رقم الحفظ التلقائي إذا فشل أو ألغي"""
+        number = self._reserved.pop(save_path, None)
+        if not success:
+            return
+        if number is None:
             self.image_counter += 1
-            return save_path
+        else:
+            self.image_counter = max(self.image_counter, number + 1)
+
+    def _write(self, save_path, image):
+        try:
+            write_image(save_path, image, self.encoder_settings)
+        except Exception:
+            self.finish_save(save_path, False)
+            raise
+        self.finish_save(save_path, True)
+        return save_path
+    
+    def save_image_with_dialog(self, image, original_path, prefix="processed"):
+        """حفظ الصورة مع إمكانية اختيار المكان"""
+        save_path = self.ask_save_path(original_path, prefix)
+        if save_path:
+            return self._write(save_path, image)
         return None
     
     def save_image(self, image, original_path, prefix="processed"):
         """الطريقة القديمة للحفظ التلقائي"""
-        save_dir = r"C:\Users\engfa\Desktop\Processed Images"
-        os.makedirs(save_dir, exist_ok=True)
-        filename = f"{prefix}_{self.image_counter}_{os.path.basename(original_path)}"
-        save_path = os.path.join(save_dir, filename)
-        success = cv2.imwrite(save_path, image)
-        if not success:
-            raise RuntimeError(f"Failed to save image to {save_path}")
-        self.image_counter += 1
-        return save_path
\ No newline at end of file
+        return self._write(self.quick_save_path(original_path, prefix), image)
\ No newline at end of file
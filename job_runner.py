@@ -0,0 +1,133 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _Job:
+    def __init__(self, key, generation, func, args, kwargs, on_success, on_error):
+        self.key = key
+        self.generation = generation
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.on_success = on_success
+        self.on_error = on_error
+        self.submitted_at = time.perf_counter()
+
+
+class JobRunner:
+    """تشغيل عمليات المعالجة على خيوط عاملة وإرجاع النتائج إلى خيط Tk عبر root.after
+
+    كل مفتاح (مثل لوحة العرض) يشغّل مهمة واحدة على الأكثر في نفس الوقت. الطلب الأحدث
+    لنفس المفتاح يحل محل الطلب المنتظر، ونتيجة المهمة القديمة تُهمل عند انتهائها.
+    """
+
+    def __init__(self, root, max_workers=2, poll_interval=15, on_busy_change=None):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.on_busy_change = on_busy_change
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-job")
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._generations = {}
+        self._running = {}
+        self._queued = {}
+        self._polling = False
+        self._was_busy = False
+
+    @property
+    def busy(self):
+        with self._lock:
+            return bool(self._running or self._queued)
+
+    def submit(self, key, func, *args, on_success=None, on_error=None, **kwargs):
+        """إرسال مهمة جديدة للمفتاح المحدد، مع إلغاء أي طلب أقدم لنفس المفتاح"""
+        with self._lock:
+            generation = self._generations.get(key, 0) + 1
+            self._generations[key] = generation
+            job = _Job(key, generation, func, args, kwargs, on_success, on_error)
+            if key in self._running:
+                # دمج الطلبات: يبقى أحدث طلب فقط بانتظار انتهاء المهمة الجارية
+                self._queued[key] = job
+            else:
+                self._start(job)
+        self._notify_busy()
+        self._ensure_polling()
+        return generation
+
+    def cancel(self, key):
+        """إلغاء الطلبات المنتظرة وإهمال نتيجة المهمة الجارية للمفتاح المحدد"""
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._queued.pop(key, None)
+            future = self._running.get(key)
+            if future is not None and future.cancel():
+                del self._running[key]
+        self._notify_busy()
+
+    def is_current(self, key, generation):
+        with self._lock:
+            return self._generations.get(key) == generation
+
+    def shutdown(self):
+        with self._lock:
+            self._queued.clear()
+            for future in self._running.values():
+                future.cancel()
+        self._executor.shutdown(wait=False)
+
+    def _start(self, job):
+        # يُستدعى مع الاحتفاظ بالقفل
+        future = self._executor.submit(self._run, job)
+        self._running[job.key] = future
+
+    def _run(self, job):
+        if not self.is_current(job.key, job.generation):
+            self._results.put((job, None, None, True))
+            return
+        try:
+            result = job.func(*job.args, **job.kwargs)
+            self._results.put((job, result, None, False))
+        except Exception as e:
+            self._results.put((job, None, e, False))
+
+    def _ensure_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        """تسليم النتائج الجاهزة على خيط Tk الرئيسي"""
+        while True:
+            try:
+                job, result, error, skipped = self._results.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._running.pop(job.key, None)
+                next_job = self._queued.pop(job.key, None)
+                if next_job is not None:
+                    self._start(next_job)
+                current = self._generations.get(job.key) == job.generation
+            if skipped or not current:
+                continue
+            elapsed = time.perf_counter() - job.submitted_at
+            if error is not None:
+                if job.on_error:
+                    job.on_error(error)
+            elif job.on_success:
+                job.on_success(result, elapsed)
+
+        self._notify_busy()
+        if self.busy:
+            self.root.after(self.poll_interval, self._poll)
+        else:
+            self._polling = False
+
+    def _notify_busy(self):
+        busy = self.busy
+        if busy != self._was_busy:
+            self._was_busy = busy
+            if self.on_busy_change:
+                self.on_busy_change(busy)
@@ -0,0 +1,33 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """إرجاع وحدة لا تنفذ فعلياً إلا عند أول وصول إلى إحدى خصائصها
+
+    يستخدم لتأجيل تحميل OpenCV و NumPy و PIL حتى تظهر النافذة. الوحدة المحملة
+    مسبقاً تعاد كما هي.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def ensure_loaded(*modules):
+    """تنفيذ الوحدات المؤجلة الآن على الخيط الحالي
+
+    أول وصول إلى خاصية في LazyLoader غير آمن بين الخيوط: خيطان يصلان معاً قد يرى أحدهما
+    الوحدة قبل اكتمال تنفيذها. لذا تحمل الوحدات التي تستخدمها الخيوط العاملة قبل إرسال أي مهمة.
+    """
+    for module in modules:
+        # أي خاصية تكفي لتنفيذ الوحدة واستبدال صنفها بالصنف العادي
+        module.__dict__
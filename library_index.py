@@ -0,0 +1,369 @@
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+# وسوم EXIF المستخدمة: الاتجاه، تاريخ التعديل، تاريخ الالتقاط داخل Exif IFD
+EXIF_ORIENTATION = 274
+EXIF_DATETIME = 306
+EXIF_IFD = 0x8769
+EXIF_DATETIME_ORIGINAL = 36867
+
+SORT_COLUMNS = ('path', 'name', 'width', 'height', 'pixels', 'format', 'size', 'mtime_ns', 'taken_at')
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS images (
+        path TEXT PRIMARY KEY,
+        folder TEXT NOT NULL,
+        name TEXT NOT NULL,
+        width INTEGER,
+        height INTEGER,
+        format TEXT,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        taken_at TEXT,
+        phash INTEGER,
+        error TEXT,
+        indexed_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS images_folder ON images (folder);
+    CREATE INDEX IF NOT EXISTS images_width ON images (width);
+    CREATE INDEX IF NOT EXISTS images_height ON images (height);
+    CREATE INDEX IF NOT EXISTS images_mtime ON images (mtime_ns);
+    CREATE INDEX IF NOT EXISTS images_format ON images (format);
+"""
+
+
+def default_index_path():
+    """قاعدة بيانات الفهرس بجانب ذاكرة المصغرات"""
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') \
+        or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'image-processing-app', 'library.sqlite')
+
+
+def walk_images(folder, recursive=True):
+    """مسارات الصور مع stat من os.scandir بدون استدعاء stat منفصل لكل مجلد"""
+    pending = [folder]
+    while pending:
+        current = pending.pop()
+        try:
+            entries = list(os.scandir(current))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        pending.append(entry.path)
+                elif entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                    yield os.path.abspath(entry.path), entry.stat()
+            except OSError:
+                continue
+
+
+def perceptual_hash(image):
+    """بصمة dHash من 64 بت: مقارنة كل بكسل بجاره في صورة رمادية 9x8"""
+    small = image.convert('L').resize((9, 8), Image.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] < pixels[row * 9 + col + 1])
+    # SQLite يخزن أعداداً صحيحة بإشارة من 64 بت
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hamming_distance(a, b):
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count('1')
+
+
+def read_metadata(path, with_hash=True):
+    """الأبعاد والصيغة وتاريخ الالتقاط من الترويسة و EXIF فقط دون فك ترميز البكسلات
+
+    البصمة تحتاج البكسلات، لكن ملفات JPEG تفك بمقياس DCT مصغر (draft) فتبقى سريعة.
+    """
+    with Image.open(path) as image:
+        width, height = image.size
+        metadata = {'format': image.format, 'taken_at': None, 'phash': None}
+        try:
+            exif = image.getexif()
+        except Exception:
+            exif = None
+        if exif:
+            # الاتجاه 5-8 يعني أن الصورة تعرض مدارة 90 درجة
+            if exif.get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+                width, height = height, width
+            taken = None
+            if hasattr(exif, 'get_ifd'):
+                taken = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL)
+            metadata['taken_at'] = str(taken or exif.get(EXIF_DATETIME) or '') or None
+        metadata['width'] = width
+        metadata['height'] = height
+        if with_hash:
+            image.draft('L', (64, 64))
+            metadata['phash'] = perceptual_hash(image)
+    return metadata
+
+
+def _index_file(job):
+    path, size, mtime_ns, with_hash = job
+    row = {'path': path, 'size': size, 'mtime_ns': mtime_ns, 'width': None, 'height': None,
+           'format': None, 'taken_at': None, 'phash': None, 'error': None}
+    try:
+        row.update(read_metadata(path, with_hash))
+    except Exception as e:
+        row['error'] = str(e) or type(e).__name__
+    return row
+
+
+class LibraryIndex:
+    """فهرس دائم في SQLite لبيانات الصور الوصفية للفرز والتصفية دون فك ترميز أي صورة
+
+    scan يقرأ الترويسات على خيوط متوازية ويتخطى الملفات التي لم يتغير حجمها ووقت
+    تعديلها، ويحذف من الفهرس الملفات التي لم تعد موجودة. يمكن استخدامه من عدة خيوط.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_index_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            # WAL يسمح بالقراءة من الواجهة أثناء كتابة نتائج الفحص
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+
+    def scan(self, folder, recursive=True, workers=None, with_hash=True, batch_size=500, progress=None):
+        """تحديث الفهرس لمجلد وإرجاع {'indexed', 'unchanged', 'removed', 'failed', 'seconds'}"""
+        start = time.perf_counter()
+        folder = os.path.abspath(folder)
+        known = {}
+        with self._lock:
+            for row in self._db.execute(
+                    f"SELECT path, size, mtime_ns, phash IS NOT NULL OR error IS NOT NULL FROM images "
+                    f"WHERE {self._folder_clause(recursive)}", self._folder_args(folder, recursive)):
+                known[row[0]] = (row[1], row[2], row[3])
+
+        jobs = []
+        unchanged = 0
+        for path, stat in walk_images(folder, recursive):
+            previous = known.pop(path, None)
+            if previous is not None and previous[:2] == (stat.st_size, stat.st_mtime_ns) \
+                    and (previous[2] or not with_hash):
+                unchanged += 1
+                continue
+            jobs.append((path, stat.st_size, stat.st_mtime_ns, with_hash))
+
+        indexed, failed = self._index(jobs, workers, batch_size, progress)
+
+        removed = len(known)
+        if known:
+            with self._lock, self._db:
+                self._db.executemany("DELETE FROM images WHERE path = ?", [(path,) for path in known])
+        return {
+            'indexed': indexed,
+            'unchanged': unchanged,
+            'removed': removed,
+            'failed': failed,
+            'seconds': time.perf_counter() - start,
+        }
+
+    def index_paths(self, paths, workers=None, with_hash=True):
+        """فهرسة ملفات محددة (مثل اختيار نافذة فتح الملفات) مع تخطي غير المتغير منها"""
+        jobs = []
+        for path in paths:
+            path = os.path.abspath(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            previous = self.info(path)
+            if previous is not None and (previous['size'], previous['mtime_ns']) == (stat.st_size, stat.st_mtime_ns) \
+                    and (previous['phash'] is not None or previous['error'] is not None or not with_hash):
+                continue
+            jobs.append((path, stat.st_size, stat.st_mtime_ns, with_hash))
+        return self._index(jobs, workers)[0]
+
+    def _index(self, jobs, workers=None, batch_size=500, progress=None):
+        indexed = failed = 0
+        if not jobs:
+            return indexed, failed
+        # قراءة الترويسات محدودة بالقرص أكثر من المعالج، لذا تكفي الخيوط
+        workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        batch = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for row in executor.map(_index_file, jobs):
+                batch.append(row)
+                failed += row['error'] is not None
+                if len(batch) >= batch_size:
+                    indexed += self._store(batch)
+                    batch = []
+                    if progress is not None:
+                        progress(indexed, len(jobs))
+            indexed += self._store(batch)
+        return indexed, failed
+
+    def _store(self, rows):
+        if not rows:
+            return 0
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO images "
+                "(path, folder, name, width, height, format, size, mtime_ns, taken_at, phash, error, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(row['path'], os.path.dirname(row['path']), os.path.basename(row['path']),
+                  row['width'], row['height'], row['format'], row['size'], row['mtime_ns'],
+                  row['taken_at'], row['phash'], row['error'], now) for row in rows],
+            )
+        return len(rows)
+
+    @staticmethod
+    def _folder_clause(recursive):
+        # مدى على المفتاح الأساسي بدلاً من LIKE حتى يستخدم الفهرس
+        return "path >= ? AND path < ?" if recursive else "folder = ?"
+
+    @staticmethod
+    def _folder_args(folder, recursive):
+        if not recursive:
+            return (folder,)
+        prefix = folder.rstrip(os.sep) + os.sep
+        return (prefix, prefix[:-1] + chr(ord(os.sep) + 1))
+
+    def info(self, path):
+        """بيانات صورة واحدة كقاموس أو None إذا لم تفهرس"""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM images WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        return dict(row) if row is not None else None
+
+    def find(self, folder=None, recursive=True, min_width=None, max_width=None, min_height=None,
+             max_height=None, formats=None, modified_after=None, order_by='path', descending=False,
+             limit=None):
+        """مسارات الصور المطابقة للشروط مرتبة حسب order_by، من الفهرس فقط"""
+        if order_by not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort column: {order_by}. Available: {', '.join(SORT_COLUMNS)}")
+        clauses = ["error IS NULL"]
+        args = []
+        if folder is not None:
+            clauses.append(self._folder_clause(recursive))
+            args.extend(self._folder_args(os.path.abspath(folder), recursive))
+        if modified_after is not None:
+            modified_after = int(modified_after * 1e9)
+        for column, op, value in (('width', '>=', min_width), ('width', '<=', max_width),
+                                  ('height', '>=', min_height), ('height', '<=', max_height),
+                                  ('mtime_ns', '>=', modified_after)):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                args.append(value)
+        if formats:
+            clauses.append(f"format IN ({', '.join('?' * len(formats))})")
+            args.extend(f.upper() for f in formats)
+        order = 'width * height' if order_by == 'pixels' else order_by
+        query = (f"SELECT path FROM images WHERE {' AND '.join(clauses)} "
+                 f"ORDER BY {order} {'DESC' if descending else 'ASC'}, path")
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [row[0] for row in self._db.execute(query, args)]
+
+    def similar(self, path, max_distance=6, folder=None):
+        """الصور القريبة بصرياً من path حسب مسافة Hamming بين بصمات dHash، الأقرب أولاً"""
+        target = self.info(path)
+        if target is None or target['phash'] is None:
+            return []
+        clause = f"AND {self._folder_clause(True)}" if folder is not None else ""
+        args = self._folder_args(os.path.abspath(folder), True) if folder is not None else ()
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT path, phash FROM images WHERE phash IS NOT NULL AND path != ? {clause}",
+                (target['path'], *args),
+            ).fetchall()
+        matches = []
+        for other, phash in rows:
+            distance = hamming_distance(target['phash'], phash)
+            if distance <= max_distance:
+                matches.append((distance, other))
+        return [(other, distance) for distance, other in sorted(matches)]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m library_index',
+        description='Index image metadata in SQLite and query it without decoding images.',
+    )
+    parser.add_argument('--db', default=None, help=f"index database (default: {default_index_path()})")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    scan = commands.add_parser('scan', help='index or incrementally re-index a folder')
+    scan.add_argument('folder')
+    scan.add_argument('--no-recursive', dest='recursive', action='store_false')
+    scan.add_argument('--no-hash', dest='with_hash', action='store_false',
+                      help='skip the perceptual hash (headers only, fastest)')
+    scan.add_argument('-j', '--workers', type=int, default=None,
+                      help='number of reader threads (default: 4 per CPU, at most 32)')
+
+    find = commands.add_parser('find', help='list indexed images matching filters')
+    find.add_argument('folder', nargs='?', default=None)
+    find.add_argument('--min-width', type=int, default=None)
+    find.add_argument('--max-width', type=int, default=None)
+    find.add_argument('--min-height', type=int, default=None)
+    find.add_argument('--max-height', type=int, default=None)
+    find.add_argument('--format', dest='formats', action='append', default=None,
+                      help='image format as reported by PIL, e.g. JPEG or PNG; repeat for several')
+    find.add_argument('--sort', default='path', choices=SORT_COLUMNS)
+    find.add_argument('--desc', action='store_true')
+    find.add_argument('--limit', type=int, default=None)
+
+    similar = commands.add_parser('similar', help='list images visually close to an indexed image')
+    similar.add_argument('image')
+    similar.add_argument('--max-distance', type=int, default=6)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    index = LibraryIndex(args.db)
+    try:
+        if args.command == 'scan':
+            if not os.path.isdir(args.folder):
+                print(f"Folder not found: {args.folder}", file=sys.stderr)
+                return 2
+            stats = index.scan(args.folder, recursive=args.recursive, workers=args.workers,
+                               with_hash=args.with_hash)
+            print(f"Indexed {stats['indexed']}, unchanged {stats['unchanged']}, removed {stats['removed']}, "
+                  f"{stats['failed']} unreadable in {stats['seconds']:.2f} s ({len(index)} images in index)")
+        elif args.command == 'find':
+            start = time.perf_counter()
+            paths = index.find(args.folder, min_width=args.min_width, max_width=args.max_width,
+                               min_height=args.min_height, max_height=args.max_height,
+                               formats=args.formats, order_by=args.sort, descending=args.desc,
+                               limit=args.limit)
+            for path in paths:
+                print(path)
+            print(f"{len(paths)} images in {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+        else:
+            for path, distance in index.similar(args.image, args.max_distance):
+                print(f"{distance:2d}  {path}")
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
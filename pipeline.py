@@ -0,0 +1,205 @@
+import cv2
+import numpy as np
+
+from image_operations import BLUR_QUALITIES, ImageOperations, fast_bilateral_filter, fast_gaussian_blur
+from point_operations import POINT_OPERATIONS, PointChain
+from profiling import profiler
+
+BGR = 'bgr'
+GRAY = 'gray'
+ANY = 'any'
+
+
+class Step:
+    """خطوة في خط المعالجة مع فضاء الألوان المطلوب للدخل والناتج
+
+    kernel تستقبل (src, dst, pipeline, **params) وتكتب في dst أو ترجع عرضاً من src.
+    """
+
+    def __init__(self, name, kernel, input_space=ANY, output_space=None, needs_buffer=True, **params):
+        self.name = name
+        self.kernel = kernel
+        self.input_space = input_space
+        # None تعني أن الناتج بنفس فضاء الدخل
+        self.output_space = output_space
+        self.needs_buffer = needs_buffer
+        self.params = params
+
+    def __repr__(self):
+        return f"Step({self.name!r}, {self.params!r})"
+
+
+def _clahe_kernel(src, dst, pipeline):
+    if pipeline._clahe is None:
+        pipeline._clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(16, 16))
+    return pipeline._clahe.apply(src, dst)
+
+
+def _edges_kernel(src, dst, pipeline, blur_kernel=5, threshold1=50, threshold2=150):
+    blurred = pipeline._buffer(('edges_blur',), src.shape, src.dtype)
+    cv2.GaussianBlur(src, (blur_kernel, blur_kernel), 0, dst=blurred)
+    return cv2.Canny(blurred, threshold1, threshold2, edges=dst)
+
+
+def _point_kernel(src, dst, pipeline, operations):
+    if len(operations) == 1 and operations[0][0] == 'invert':
+        # العكس منفرداً أسرع بدون جدول بحث
+        return cv2.bitwise_not(src, dst=dst)
+    return PointChain(operations).apply(src, dst=dst)
+
+
+def _blur_kernel(src, dst, pipeline, blur_type='gaussian', kernel_size=15, quality='exact'):
+    if quality not in BLUR_QUALITIES:
+        raise ValueError(f"Unknown blur quality '{quality}'. Available: {', '.join(BLUR_QUALITIES)}")
+    fast = quality == 'fast'
+    if blur_type == 'gaussian':
+        if fast:
+            return fast_gaussian_blur(src, kernel_size, dst=dst)
+        return cv2.GaussianBlur(src, (kernel_size, kernel_size), 0, dst=dst)
+    elif blur_type == 'median':
+        return cv2.medianBlur(src, kernel_size, dst=dst)
+    elif blur_type == 'bilateral':
+        if fast:
+            return fast_bilateral_filter(src, kernel_size, dst=dst)
+        return cv2.bilateralFilter(src, kernel_size, 80, 80, dst=dst)
+    np.copyto(dst, src)
+    return dst
+
+
+def _crop_kernel(src, dst, pipeline, x, y, width, height):
+    h, w = src.shape[:2]
+    x = max(0, min(x, w))
+    y = max(0, min(y, h))
+    width = min(width, w - x)
+    height = min(height, h - y)
+    return src[y:y+height, x:x+width]
+
+
+def _rotate_kernel(src, dst, pipeline, angle, interpolation=cv2.INTER_LINEAR, fill=(255, 255, 255)):
+    return ImageOperations.rotate_image(src, angle, interpolation, fill)
+
+
+def _make_step(name, params):
+    if name == 'histogram':
+        return Step(name, _clahe_kernel, GRAY, **params)
+    if name == 'edges':
+        return Step(name, _edges_kernel, GRAY, **params)
+    if name == 'blur':
+        # المرشح الثنائي يقيس فرق الألوان عبر القنوات الثلاث فلا يكافئ تطبيقه على الرمادي
+        space = BGR if params.get('blur_type', 'gaussian') == 'bilateral' else ANY
+        return Step(name, _blur_kernel, space, **params)
+    if name in POINT_OPERATIONS:
+        # معامل channel يختار قناة من BGR فيحتاج ثلاث قنوات حتى بعد خطوة رمادية
+        space = BGR if params.get('channel') is not None else ANY
+        return Step('point', _point_kernel, space, operations=((name, params),))
+    if name == 'crop':
+        return Step(name, _crop_kernel, ANY, needs_buffer=False, **params)
+    if name == 'rotate':
+        # أبعاد الناتج تتغير مع الزاوية لذا يخصص الدوران مخرجه بنفسه
+        return Step(name, _rotate_kernel, ANY, needs_buffer=False, **params)
+    raise ValueError(f"Unknown pipeline operation '{name}'")
+
+
+# الأسماء نفسها المستخدمة في OPERATIONS والمعالجة الدفعية
+PIPELINE_OPERATIONS = ('histogram', 'edges', 'blur', 'crop', 'rotate') + tuple(POINT_OPERATIONS)
+
+_CONVERSIONS = {
+    (BGR, GRAY): cv2.COLOR_BGR2GRAY,
+    (GRAY, BGR): cv2.COLOR_GRAY2BGR,
+}
+
+
+class Pipeline:
+    """سلسلة عمليات تتتبع فضاء الألوان ونوع البيانات بين الخطوات
+
+    التحويلات المتعاكسة بين BGR والرمادي تحذف، والمخازن الوسيطة تخصص مرة واحدة
+    وتعاد لكل صورة لاحقة بنفس الأبعاد. مثال: الهيستوجرام ثم كشف الحواف يحول إلى
+    الرمادي مرة واحدة ويعود إلى BGR مرة واحدة في النهاية.
+    """
+
+    def __init__(self, operations=()):
+        self.steps = []
+        self._buffers = {}
+        self._clahe = None
+        for name, params in operations:
+            self.add(name, **params)
+
+    def add(self, name, **params):
+        step = _make_step(name, params)
+        if step.name == 'point' and self.steps and self.steps[-1].name == 'point':
+            # العمليات النقطية المتتالية تدمج في جدول بحث واحد ومرور واحد على الصورة
+            previous = self.steps[-1]
+            previous.params['operations'] += step.params['operations']
+            if step.input_space == BGR:
+                # الجدول المدمج لكل قناة؛ تطبيق الجزء العام على BGR يطابق تطبيقه قبل التحويل
+                previous.input_space = BGR
+        else:
+            self.steps.append(step)
+        return self
+
+    def __len__(self):
+        return len(self.steps)
+
+    def run(self, image, output_space=BGR, reuse_output=False):
+        """تنفيذ الخطوات على الصورة وإرجاع الناتج في output_space
+
+        عند reuse_output=True يكون الناتج مخزناً داخلياً يعاد استخدامه في الاستدعاء التالي.
+        """
+        space = GRAY if image.ndim == 2 else BGR
+        dtype = image.dtype
+        if dtype != np.uint8 and any(s.name in ('histogram', 'edges') for s in self.steps):
+            raise ValueError(f"CLAHE and Canny require uint8 images, got {dtype}")
+
+        current = image
+        for index, step in enumerate(self.steps):
+            if step.input_space != ANY and step.input_space != space:
+                current = self._convert(current, space, step.input_space, ('convert', index))
+                space = step.input_space
+            final = index == len(self.steps) - 1 and (step.output_space or space) == output_space
+            if not step.needs_buffer:
+                dst = None
+            elif final and not reuse_output:
+                # الخطوة الأخيرة تكتب مباشرة في مصفوفة يملكها المستدعي بدون نسخ إضافي
+                dst = np.empty(current.shape, dtype=dtype)
+            else:
+                dst = self._buffer(('step', index), current.shape, dtype)
+            with profiler.span(f"pipeline.{step.name}", current) as span:
+                current = step.kernel(current, dst, self, **step.params)
+                span.set_output(current)
+            space = step.output_space or space
+
+        if output_space != space:
+            # التحويل الأخير يكتب في مصفوفة جديدة يملكها المستدعي
+            if reuse_output:
+                current = self._convert(current, space, output_space, ('output',))
+            else:
+                current = cv2.cvtColor(current, _CONVERSIONS[(space, output_space)])
+        elif current is image:
+            current = image.copy()
+        elif not reuse_output and self._owns(current):
+            current = current.copy()
+        return current
+
+    def _convert(self, image, source_space, target_space, slot):
+        channels = 3 if target_space == BGR else None
+        shape = image.shape[:2] + ((channels,) if channels else ())
+        dst = self._buffer(slot, shape, image.dtype)
+        return cv2.cvtColor(image, _CONVERSIONS[(source_space, target_space)], dst=dst)
+
+    def _buffer(self, slot, shape, dtype):
+        """مخزن مخصص مسبقاً لكل موضع في السلسلة ويعاد استخدامه بين الصور"""
+        key = (slot, shape, np.dtype(dtype))
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            # الاحتفاظ بمخزن واحد لكل موضع حتى لا تتراكم مخازن أبعاد قديمة
+            for old_key in [k for k in self._buffers if k[0] == slot]:
+                del self._buffers[old_key]
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[key] = buffer
+        return buffer
+
+    def _owns(self, array):
+        return any(np.may_share_memory(array, buffer) for buffer in self._buffers.values())
+
+    def clear_buffers(self):
+        self._buffers.clear()
@@ -0,0 +1,131 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+_LEVELS = np.arange(256, dtype=np.float64)
+
+
+def _saturate(values):
+    # نفس تقريب OpenCV (saturate_cast) حتى تطابق النتائج addWeighted تماماً
+    return np.clip(np.rint(values), 0, 255)
+
+
+def _brightness(values, brightness=0):
+    if brightness == 0:
+        return values
+    if brightness > 0:
+        shadow = brightness
+        highlight = 255
+    else:
+        shadow = 0
+        highlight = 255 + brightness
+    alpha = (highlight - shadow) / 255
+    return _saturate(values * alpha + shadow)
+
+
+def _contrast(values, contrast=0):
+    if contrast == 0:
+        return values
+    f = 131 * (contrast + 127) / (127 * (131 - contrast))
+    return _saturate(values * f + 127 * (1 - f))
+
+
+def _brightness_contrast(values, brightness=0, contrast=0):
+    return _contrast(_brightness(values, brightness), contrast)
+
+
+def _invert(values):
+    return 255 - values
+
+
+def _gamma(values, gamma=1.0):
+    """gamma أكبر من 1 يفتح الظلال"""
+    return _saturate(255 * (values / 255) ** (1 / gamma))
+
+
+def _levels(values, in_black=0, in_white=255, out_black=0, out_white=255, gamma=1.0):
+    normalized = np.clip((values - in_black) / max(in_white - in_black, 1), 0, 1)
+    return _saturate(out_black + (out_white - out_black) * normalized ** (1 / gamma))
+
+
+def _curves(values, points=((0, 0), (255, 255))):
+    xs, ys = zip(*sorted(points))
+    return _saturate(np.interp(values, xs, ys))
+
+
+POINT_OPERATIONS = {
+    'brightness': _brightness,
+    'contrast': _contrast,
+    'brightness_contrast': _brightness_contrast,
+    'invert': _invert,
+    'gamma': _gamma,
+    'levels': _levels,
+    'curves': _curves,
+}
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def freeze_operations(operations):
+    """تحويل سلسلة (الاسم، المعاملات) إلى مفتاح قابل للتخزين المؤقت"""
+    return tuple(
+        (name, tuple(sorted((k, _freeze(v)) for k, v in params.items())))
+        for name, params in operations
+    )
+
+
+@lru_cache(maxsize=256)
+def build_lut(frozen_operations):
+    """تركيب سلسلة العمليات النقطية في جدول بحث واحد من 256 قيمة لكل قناة
+
+    معامل channel الاختياري في أي عملية يقصرها على قناة واحدة (0=B، 1=G، 2=R)،
+    وعندها يكون الجدول بشكل (256, 1, 3) بدلاً من (256,).
+    """
+    per_channel = any(dict(params).get('channel') is not None for _, params in frozen_operations)
+    tables = [_LEVELS.copy() for _ in range(3 if per_channel else 1)]
+    for name, params in frozen_operations:
+        if name not in POINT_OPERATIONS:
+            raise ValueError(f"Unknown point operation '{name}'")
+        params = dict(params)
+        channel = params.pop('channel', None)
+        for index, table in enumerate(tables):
+            if channel is None or channel == index:
+                tables[index] = POINT_OPERATIONS[name](table, **params)
+
+    if per_channel:
+        lut = np.stack(tables, axis=-1).reshape(256, 1, 3)
+    else:
+        lut = tables[0]
+    lut = lut.astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+class PointChain:
+    """سلسلة عمليات نقطية (سطوع، تباين، عكس، جاما، مستويات، منحنيات) تنفذ بمرور واحد"""
+
+    def __init__(self, operations=()):
+        self.operations = [(name, dict(params)) for name, params in operations]
+
+    def add(self, name, **params):
+        if name not in POINT_OPERATIONS:
+            raise ValueError(f"Unknown point operation '{name}'")
+        self.operations.append((name, params))
+        return self
+
+    def lut(self):
+        return build_lut(freeze_operations(self.operations))
+
+    def apply(self, image, dst=None):
+        """تطبيق الجدول المركب باستدعاء cv2.LUT واحد"""
+        if image.dtype != np.uint8:
+            raise ValueError(f"Point operations require uint8 images, got {image.dtype}")
+        lut = self.lut()
+        if lut.ndim == 3 and (image.ndim != 3 or image.shape[2] != 3):
+            raise ValueError("Per-channel point operations require a 3-channel image")
+        return cv2.LUT(image, lut, dst=dst)
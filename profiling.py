@@ -0,0 +1,201 @@
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+
+def _nbytes(value):
+    """حجم البيانات بالبايت لمصفوفات NumPy وصور PIL، وصفر لغيرها"""
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is not None:
+        return nbytes
+    size = getattr(value, 'size', None)
+    getbands = getattr(value, 'getbands', None)
+    if getbands is not None and isinstance(size, tuple):
+        return size[0] * size[1] * len(getbands())
+    return 0
+
+
+class _NullSpan:
+    """سياق فارغ يعاد عند تعطيل القياس حتى تكون الكلفة شبه معدومة"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_output(self, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, profiler, name, bytes_in):
+        self.profiler = profiler
+        self.name = name
+        self.bytes_in = bytes_in
+        self.bytes_out = 0
+        self.peak = 0
+
+    def set_output(self, value):
+        self.bytes_out = _nbytes(value)
+
+    def __enter__(self):
+        local = self.profiler._local
+        stack = getattr(local, 'stack', None)
+        if stack is None:
+            stack = local.stack = []
+        self.parent = stack[-1] if stack else None
+        self.root_id = self.parent.root_id if self.parent else next(self.profiler._ids)
+        if self.profiler.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None:
+                self.parent.peak = max(self.parent.peak, peak)
+            tracemalloc.reset_peak()
+            self.memory_start = current
+        else:
+            self.memory_start = None
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self.start
+        self.profiler._local.stack.pop()
+        peak_bytes = None
+        if self.memory_start is not None and tracemalloc.is_tracing():
+            peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            peak_bytes = max(0, peak - self.memory_start)
+            if self.parent is not None:
+                self.parent.peak = max(self.parent.peak, peak)
+        self.profiler._record({
+            'name': self.name,
+            'start': self.start,
+            'duration': duration,
+            'thread': threading.get_ident(),
+            'root': self.root_id,
+            'depth': len(self.profiler._local.stack),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'peak_bytes': peak_bytes,
+        })
+        return False
+
+
+class Profiler:
+    """تسجيل زمن كل استدعاء وحجم البيانات الداخلة والخارجة وذروة الذاكرة
+
+    معطل افتراضياً؛ يفعل بمتغير البيئة IMAGE_APP_PROFILE=1 وقياس الذاكرة بـ
+    IMAGE_APP_PROFILE_MEMORY=1. ذروة الذاكرة تقريبية عند عمل عدة خيوط في نفس الوقت.
+    """
+
+    def __init__(self, enabled=False, trace_memory=False, max_events=10000):
+        self.enabled = enabled
+        self.trace_memory = False
+        self.events = deque(maxlen=max_events)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._origin = time.perf_counter()
+        if trace_memory:
+            self.enable(trace_memory=True)
+
+    def enable(self, trace_memory=False):
+        self.enabled = True
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.trace_memory = False
+
+    def span(self, name, input=None):
+        """سياق لقياس كتلة من الكود؛ يرجع سياقاً فارغاً عند التعطيل"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, _nbytes(input))
+
+    def _record(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+
+    def last_root(self, prefix=''):
+        """أحداث آخر عملية رئيسية يبدأ اسمها بـ prefix، مرتبة حسب وقت البدء"""
+        with self._lock:
+            events = list(self.events)
+        root = next(
+            (e for e in reversed(events) if e['depth'] == 0 and e['name'].startswith(prefix)),
+            None,
+        )
+        if root is None:
+            return []
+        return sorted((e for e in events if e['root'] == root['root']), key=lambda e: e['start'])
+
+    @staticmethod
+    def format_breakdown(events):
+        parts = []
+        for event in events:
+            text = f"{event['name']} {event['duration'] * 1000:.0f} ms"
+            if event['peak_bytes']:
+                text += f" ({event['peak_bytes'] / (1024 * 1024):.0f} MB)"
+            parts.append(text)
+        return " | ".join(parts)
+
+    def export_chrome_trace(self, path):
+        """كتابة السجل بصيغة Chrome trace-event لفتحه في chrome://tracing أو Perfetto"""
+        with self._lock:
+            events = list(self.events)
+        pid = os.getpid()
+        trace_events = []
+        for event in events:
+            args = {'bytes_in': event['bytes_in'], 'bytes_out': event['bytes_out']}
+            if event['peak_bytes'] is not None:
+                args['peak_bytes'] = event['peak_bytes']
+            trace_events.append({
+                'name': event['name'],
+                'ph': 'X',
+                'ts': (event['start'] - self._origin) * 1e6,
+                'dur': event['duration'] * 1e6,
+                'pid': pid,
+                'tid': event['thread'],
+                'args': args,
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+        return len(trace_events)
+
+
+profiler = Profiler(
+    enabled=os.environ.get('IMAGE_APP_PROFILE') == '1',
+    trace_memory=os.environ.get('IMAGE_APP_PROFILE_MEMORY') == '1',
+)
+
+
+def profiled(name):
+    """مزخرف يقيس الدالة عند تفعيل القياس، ويكلف فحص شرط واحد فقط عند التعطيل"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            image = next((a for a in args if _nbytes(a)), None)
+            with _Span(profiler, name, _nbytes(image)) as span:
+                result = func(*args, **kwargs)
+                span.set_output(result)
+                return result
+        return wrapper
+    return decorator
@@ -0,0 +1,148 @@
+import threading
+
+import cv2
+from PIL import Image
+
+from profiling import profiled
+
+# حجم العرض قبل أن تأخذ اللوحة أبعادها الحقيقية
+DEFAULT_VIEW_SIZE = (600, 600)
+
+
+def fit_size(width, height, view_width, view_height):
+    """أكبر حجم يحفظ النسبة داخل اللوحة"""
+    scale = min(view_width / width, view_height / height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+class DisplayPyramid:
+    """مستويات مصغرة بالنصف من صورة BGR لرسمها بأي حجم لوحة بتكلفة صغيرة
+
+    المستويات تبنى عند الحاجة فقط، وآخر صورة مرسومة تحفظ حتى لا تعاد لنفس الحجم. تغيير
+    حجم النافذة يصغر أقرب مستوى أكبر من اللوحة بدلاً من الصورة الكاملة.
+    """
+
+    def __init__(self, image):
+        self.image = image
+        self.width = image.shape[1]
+        self.height = image.shape[0]
+        self._levels = [image]
+        self._rendered = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache_bytes(self):
+        # المستوى الأول هو الصورة نفسها ولا يحسب مرة أخرى
+        extra = sum(level.nbytes for level in self._levels[1:])
+        if self._rendered is not None:
+            width, height = self._rendered.size
+            extra += width * height * 3
+        return extra
+
+    def fit(self, view_width, view_height):
+        return fit_size(self.width, self.height, view_width, view_height)
+
+    def _level_for(self, width, height):
+        """أصغر مستوى لا يقل عن الحجم المطلوب، مع بناء المستويات الناقصة"""
+        level = self._levels[-1]
+        while level.shape[1] // 2 >= width and level.shape[0] // 2 >= height:
+            level = cv2.resize(level, (level.shape[1] // 2, level.shape[0] // 2), interpolation=cv2.INTER_AREA)
+            self._levels.append(level)
+        for level in reversed(self._levels):
+            if level.shape[1] >= width and level.shape[0] >= height:
+                return level
+        return self._levels[0]
+
+    @profiled('render')
+    def render(self, view_width, view_height):
+        """صورة PIL بصيغة RGB بحجم اللوحة"""
+        width, height = self.fit(view_width, view_height)
+        with self._lock:
+            if self._rendered is not None and self._rendered.size == (width, height):
+                return self._rendered
+            level = self._level_for(width, height)
+            if (level.shape[1], level.shape[0]) != (width, height):
+                # التكبير للصور الصغيرة والتصغير من مستوى قريب؛ التحويل إلى RGB بعد التصغير
+                interpolation = cv2.INTER_AREA if level.shape[1] > width else cv2.INTER_LINEAR
+                level = cv2.resize(level, (width, height), interpolation=interpolation)
+            code = cv2.COLOR_GRAY2RGB if level.ndim == 2 else cv2.COLOR_BGR2RGB
+            self._rendered = Image.fromarray(cv2.cvtColor(level, code))
+            return self._rendered
+
+
+class CanvasRenderer:
+    """لوحة تعرض DisplayPyramid وتعيد استخدام PhotoImage نفسه عبر paste
+
+    عرض نفس المصدر بنفس الحجم لا يفعل شيئاً، وتغيير حجم اللوحة يعيد الرسم من الهرم
+    المحفوظ بعد أن تهدأ أحداث <Configure>.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.source = None
+        self.photo = None
+        self.item = None
+        self.offset = (0, 0)
+        self.display_size = (0, 0)
+        self._view_size = None
+        self._redraw_id = None
+        canvas.bind('<Configure>', self._on_configure, add='+')
+
+    def view_size(self):
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            return DEFAULT_VIEW_SIZE
+        return width, height
+
+    def show(self, source):
+        """عرض المصدر إن تغير هو أو حجم اللوحة؛ يرجع False إذا لم يلزم أي رسم"""
+        if source is self.source and self._view_size == self.view_size():
+            return False
+        self.source = source
+        self._draw()
+        return True
+
+    def _draw(self):
+        view_size = self.view_size()
+        display = self.source.render(*view_size)
+        self._blit(display)
+        self._view_size = view_size
+
+    def _blit(self, display):
+        # ImageTk يحمل tkinter، لذا يستورد هنا حتى يبقى الهرم قابلاً للاستخدام بدون واجهة
+        from PIL import ImageTk
+        if self.photo is not None and (self.photo.width(), self.photo.height()) == display.size:
+            self.photo.paste(display)
+        else:
+            self.photo = ImageTk.PhotoImage(display)
+            if self.item is not None:
+                self.canvas.itemconfigure(self.item, image=self.photo)
+        view_width, view_height = self.view_size()
+        x = (view_width - display.width) // 2
+        y = (view_height - display.height) // 2
+        if self.item is None:
+            self.item = self.canvas.create_image(x, y, anchor='nw', image=self.photo)
+        else:
+            self.canvas.coords(self.item, x, y)
+        self.offset = (x, y)
+        self.display_size = display.size
+
+    def _on_configure(self, event):
+        if self.source is None or (event.width, event.height) == self._view_size:
+            return
+        if self._redraw_id is not None:
+            self.canvas.after_cancel(self._redraw_id)
+        self._redraw_id = self.canvas.after(50, self._redraw)
+
+    def _redraw(self):
+        self._redraw_id = None
+        if self.source is not None and self._view_size != self.view_size():
+            self._draw()
+
+    def clear(self):
+        if self.item is not None:
+            self.canvas.delete(self.item)
+        self.source = None
+        self.photo = None
+        self.item = None
+        self._view_size = None
@@ -0,0 +1,117 @@
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from point_operations import freeze_operations
+
+def _display_bytes(display):
+    if display is None:
+        return 0
+    cache_bytes = getattr(display, 'cache_bytes', None)
+    if cache_bytes is not None:
+        return cache_bytes
+    width, height = display.size
+    return width * height * len(display.getbands())
+
+
+class ResultCache:
+    """ذاكرة مؤقتة لنتائج العمليات بمفتاح من بصمة الصورة واسم العملية ومعاملاتها
+
+    يمكن أن تحفظ مع كل نتيجة هرم العرض الجاهز (DisplayPyramid)، فيتجاوز
+    إعادة اختيار عملية سابقة كلاً من معالجة OpenCV والتصغير. الإخلاء LRU بميزانية بايت.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+
+    def _memo(self, image):
+        if image.flags.writeable:
+            return None
+        with self._lock:
+            memo = self._fingerprints.get(id(image))
+        if memo is not None and memo[0]() is image:
+            return memo[1]
+        return None
+
+    def fingerprint(self, image):
+        """بصمة من الأبعاد ونوع البيانات وكل بكسلات الصورة
+
+        العينة الجزئية قد تعطي صورتين مختلفتين نفس البصمة (تعديل موضعي صغير) فترجع نتيجة
+        خاطئة، لذا يحسب الهاش على المخزن كاملاً. الصور غير القابلة للكتابة لا تتغير،
+        فتحفظ بصمتها حسب هوية المصفوفة ولا يعاد حسابها.
+        """
+        memo_key = id(image)
+        fingerprint = self._memo(image)
+        if fingerprint is not None:
+            return fingerprint
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((image.shape, image.dtype.str)).encode('utf-8'))
+        if image.flags.c_contiguous:
+            digest.update(image)
+        else:
+            # عرض مقصوص: كل صف متصل فيهضم صفاً صفاً بدون نسخ الصورة كاملة
+            for row in image:
+                digest.update(np.ascontiguousarray(row))
+        fingerprint = digest.hexdigest()
+
+        if not image.flags.writeable:
+            with self._lock:
+                self._fingerprints[memo_key] = (weakref.ref(image), fingerprint)
+            weakref.finalize(image, self._forget, memo_key)
+        return fingerprint
+
+    def _forget(self, memo_key):
+        with self._lock:
+            self._fingerprints.pop(memo_key, None)
+
+    def _key(self, image, name, params):
+        return (self.fingerprint(image),) + freeze_operations([(name, params)])
+
+    def get(self, image, name, params, compute=True):
+        """إرجاع (النتيجة، صورة العرض) أو None
+
+        compute=False لا يحسب بصمة جديدة (هاش الصورة كاملة مكلف) ويكتفي بالمحفوظة، لخيط الواجهة.
+        """
+        if not compute and self._memo(image) is None:
+            return None
+        key = self._key(image, name, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, image, name, params, result, display=None):
+        key = self._key(image, name, params)
+        size = result.nbytes + _display_bytes(display)
+        if size > self.max_bytes:
+            return
+        # النتيجة مشتركة بين المستدعين لذا تمنع الكتابة عليها
+        result.flags.writeable = False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+            self._entries[key] = (result, display, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
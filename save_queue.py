@@ -0,0 +1,91 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from profiling import profiler
+
+
+class EncoderSettings:
+    """إعدادات الترميز عند الحفظ: الموازنة بين زمن الترميز وحجم الملف
+
+    png_compression من 0 (أسرع وأكبر) إلى 9 (أبطأ وأصغر)، و None يترك قيم OpenCV الافتراضية.
+    """
+
+    def __init__(self, jpeg_quality=95, jpeg_progressive=False, jpeg_optimize=False,
+                 png_compression=None, webp_quality=None):
+        self.jpeg_quality = jpeg_quality
+        self.jpeg_progressive = jpeg_progressive
+        self.jpeg_optimize = jpeg_optimize
+        self.png_compression = png_compression
+        self.webp_quality = webp_quality
+
+    def imwrite_params(self, path):
+        """معاملات cv2.imwrite المناسبة لامتداد الملف"""
+        ext = os.path.splitext(path)[1].lower()
+        params = []
+        if ext in ('.jpg', '.jpeg', '.jpe'):
+            params += [cv2.IMWRITE_JPEG_QUALITY, int(self.jpeg_quality)]
+            if self.jpeg_progressive:
+                params += [cv2.IMWRITE_JPEG_PROGRESSIVE, 1]
+            if self.jpeg_optimize:
+                params += [cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+        elif ext == '.png' and self.png_compression is not None:
+            params += [cv2.IMWRITE_PNG_COMPRESSION, int(self.png_compression)]
+        elif ext == '.webp' and self.webp_quality is not None:
+            params += [cv2.IMWRITE_WEBP_QUALITY, int(self.webp_quality)]
+        return params
+
+
+def write_image(path, image, settings=None):
+    """ترميز الصورة وكتابتها مع رفع خطأ عند الفشل
+
+    image يمكن أن تكون دالة تنتج الصورة، فتحسب على الخيط العامل قبل الترميز.
+    """
+    if callable(image):
+        image = image()
+    params = (settings or EncoderSettings()).imwrite_params(path)
+    with profiler.span('imwrite', image):
+        success = cv2.imwrite(path, image, params)
+    if not success:
+        raise RuntimeError(f"Failed to save image to {path}")
+    return path
+
+
+class SaveQueue:
+    """طابور حفظ يرمّز الصور على خيوط عاملة (OpenCV يحرر GIL أثناء الترميز)
+
+    عدد الصور المنتظرة محدود بـ max_pending حتى لا تتراكم نسخ كثيرة في الذاكرة؛
+    submit ينتظر عند امتلاء الطابور، أو يرجع None فوراً مع block=False (لخيط الواجهة).
+    يجب ألا تعدل الصورة بعد إرسالها.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, settings=None):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.settings = settings or EncoderSettings()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="image-save")
+        self._slots = threading.BoundedSemaphore(max_pending or self.max_workers * 4)
+
+    def submit(self, image, path, settings=None, on_done=None, block=True):
+        """جدولة حفظ الصورة وإرجاع Future قيمتها مسار الملف، أو None إذا امتلأ الطابور و block=False
+
+        on_done إن وجدت تستدعى على الخيط العامل بالمعاملات (path, error).
+        """
+        if not self._slots.acquire(blocking=block):
+            return None
+        try:
+            future = self._executor.submit(write_image, path, image, settings or self.settings)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._finished(f, path, on_done))
+        return future
+
+    def _finished(self, future, path, on_done):
+        self._slots.release()
+        if on_done is not None and not future.cancelled():
+            on_done(path, future.exception())
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
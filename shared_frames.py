@@ -0,0 +1,297 @@
+import secrets
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from batch_processor import _init_worker, apply_operations
+
+
+class FrameDescriptor:
+    """وصف صغير لمقطع ذاكرة مشتركة يرسل بين العمليات بدلاً من بيانات الصورة"""
+
+    __slots__ = ('name', 'shape', 'dtype')
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype).str
+
+    def __getstate__(self):
+        return self.name, self.shape, self.dtype
+
+    def __setstate__(self, state):
+        self.name, self.shape, self.dtype = state
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+
+def _segment_name():
+    """اسم مقطع تختاره الأم مسبقاً للناتج الذي قد ينشئه العامل"""
+    return f"psm_{secrets.token_hex(8)}"
+
+
+def _attach(name):
+    """فتح مقطع أنشأته الأم داخل العامل بدون تسجيله في متتبع الموارد
+
+    المتتبع مشترك مع الأم ويحفظ كل اسم مرة واحدة، فالتسجيل يبقى للأم وحدها: لو سجل العامل
+    ثم ألغى التسجيل لحذف تسجيل الأم نفسه، ولم تحذف المقاطع إذا توقفت الأم فجأة.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # قبل Python 3.13 يسجل كل فتح تلقائياً؛ العامل ينفذ مهمة واحدة في نفس الوقت لذا يكفي
+    # تعطيل التسجيل مؤقتاً أثناء الفتح
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _discard(name):
+    """حذف مقطع بالاسم إن وجد (مقطع ناتج أنشأه عامل توقف قبل أن تتملكه الأم)"""
+    try:
+        segment = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    segment.close()
+    segment.unlink()
+
+
+def _view(segment, descriptor):
+    return np.ndarray(descriptor.shape, dtype=descriptor.dtype, buffer=segment.buf)
+
+
+class SharedFrame:
+    """صورة في ذاكرة مشتركة تملكها العملية الأم، مع عداد مراجع يحذف المقطع عند الصفر"""
+
+    def __init__(self, registry, segment, descriptor):
+        self._registry = registry
+        self._segment = segment
+        self.descriptor = descriptor
+        self.array = _view(segment, descriptor)
+        self.refs = 1
+
+    def retain(self):
+        self._registry.retain(self)
+        return self
+
+    def release(self):
+        self._registry.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def _destroy(self):
+        # يجب حذف العرض قبل إغلاق المقطع وإلا يرفض mmap الإغلاق
+        self.array = None
+        try:
+            self._segment.close()
+        except BufferError:
+            # المستدعي ما زال يحتفظ بعرض من الصورة؛ الذاكرة تحرر عند حذفه
+            pass
+        try:
+            self._segment.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedFrameRegistry:
+    """سجل مقاطع الذاكرة المشتركة في العملية الأم
+
+    العمليات العاملة تفتح المقاطع بالاسم فقط ولا تحذفها، فالأم وحدها تملكها وتحذفها عند
+    انتهاء المراجع أو عند close، حتى لو توقف عامل فجأة. إذا توقفت الأم نفسها يحذف متتبع
+    موارد multiprocessing المقاطع المتبقية.
+    """
+
+    def __init__(self):
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def create(self, shape, dtype=np.uint8):
+        descriptor = FrameDescriptor(None, shape, dtype)
+        segment = shared_memory.SharedMemory(create=True, size=max(descriptor.nbytes, 1))
+        descriptor.name = segment.name
+        return self._register(segment, descriptor)
+
+    def share(self, image):
+        """نسخ الصورة مرة واحدة إلى مقطع جديد؛ بعدها لا تنسخ عند إرسالها إلى العمال"""
+        frame = self.create(image.shape, image.dtype)
+        np.copyto(frame.array, image)
+        return frame
+
+    def adopt(self, descriptor):
+        """تملك مقطع أنشأه عامل (ناتج بأبعاد مختلفة) وحذفه مع باقي المقاطع
+
+        الفتح هنا يسجل المقطع في متتبع الموارد لأول مرة، فيحذف إذا توقفت الأم فجأة.
+        """
+        segment = shared_memory.SharedMemory(name=descriptor.name)
+        return self._register(segment, descriptor)
+
+    def _register(self, segment, descriptor):
+        frame = SharedFrame(self, segment, descriptor)
+        with self._lock:
+            self._frames[descriptor.name] = frame
+        return frame
+
+    def retain(self, frame):
+        with self._lock:
+            frame.refs += 1
+
+    def release(self, frame):
+        with self._lock:
+            frame.refs -= 1
+            if frame.refs > 0 or self._frames.pop(frame.descriptor.name, None) is None:
+                return
+        frame._destroy()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._frames)
+
+    def close(self):
+        with self._lock:
+            frames, self._frames = list(self._frames.values()), {}
+        for frame in frames:
+            frame._destroy()
+
+
+def apply_shared(operations, source, result, spare_name):
+    """تنفيذ العمليات داخل العامل على مقطع المصدر وكتابة الناتج في مقطع الناتج
+
+    إذا اختلفت أبعاد الناتج (القص والدوران) ينشأ مقطع جديد باسم spare_name الذي اختارته
+    الأم ويعاد وصفه لتتملكه. إنشاؤه يسجله في متتبع الموارد (متتبع الأم نفسه) فيحذف إذا
+    توقفت الأم، والأم تعرف اسمه مسبقاً فتحذفه إذا توقف العامل قبل إرجاع الوصف.
+    """
+    source_segment = _attach(source.name)
+    result_segment = _attach(result.name)
+    image = output = target = None
+    try:
+        image = _view(source_segment, source)
+        output = apply_operations(image, operations, reuse_output=True)
+        target = _view(result_segment, result)
+        if output.shape == target.shape and output.dtype == target.dtype:
+            np.copyto(target, output)
+            return result
+        descriptor = FrameDescriptor(spare_name, output.shape, output.dtype)
+        segment = shared_memory.SharedMemory(name=spare_name, create=True, size=max(descriptor.nbytes, 1))
+        np.copyto(_view(segment, descriptor), output)
+        segment.close()
+        return descriptor
+    finally:
+        del image, output, target
+        source_segment.close()
+        result_segment.close()
+
+
+def apply_pickled(operations, image):
+    """المسار التقليدي للمقارنة: الصورة والناتج ينقلان بالتسلسل"""
+    return apply_operations(image, operations)
+
+
+class SharedMemoryExecutor:
+    """مجموعة عمليات تستقبل الصور عبر الذاكرة المشتركة مع مخزن ناتج مخصص مسبقاً
+
+    submit يرجع Future قيمته SharedFrame للناتج؛ على المستدعي استدعاء release عند الانتهاء.
+    """
+
+    def __init__(self, workers=None):
+        self.registry = SharedFrameRegistry()
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+    def submit(self, frame, operations, result_shape=None, result_dtype=None):
+        """frame صورة مشتركة أو مصفوفة عادية تنسخ إلى الذاكرة المشتركة أولاً"""
+        if not isinstance(frame, SharedFrame):
+            frame = self.registry.share(frame)
+        else:
+            frame.retain()
+        result = self.registry.create(result_shape or frame.descriptor.shape,
+                                      result_dtype or frame.descriptor.dtype)
+        spare_name = _segment_name()
+        try:
+            future = self._executor.submit(apply_shared, operations, frame.descriptor, result.descriptor,
+                                           spare_name)
+        except Exception:
+            frame.release()
+            result.release()
+            raise
+        handle = _ResultFuture(future, self.registry, result, spare_name)
+
+        def on_done(done):
+            # المصدر يحرر فور انتهاء المهمة، والناتج (أو المقطع الجديد من العامل) يسجل في
+            # السجل حتى لو لم يطلبه المستدعي أبداً، فيحذف عند shutdown
+            frame.release()
+            handle._on_done(done)
+
+        future.add_done_callback(on_done)
+        return handle
+
+    def process(self, image, operations):
+        return self.submit(image, operations).result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self.registry.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+class _ResultFuture:
+    """تسليم مقطع الناتج (أو المقطع الجديد الذي أنشأه العامل) للمستدعي مرة واحدة"""
+
+    def __init__(self, future, registry, result, spare_name):
+        self._future = future
+        self._registry = registry
+        self._result = result
+        self._spare_name = spare_name
+        self._frame = None
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._future.done()
+
+    def _on_done(self, future):
+        try:
+            descriptor = None if future.cancelled() else future.result()
+        except Exception:
+            descriptor = None
+        self._settle(descriptor)
+
+    def result(self, timeout=None):
+        try:
+            descriptor = self._future.result(timeout)
+        except FutureTimeoutError:
+            raise
+        except Exception:
+            # العامل توقف أو فشل: المقاطع ملك الأم فتحذف هنا بدون تسرب
+            self._settle(None)
+            raise
+        return self._settle(descriptor)
+
+    def _settle(self, descriptor):
+        with self._lock:
+            if self._result is None:
+                return self._frame
+            result, self._result = self._result, None
+            if descriptor is None:
+                result.release()
+                # ربما أنشأ العامل مقطع الناتج الجديد ثم توقف قبل إرجاع وصفه
+                _discard(self._spare_name)
+            elif descriptor.name == result.descriptor.name:
+                self._frame = result
+            else:
+                result.release()
+                self._frame = self._registry.adopt(descriptor)
+            return self._frame
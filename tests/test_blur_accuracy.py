@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+import pytest
+
+from benchmarks import blur_error, synthetic_image
+from image_operations import FAST_GAUSSIAN_MIN_KERNEL, ImageOperations
+from tiled_processing import TiledProcessor
+
+# حدود خطأ quality='fast' مقارنة بالمرشح الدقيق: (متوسط الفرق المطلق، المئين 99)
+# على صورة اصطناعية بحواف حادة؛ القيم المقاسة حالياً أقل بنحو الربع
+BLUR_ERROR_BOUNDS = {
+    ('gaussian', 31): (1.25, 12),
+    ('gaussian', 61): (1.75, 16),
+    ('gaussian', 101): (2.25, 20),
+    ('bilateral', 15): (1.25, 20),
+    ('bilateral', 31): (1.75, 36),
+}
+
+
+@pytest.fixture(scope='module')
+def image():
+    return synthetic_image(1200, 900)
+
+
+@pytest.mark.parametrize('blur_type, kernel_size', sorted(BLUR_ERROR_BOUNDS))
+def test_fast_blur_error_bounds(image, blur_type, kernel_size):
+    exact = ImageOperations.apply_blur(image, blur_type, kernel_size)
+    fast = ImageOperations.apply_blur(image, blur_type, kernel_size, quality='fast')
+    error = blur_error(exact, fast)
+    max_mean, max_p99 = BLUR_ERROR_BOUNDS[blur_type, kernel_size]
+    assert error['mean_abs_error'] <= max_mean
+    assert error['p99_abs_error'] <= max_p99
+
+
+@pytest.mark.parametrize('blur_type, kernel_size', [('gaussian', FAST_GAUSSIAN_MIN_KERNEL - 2), ('bilateral', 9)])
+def test_fast_blur_is_exact_below_threshold(image, blur_type, kernel_size):
+    exact = ImageOperations.apply_blur(image, blur_type, kernel_size)
+    fast = ImageOperations.apply_blur(image, blur_type, kernel_size, quality='fast')
+    assert cv2.absdiff(exact, fast).max() == 0
+
+
+def test_tiled_blur_rejects_fast_quality(image):
+    destination = np.empty_like(image)
+    with pytest.raises(ValueError):
+        TiledProcessor(tile_size=256).process(image, destination, 'blur', kernel_size=61, quality='fast')
+
+
+@pytest.mark.parametrize('blur_type, kernel_size', [('gaussian', 15), ('gaussian', 61), ('median', 15), ('bilateral', 9)])
+def test_tiled_exact_blur_matches_whole_image(image, blur_type, kernel_size):
+    destination = np.empty_like(image)
+    TiledProcessor(tile_size=256).process(image, destination, 'blur', blur_type=blur_type, kernel_size=kernel_size)
+    np.testing.assert_array_equal(destination, ImageOperations.apply_blur(image, blur_type, kernel_size))
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from batch_processor import apply_operations
+from benchmarks import synthetic_image
+from image_operations import OPERATIONS
+
+
+def run_sequential(image, operations):
+    for name, params in operations:
+        image = OPERATIONS[name](image, **params)
+    return image
+
+
+@pytest.mark.parametrize('operations', [
+    [('histogram', {}), ('gamma', {'gamma': 2.0, 'channel': 2})],
+    [('edges', {}), ('levels', {'in_black': 20, 'in_white': 200, 'channel': 0})],
+    [('histogram', {}), ('invert', {}), ('curves', {'points': ((0, 0), (128, 180), (255, 255)), 'channel': 1})],
+    [('edges', {}), ('brightness', {'brightness': 30}), ('gamma', {'gamma': 0.5, 'channel': 2}), ('invert', {})],
+])
+def test_per_channel_point_ops_after_gray_steps(operations):
+    image = synthetic_image(97, 61)
+    np.testing.assert_array_equal(apply_operations(image, operations), run_sequential(image, operations))
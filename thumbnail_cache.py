@@ -0,0 +1,132 @@
+import hashlib
+import os
+import threading
+
+import cv2
+
+from image_operations import ImageOperations
+
+
+def default_cache_dir():
+    """مجلد ذاكرة المصغرات حسب نظام التشغيل"""
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') \
+        or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'image-processing-app', 'thumbnails')
+
+
+class ThumbnailCache:
+    """ذاكرة مصغرات دائمة على القرص بمفتاح من المسار ووقت التعديل والحجم (أو بصمة المحتوى)
+
+    المصغرات تحفظ كملفات JPEG، والأقدم استخداماً يحذف عند تجاوز max_bytes.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=256 * 1024 * 1024, thumb_size=(128, 128),
+                 use_content_hash=False):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.thumb_size = thumb_size
+        self.use_content_hash = use_content_hash
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.current_bytes = sum(size for _, size, _ in self._scan())
+
+    def key(self, path):
+        """مفتاح المصغرة؛ بصمة المحتوى أبطأ لكنها تصمد أمام نقل الملفات أو تغيير أسمائها"""
+        if self.use_content_hash:
+            digest = hashlib.sha1()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        else:
+            stat = os.stat(path)
+            digest = hashlib.sha1(f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}".encode('utf-8'))
+        digest.update(f"|{self.thumb_size[0]}x{self.thumb_size[1]}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.jpg")
+
+    def get(self, path):
+        """المصغرة المحفوظة كمصفوفة BGR أو None"""
+        return self._get(self.key(path))
+
+    def _get(self, key):
+        entry = self._entry_path(key)
+        thumbnail = cv2.imread(entry) if os.path.exists(entry) else None
+        if thumbnail is not None:
+            try:
+                # تحديث وقت التعديل يجعل الإخلاء حسب آخر استخدام
+                os.utime(entry)
+            except OSError:
+                pass
+        return thumbnail
+
+    def get_or_create(self, path):
+        key = self.key(path)
+        thumbnail = self._get(key)
+        if thumbnail is not None:
+            return thumbnail
+
+        # فك ترميز مصغر مباشرة لملفات JPEG بدلاً من تحميل الصورة كاملة
+        image = ImageOperations.load_image(path, target_size=self.thumb_size)
+        h, w = image.shape[:2]
+        scale = min(self.thumb_size[0] / w, self.thumb_size[1] / h, 1.0)
+        new_size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        thumbnail = cv2.resize(image, new_size, interpolation=cv2.INTER_AREA)
+        self._store(key, thumbnail)
+        return thumbnail
+
+    def _store(self, key, thumbnail):
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        ok, encoded = cv2.imencode('.jpg', thumbnail, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        if not ok:
+            return
+        # الكتابة في ملف مؤقت ثم الاستبدال حتى لا تقرأ مصغرة ناقصة من خيط آخر
+        temp = f"{entry}.{threading.get_ident()}.tmp"
+        with open(temp, 'wb') as f:
+            f.write(encoded.tobytes())
+        with self._lock:
+            # استبدال مصغرة موجودة (خيطان لنفس الصورة) لا يضيف حجمها مرة ثانية
+            try:
+                old_size = os.path.getsize(entry)
+            except OSError:
+                old_size = 0
+            os.replace(temp, entry)
+            self.current_bytes += len(encoded) - old_size
+            if self.current_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.jpg'):
+                    full = os.path.join(root, name)
+                    try:
+                        stat = os.stat(full)
+                    except OSError:
+                        continue
+                    yield full, stat.st_size, stat.st_mtime
+
+    def _evict(self):
+        # حذف الأقدم استخداماً حتى 90% من الحد لتجنب الإخلاء عند كل إضافة
+        target = self.max_bytes * 0.9
+        entries = sorted(self._scan(), key=lambda item: item[2])
+        self.current_bytes = sum(size for _, size, _ in entries)
+        for full, size, _ in entries:
+            if self.current_bytes <= target:
+                break
+            try:
+                os.remove(full)
+                self.current_bytes -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for full, _, _ in list(self._scan()):
+                try:
+                    os.remove(full)
+                except OSError:
+                    pass
+            self.current_bytes = 0
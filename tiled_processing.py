@@ -0,0 +1,335 @@
+import argparse
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from batch_processor import parse_operation
+from image_operations import OPERATIONS
+
+try:
+    import tifffile
+except ImportError:
+    tifffile = None
+
+# عمليات تحافظ على أبعاد الصورة ويمكن تنفيذها على أجزاء، مع حجم الهامش اللازم لكل منها
+# حتى تتطابق النتيجة عند حدود الأجزاء مع المعالجة الكاملة
+TILE_HALOS = {
+    'invert': lambda params: 0,
+    'brightness_contrast': lambda params: 0,
+    'brightness': lambda params: 0,
+    'contrast': lambda params: 0,
+    'gamma': lambda params: 0,
+    'levels': lambda params: 0,
+    'curves': lambda params: 0,
+    'blur': lambda params: params.get('kernel_size', 15) // 2 + 1,
+}
+
+# Canny محلي حتى كبت القيم غير العظمى: نصف نواة التنعيم + Sobel + الجيران، وتتبع الحواف
+# الضعيفة (hysteresis) غير محدود المدى فينفذ بمرور منفصل عبر حدود الأجزاء
+EDGE_HALO = 3
+
+# نفس إعدادات ImageOperations.equalize_histogram
+CLAHE_GRID = 16
+CLAHE_CLIP_LIMIT = 3.0
+CLAHE_BINS = 256
+
+
+def _reflect101(index, n):
+    """فهارس BORDER_REFLECT_101 كما في cv2.copyMakeBorder"""
+    if n == 1:
+        return np.zeros_like(index)
+    period = 2 * (n - 1)
+    index = np.abs(index) % period
+    return np.where(index >= n, period - index, index)
+
+
+def _clahe_weights(coords, cell, tiles=CLAHE_GRID):
+    """الخلايا المجاورة وأوزان الاستيفاء لكل صف أو عمود، بحساب float32 مطابق لـ OpenCV"""
+    inv = np.float32(1.0) / np.float32(cell)
+    position = coords.astype(np.float32) * inv - np.float32(0.5)
+    first = np.floor(position).astype(np.int64)
+    weight = position - first.astype(np.float32)
+    return np.maximum(first, 0), np.minimum(first + 1, tiles - 1), weight, np.float32(1.0) - weight
+
+
+def clahe_luts(histograms, cell_area, clip_limit=CLAHE_CLIP_LIMIT):
+    """جداول CLAHE لكل خلية من مدرجاتها: القص وإعادة التوزيع ثم التوزيع التراكمي"""
+    hist = histograms.reshape(-1, CLAHE_BINS).astype(np.int64)
+    limit = max(int(clip_limit * cell_area / CLAHE_BINS), 1)
+    clipped = np.maximum(hist - limit, 0).sum(axis=1)
+    np.minimum(hist, limit, out=hist)
+    batch = clipped // CLAHE_BINS
+    hist += batch[:, None]
+    for cell, residual in enumerate((clipped - batch * CLAHE_BINS).tolist()):
+        if residual:
+            step = max(CLAHE_BINS // residual, 1)
+            hist[cell, np.arange(0, CLAHE_BINS, step)[:residual]] += 1
+    scale = np.float32(CLAHE_BINS - 1) / np.float32(cell_area)
+    lut = np.rint(np.cumsum(hist, axis=1).astype(np.float32) * scale)
+    return np.clip(lut, 0, 255).astype(np.uint8)
+
+
+def edge_classes(block, blur_kernel=5, threshold1=50, threshold2=150):
+    """تصنيف Canny المحلي: 2 حافة قوية، 1 ضعيفة، 0 ليست حافة
+
+    Canny بعتبتين متساويتين يرجع البكسلات التي تتجاوز العتبة بعد كبت القيم غير العظمى
+    بدون أي تتبع، فالنتيجة تعتمد على جوار صغير فقط.
+    """
+    gray = cv2.cvtColor(block, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(gray, (blur_kernel, blur_kernel), 0)
+    low, high = sorted((threshold1, threshold2))
+    weak = cv2.Canny(blurred, low, low)
+    strong = cv2.Canny(blurred, high, high)
+    return np.add(weak > 0, strong > 0, dtype=np.uint8)
+
+
+def open_source(path):
+    """فتح صورة كبيرة كمصفوفة مربوطة بالذاكرة دون قراءتها كاملة"""
+    lower = path.lower()
+    if lower.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    if lower.endswith(('.tif', '.tiff')):
+        if tifffile is None:
+            raise RuntimeError("tifffile is required for memory-mapped TIFF input")
+        return tifffile.memmap(path, mode='r')
+    raise ValueError(f"Unsupported tiled source format: {path}")
+
+
+def create_destination(path, shape, dtype):
+    """إنشاء ملف ناتج مربوط بالذاكرة بنفس أبعاد المصدر"""
+    lower = path.lower()
+    if lower.endswith('.npy'):
+        return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+    if lower.endswith(('.tif', '.tiff')):
+        if tifffile is None:
+            raise RuntimeError("tifffile is required for memory-mapped TIFF output")
+        photometric = 'rgb' if len(shape) == 3 else 'minisblack'
+        return tifffile.memmap(path, shape=shape, dtype=dtype, photometric=photometric)
+    raise ValueError(f"Unsupported tiled destination format: {path}")
+
+
+class TiledProcessor:
+    """تنفيذ العمليات على أجزاء من صور أكبر من الذاكرة مع نتيجة مطابقة للمعالجة الكاملة"""
+
+    def __init__(self, tile_size=1024, workers=None, temp_dir=None):
+        self.tile_size = tile_size
+        self.workers = workers or os.cpu_count() or 1
+        self.temp_dir = temp_dir
+
+    def process(self, source, destination, name, **params):
+        """تطبيق عملية واحدة جزءاً بجزء من source إلى destination
+
+        الذاكرة المستخدمة تتناسب مع حجم الجزء وعدد الخيوط وليس مع حجم الصورة.
+        """
+        if source.shape != destination.shape:
+            raise ValueError("Source and destination shapes must match")
+        if name == 'histogram':
+            self._process_clahe(source, destination)
+        elif name == 'edges':
+            self._process_edges(source, destination, **params)
+        elif name == 'blur' and params.get('quality', 'exact') != 'exact':
+            # التقريبات تصغر الصورة كاملة أو تغير خوارزميتها حسب الأبعاد، فلا يطابقها أي هامش
+            raise ValueError("Tiled blur supports only quality='exact'")
+        elif name in TILE_HALOS:
+            halo = TILE_HALOS[name](params)
+            operation = OPERATIONS[name]
+            self._run(
+                lambda tile: self._process_tile(source, destination, lambda block: operation(block, **params),
+                                                tile, halo),
+                self._tiles(source.shape[:2], self.tile_size, self.tile_size),
+            )
+        else:
+            raise ValueError(f"Operation '{name}' does not support tiled processing")
+
+        if hasattr(destination, 'flush'):
+            destination.flush()
+        return destination
+
+    def process_chain(self, source, destination, operations, temp_dir=None):
+        """تطبيق سلسلة عمليات بمرور منفصل لكل عملية عبر ملفات وسيطة مربوطة بالذاكرة"""
+        if not operations:
+            raise ValueError("No operations given")
+        current = source
+        with tempfile.TemporaryDirectory(dir=temp_dir or self.temp_dir) as tmp:
+            for i, (name, params) in enumerate(operations):
+                if i == len(operations) - 1:
+                    target = destination
+                else:
+                    target = create_destination(
+                        os.path.join(tmp, f"pass_{i}.npy"), source.shape, source.dtype
+                    )
+                self.process(current, target, name, **params)
+                current = target
+            # إغلاق الملفات الوسيطة قبل حذف المجلد المؤقت
+            del current, target
+        return destination
+
+    def _run(self, func, items):
+        """تنفيذ func على كل عنصر بالترتيب وإرجاع النتائج، مع عدد محدود قيد التنفيذ"""
+        # عدد محدود من الأجزاء قيد التنفيذ في نفس الوقت لتقييد استهلاك الذاكرة
+        max_in_flight = self.workers * 2
+        results = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = []
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= max_in_flight:
+                    results.append(pending.pop(0).result())
+            results.extend(future.result() for future in pending)
+        return results
+
+    @staticmethod
+    def _tiles(shape, tile_h, tile_w):
+        h, w = shape
+        for y in range(0, h, tile_h):
+            for x in range(0, w, tile_w):
+                yield y, x, min(tile_h, h - y), min(tile_w, w - x)
+
+    @staticmethod
+    def _process_tile(source, destination, operation, tile, halo):
+        y, x, th, tw = tile
+        h, w = source.shape[:2]
+        y0, x0 = max(0, y - halo), max(0, x - halo)
+        y1, x1 = min(h, y + th + halo), min(w, x + tw + halo)
+        result = operation(np.ascontiguousarray(source[y0:y1, x0:x1]))
+        destination[y:y + th, x:x + tw] = result[y - y0:y - y0 + th, x - x0:x - x0 + tw]
+
+    # CLAHE: مدرجات الخلايا من الصورة كاملة ثم استيفاء الجداول لكل جزء
+
+    def _process_clahe(self, source, destination):
+        """CLAHE بمرورين: مدرج لكل خلية من الشبكة العامة، ثم تطبيق الجداول جزءاً بجزء
+
+        الشبكة تحسب كما في OpenCV: إذا لم تقسم الأبعاد على 16 توسع الصورة بانعكاس الحدود
+        (BORDER_REFLECT_101) إلى مضاعف 16 في البعدين، وتحسب المدرجات من الصورة الموسعة.
+        """
+        h, w = source.shape[:2]
+        if h % CLAHE_GRID or w % CLAHE_GRID:
+            extended = (h + CLAHE_GRID - h % CLAHE_GRID, w + CLAHE_GRID - w % CLAHE_GRID)
+        else:
+            extended = (h, w)
+        cell = (extended[0] // CLAHE_GRID, extended[1] // CLAHE_GRID)
+
+        histograms = np.zeros(CLAHE_GRID * CLAHE_GRID * CLAHE_BINS, dtype=np.int64)
+        for partial in self._run(
+                lambda block: self._clahe_histogram(source, block, cell),
+                self._tiles(extended, self.tile_size, self.tile_size)):
+            histograms += partial
+        lut = clahe_luts(histograms, cell[0] * cell[1])
+
+        self._run(
+            lambda tile: self._clahe_tile(source, destination, lut, cell, tile),
+            self._tiles((h, w), self.tile_size, self.tile_size),
+        )
+
+    @staticmethod
+    def _clahe_histogram(source, block, cell):
+        y, x, th, tw = block
+        h, w = source.shape[:2]
+        rows = np.arange(y, y + th)
+        cols = np.arange(x, x + tw)
+        if y + th <= h and x + tw <= w:
+            pixels = source[y:y + th, x:x + tw]
+        else:
+            # الجزء يتجاوز الصورة إلى الحدود المنعكسة
+            pixels = source[np.ix_(_reflect101(rows, h), _reflect101(cols, w))]
+        gray = cv2.cvtColor(np.ascontiguousarray(pixels), cv2.COLOR_BGR2GRAY)
+        cells = (rows // cell[0])[:, None] * CLAHE_GRID + (cols // cell[1])[None, :]
+        return np.bincount((cells * CLAHE_BINS + gray).ravel(), minlength=CLAHE_GRID * CLAHE_GRID * CLAHE_BINS)
+
+    @staticmethod
+    def _clahe_tile(source, destination, lut, cell, tile):
+        y, x, th, tw = tile
+        gray = cv2.cvtColor(np.ascontiguousarray(source[y:y + th, x:x + tw]), cv2.COLOR_BGR2GRAY)
+        ty1, ty2, ya, ya1 = _clahe_weights(np.arange(y, y + th), cell[0])
+        tx1, tx2, xa, xa1 = _clahe_weights(np.arange(x, x + tw), cell[1])
+
+        def sample(ty, tx):
+            return lut[ty[:, None] * CLAHE_GRID + tx[None, :], gray].astype(np.float32)
+
+        # نفس ترتيب عمليات float32 في OpenCV حتى يتطابق التقريب
+        top = sample(ty1, tx1) * xa1 + sample(ty1, tx2) * xa
+        bottom = sample(ty2, tx1) * xa1 + sample(ty2, tx2) * xa
+        result = top * ya1[:, None] + bottom * ya[:, None]
+        equalized = np.clip(np.rint(result), 0, 255).astype(np.uint8)
+        destination[y:y + th, x:x + tw] = cv2.cvtColor(equalized, cv2.COLOR_GRAY2BGR)
+
+    # Canny: تصنيف محلي بهامش صغير ثم تتبع الحواف الضعيفة عبر حدود الأجزاء
+
+    def _process_edges(self, source, destination, blur_kernel=5, threshold1=50, threshold2=150):
+        h, w = source.shape[:2]
+        tiles = list(self._tiles((h, w), self.tile_size, self.tile_size))
+        halo = blur_kernel // 2 + EDGE_HALO
+        with tempfile.TemporaryDirectory(dir=self.temp_dir) as tmp:
+            classes = np.lib.format.open_memmap(
+                os.path.join(tmp, 'edge_classes.npy'), mode='w+', dtype=np.uint8, shape=(h, w)
+            )
+            self._run(
+                lambda tile: self._process_tile(
+                    source, classes,
+                    lambda block: edge_classes(block, blur_kernel, threshold1, threshold2),
+                    tile, halo,
+                ),
+                tiles,
+            )
+            # كل مرور يرقي الحواف الضعيفة المتصلة بقوية داخل الجزء أو عبر حدوده، حتى الثبات
+            while any(self._run(lambda tile: self._promote_edges(classes, tile), tiles)):
+                pass
+            self._run(lambda tile: self._write_edges(classes, destination, tile), tiles)
+            del classes
+
+    @staticmethod
+    def _promote_edges(classes, tile):
+        """ترقية البكسلات الضعيفة في الجزء إذا اتصلت (اتصال 8) بحافة قوية، مع إطار بكسل
+        واحد من الأجزاء المجاورة؛ يرجع True إذا تغير شيء"""
+        y, x, th, tw = tile
+        h, w = classes.shape
+        y0, x0 = max(0, y - 1), max(0, x - 1)
+        y1, x1 = min(h, y + th + 1), min(w, x + tw + 1)
+        block = np.array(classes[y0:y1, x0:x1])
+        count, labels = cv2.connectedComponents((block > 0).astype(np.uint8), connectivity=8)
+        seeded = np.zeros(count, dtype=bool)
+        seeded[labels[block == 2]] = True
+        seeded[0] = False
+        promote = (seeded[labels] & (block == 1))[y - y0:y - y0 + th, x - x0:x - x0 + tw]
+        if not promote.any():
+            return False
+        classes[y:y + th, x:x + tw][promote] = 2
+        return True
+
+    @staticmethod
+    def _write_edges(classes, destination, tile):
+        y, x, th, tw = tile
+        edges = np.where(classes[y:y + th, x:x + tw] == 2, 255, 0).astype(np.uint8)
+        destination[y:y + th, x:x + tw] = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m tiled_processing',
+        description='Process images larger than RAM tile by tile through memory-mapped files.',
+    )
+    parser.add_argument('source', help='memory-mappable input (.npy or uncompressed .tif)')
+    parser.add_argument('destination', help='output path (.npy or .tif)')
+    parser.add_argument('--op', dest='operations', action='append', required=True,
+                        help="operation spec, e.g. 'blur:kernel_size=31'; repeat to chain")
+    parser.add_argument('--tile-size', type=int, default=1024)
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    try:
+        operations = [parse_operation(spec) for spec in args.operations]
+        source = open_source(args.source)
+        destination = create_destination(args.destination, source.shape, source.dtype)
+        TiledProcessor(args.tile_size, args.workers).process_chain(source, destination, operations)
+    except (ValueError, RuntimeError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
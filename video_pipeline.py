@@ -0,0 +1,326 @@
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2
+
+from batch_processor import collect_inputs, parse_operation
+from image_operations import OPERATIONS
+from pipeline import Pipeline
+from save_queue import write_image
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.m4v', '.webm')
+
+# ترميز الفيديو الافتراضي حسب امتداد ملف الإخراج
+DEFAULT_FOURCC = {
+    '.mp4': 'mp4v',
+    '.m4v': 'mp4v',
+    '.mov': 'mp4v',
+    '.avi': 'MJPG',
+    '.mkv': 'XVID',
+    '.webm': 'VP80',
+}
+
+# علامة نهاية التدفق بين المراحل
+_END = object()
+
+
+def read_video(path):
+    """قراءة إطارات ملف فيديو أو سلسلة مرقمة بنمط printf مثل frame_%04d.png"""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise RuntimeError(f"Could not open video source {path}")
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield frame
+    finally:
+        capture.release()
+
+
+def read_sequence(paths):
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is None:
+            raise RuntimeError(f"Could not read frame {path}")
+        yield frame
+
+
+def open_source(source, default_fps=25.0):
+    """إرجاع (مولد الإطارات، عدد الإطارات في الثانية) لملف فيديو أو مجلد أو نمط glob أو printf"""
+    if '%' in source or (os.path.isfile(source) and source.lower().endswith(VIDEO_EXTENSIONS)):
+        capture = cv2.VideoCapture(source)
+        fps = capture.get(cv2.CAP_PROP_FPS) if capture.isOpened() else 0
+        capture.release()
+        return read_video(source), fps or default_fps
+    paths = sorted(collect_inputs([source]))
+    if not paths:
+        raise RuntimeError(f"No frames found in {source}")
+    return read_sequence(paths), default_fps
+
+
+class FrameWriter:
+    """كتابة الإطارات إلى ملف فيديو أو إلى سلسلة صور مرقمة
+
+    الإخراج بامتداد فيديو يستخدم cv2.VideoWriter ويفتح عند أول إطار لمعرفة الأبعاد.
+    نمط printf مثل out/frame_%05d.png يكتب ملفاً لكل إطار، وأي مسار آخر يعامل كمجلد.
+    """
+
+    def __init__(self, path, fps=25.0, fourcc=None, settings=None):
+        self.path = path
+        self.fps = fps
+        self.settings = settings
+        ext = os.path.splitext(path)[1].lower()
+        self.is_video = ext in VIDEO_EXTENSIONS
+        self.fourcc = fourcc or DEFAULT_FOURCC.get(ext, 'mp4v')
+        self.count = 0
+        self._writer = None
+        if not self.is_video and '%' not in path:
+            os.makedirs(path, exist_ok=True)
+
+    def write(self, frame):
+        if self.is_video:
+            if self._writer is None:
+                h, w = frame.shape[:2]
+                self._writer = cv2.VideoWriter(
+                    self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (w, h), frame.ndim == 3
+                )
+                if not self._writer.isOpened():
+                    raise RuntimeError(f"Could not open video writer for {self.path} ({self.fourcc})")
+            self._writer.write(frame)
+        elif '%' in self.path:
+            write_image(self.path % self.count, frame, self.settings)
+        else:
+            write_image(os.path.join(self.path, f"frame_{self.count:06d}.png"), frame, self.settings)
+        self.count += 1
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+
+class StageStats:
+    """زمن العمل وزمن الانتظار لمرحلة واحدة
+
+    starved: انتظار إطار من المرحلة السابقة، blocked: انتظار مكان في طابور المرحلة التالية.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+
+
+class _Stage(threading.Thread):
+    """مرحلة على خيط مستقل: تأخذ من طابور وتضع في التالي، والطوابير محدودة الحجم"""
+
+    def __init__(self, name, func, inbox, outbox, stop):
+        super().__init__(name=f"stream-{name}", daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop = stop
+        self.stats = StageStats(name)
+        self.error = None
+
+    def run(self):
+        try:
+            if self.inbox is None:
+                self._run_source()
+            else:
+                self._run_stage()
+        except Exception as e:
+            self.error = e
+            self.stop.set()
+        finally:
+            if self.outbox is not None:
+                self._put(_END)
+
+    def _run_source(self):
+        frames = iter(self.func)
+        try:
+            while not self.stop.is_set():
+                start = time.perf_counter()
+                frame = next(frames, _END)
+                if frame is _END:
+                    break
+                self.stats.busy += time.perf_counter() - start
+                self.stats.frames += 1
+                self._put(frame)
+        finally:
+            # إغلاق المولد يحرر VideoCapture حتى عند الإيقاف المبكر
+            close = getattr(frames, 'close', None)
+            if close is not None:
+                close()
+
+    def _run_stage(self):
+        while True:
+            item = self._get()
+            if item is _END:
+                break
+            start = time.perf_counter()
+            result = self.func(item)
+            self.stats.busy += time.perf_counter() - start
+            self.stats.frames += 1
+            if self.outbox is not None:
+                self._put(result)
+
+    def _get(self):
+        start = time.perf_counter()
+        try:
+            while not self.stop.is_set():
+                try:
+                    return self.inbox.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            return _END
+        finally:
+            self.stats.starved += time.perf_counter() - start
+
+    def _put(self, item):
+        start = time.perf_counter()
+        try:
+            while not self.stop.is_set() or item is _END:
+                try:
+                    self.outbox.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    if item is _END and self.stop.is_set():
+                        return
+        finally:
+            self.stats.blocked += time.perf_counter() - start
+
+
+class StreamPipeline:
+    """تدفق إطارات عبر مراحل متوازية: القراءة ثم مراحل المعالجة ثم الكتابة
+
+    كل مرحلة على خيط مستقل والطوابير بينها محدودة بـ queue_size، فتتداخل القراءة
+    والمعالجة والترميز وتبقى الذاكرة ثابتة مهما طال المقطع. كل مرحلة معالجة سلسلة
+    Pipeline مستقلة تعيد مخازنها بين الإطارات.
+    """
+
+    def __init__(self, stages, queue_size=8):
+        self.stages = [list(operations) for operations in stages]
+        self.queue_size = queue_size
+        self.stats = []
+        self.elapsed = 0.0
+
+    def _start(self, frames, sink=None):
+        stop = threading.Event()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [_Stage('decode', frames, None, queues[0], stop)]
+        for index, operations in enumerate(self.stages):
+            pipeline = Pipeline(operations)
+            name = '+'.join(op for op, _ in operations) or 'copy'
+            threads.append(_Stage(f"{index}:{name}", pipeline.run, queues[index], queues[index + 1], stop))
+        if sink is not None:
+            threads.append(_Stage('encode', sink, queues[-1], None, stop))
+        for thread in threads:
+            thread.start()
+        return threads, queues[-1], stop
+
+    def _finish(self, threads, stop, started):
+        stop.set()
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - started
+        self.stats = [thread.stats for thread in threads]
+        for thread in threads:
+            if thread.error is not None:
+                raise RuntimeError(f"Stage '{thread.stats.name}' failed: {thread.error}") from thread.error
+
+    def stream(self, frames):
+        """مولد الإطارات المعالجة بالترتيب، مع تشغيل القراءة والمعالجة في الخلفية"""
+        started = time.perf_counter()
+        threads, output, stop = self._start(frames)
+        try:
+            while True:
+                try:
+                    item = output.get(timeout=0.1)
+                except queue.Empty:
+                    # مرحلة فشلت ولم تستطع إرسال علامة النهاية
+                    if stop.is_set():
+                        break
+                    continue
+                if item is _END:
+                    break
+                yield item
+        finally:
+            self._finish(threads, stop, started)
+
+    def run(self, frames, writer):
+        """معالجة كل الإطارات وكتابتها بـ writer.write على خيط الترميز، وإرجاع عدد الإطارات"""
+        started = time.perf_counter()
+        threads, _, stop = self._start(frames, writer.write)
+        try:
+            threads[-1].join()
+        finally:
+            writer.close()
+            self._finish(threads, stop, started)
+        return self.stats[-1].frames
+
+    def format_report(self):
+        frames = self.stats[-1].frames if self.stats else 0
+        fps = frames / self.elapsed if self.elapsed else 0.0
+        lines = [f"{frames} frames in {self.elapsed:.2f}s ({fps:.1f} fps)"]
+        for stats in self.stats:
+            lines.append(
+                f"  {stats.name:<30} busy {stats.busy:7.2f}s  "
+                f"starved {stats.starved:7.2f}s  blocked {stats.blocked:7.2f}s"
+            )
+        return '\n'.join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m video_pipeline',
+        description='Stream a video or image sequence through a chain of ImageOperations.',
+    )
+    parser.add_argument('input', help="video file, directory, glob pattern or printf pattern like 'in/%%04d.png'")
+    parser.add_argument('output', help="video file, directory or printf pattern like 'out/%%05d.png'")
+    parser.add_argument(
+        '--op', dest='operations', action='append', required=True,
+        help="operation spec, e.g. 'edges:threshold1=30,threshold2=100'; repeat to chain. "
+             f"Available: {', '.join(sorted(OPERATIONS))}",
+    )
+    parser.add_argument('--split-stages', action='store_true',
+                        help='run each operation on its own thread instead of one fused stage')
+    parser.add_argument('--queue-size', type=int, default=8,
+                        help='frames buffered between stages (default: 8)')
+    parser.add_argument('--fps', type=float, default=None,
+                        help='output frame rate (default: the source rate, or 25 for image sequences)')
+    parser.add_argument('--fourcc', default=None, help='video codec, e.g. mp4v, MJPG, XVID')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        operations = [parse_operation(spec) for spec in args.operations]
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    stages = [[operation] for operation in operations] if args.split_stages else [operations]
+    try:
+        frames, fps = open_source(args.input)
+        writer = FrameWriter(args.output, args.fps or fps, args.fourcc)
+        pipeline = StreamPipeline(stages, queue_size=args.queue_size)
+        pipeline.run(frames, writer)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(pipeline.format_report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())